@@ -0,0 +1,97 @@
+"""Propustnost zápisů do SQLite: výchozí journal (rollback) vs. WAL.
+
+Několik procesů (jako gunicorn workery) zakládá zakázky přes API
+(POST /api/orders včetně úlohy s AI analýzou, AI_BACKEND=stub) a volitelně
+další procesy souběžně čtou seznam zakázek.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_db_writes --writers 4 --readers 2 --requests 100
+"""
+import os
+import time
+import argparse
+import multiprocessing
+from src.models.user import db, User
+from benchmarks.common import make_app, login_client
+
+os.environ.setdefault('AI_BACKEND', 'stub')
+
+def writer(db_uri, wal, customer_id, count, start_event, results):
+    app = make_app(db_uri, migrate=False, with_routes=True, wal=wal)
+    client = login_client(app, customer_id, 'zakaznik')
+    start_event.wait()
+    latencies, errors = [], 0
+    for i in range(count):
+        start = time.perf_counter()
+        response = client.post('/api/orders', data={'title': f'Zakázka {i}', 'description': 'Posekat trávu',
+                                                    'adresa': 'Praha'})
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors += response.status_code != 201
+    results.append(('write', latencies, errors))
+
+def reader(db_uri, wal, admin_id, stop_event, start_event, results):
+    app = make_app(db_uri, migrate=False, with_routes=True, wal=wal)
+    client = login_client(app, admin_id, 'admin')
+    start_event.wait()
+    latencies, errors = [], 0
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        response = client.get('/api/orders?limit=50')
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors += response.status_code != 200
+    results.append(('read', latencies, errors))
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+def run(wal, args):
+    app = make_app(with_routes=True, wal=wal)
+    db_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    with app.app_context():
+        customer = User(jmeno='Z', prijmeni='Z', telefon='1', email='z@example.cz', password_hash='x',
+                        role='zakaznik', email_verified=True)
+        admin = User(jmeno='A', prijmeni='A', telefon='1', email='a@example.cz', password_hash='x',
+                     role='admin', email_verified=True, is_approved=True)
+        db.session.add_all([customer, admin])
+        db.session.commit()
+        customer_id, admin_id = customer.id, admin.id
+
+    manager = multiprocessing.Manager()
+    results, start_event, stop_event = manager.list(), manager.Event(), manager.Event()
+    writers = [multiprocessing.Process(target=writer, args=(db_uri, wal, customer_id, args.requests, start_event, results))
+               for _ in range(args.writers)]
+    readers = [multiprocessing.Process(target=reader, args=(db_uri, wal, admin_id, stop_event, start_event, results))
+               for _ in range(args.readers)]
+    for process in writers + readers:
+        process.start()
+    time.sleep(1.0)
+    start = time.perf_counter()
+    start_event.set()
+    for process in writers:
+        process.join()
+    elapsed = time.perf_counter() - start
+    stop_event.set()
+    for process in readers:
+        process.join()
+
+    writes = [lat for kind, lats, _ in results if kind == 'write' for lat in lats]
+    reads = [lat for kind, lats, _ in results if kind == 'read' for lat in lats]
+    write_errors = sum(errors for kind, _, errors in results if kind == 'write')
+    read_errors = sum(errors for kind, _, errors in results if kind == 'read')
+    print(f"{'WAL' if wal else 'rollback journal':<17} zápisy: {len(writes) / elapsed:7.1f} req/s "
+          f"p50 {percentile(writes, 0.5):6.1f} ms p99 {percentile(writes, 0.99):7.1f} ms chyby {write_errors} | "
+          f"čtení: {len(reads) / elapsed:7.1f} req/s p99 {percentile(reads, 0.99):7.1f} ms chyby {read_errors}")
+    os.remove(db_uri[len('sqlite:///'):])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4, help='počet zapisujících procesů')
+    parser.add_argument('--readers', type=int, default=2, help='počet čtoucích procesů')
+    parser.add_argument('--requests', type=int, default=100, help='počet zakázek na zapisující proces')
+    args = parser.parse_args()
+    for wal in (False, True):
+        run(wal, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Plány a doby hlavních dotazů před a po migraci s indexy.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_indexes --orders 100000
+"""
+import argparse
+from sqlalchemy import text
+from src.models.user import db
+from src.utils.migrations import run_migrations
+from benchmarks.common import make_app, seed, measure
+
+INDEXES = [
+    'ix_order_customer_created', 'ix_order_worker_created', 'ix_order_status_created', 'ix_order_created',
+    'ix_order_status_price',
+    'ix_user_verification_token', 'ix_user_role_approved',
+    'ix_rating_worker', 'ix_rating_customer', 'ix_rating_order', 'ix_job_status_started',
+]
+
+def hot_queries(customer_id, worker_id):
+    """Dotazy odpovídající handlerům v routes/order.py a routes/user.py"""
+    return {
+        'orders zakaznik': ('SELECT * FROM "order" WHERE customer_id = :c ORDER BY created_at DESC', {'c': customer_id}),
+        'orders brigadnik': ('SELECT * FROM "order" WHERE status = \'open\' OR worker_id = :w ORDER BY created_at DESC LIMIT 50', {'w': worker_id}),
+        'orders admin page': ('SELECT * FROM "order" ORDER BY created_at DESC, id DESC LIMIT 50', {}),
+        'statistics paid': ('SELECT count(*), sum(final_price) FROM "order" WHERE status = \'paid\'', {}),
+        'approved workers': ('SELECT count(*) FROM user WHERE role = \'brigadnik\' AND is_approved = 1', {}),
+        'verify token': ('SELECT * FROM user WHERE verification_token = :t', {'t': 'neexistuje'}),
+        'worker ratings': ('SELECT avg(worker_rating) FROM rating WHERE worker_id = :w', {'w': worker_id}),
+    }
+
+def report(label, queries):
+    print(f'\n=== {label} ===')
+    for name, (sql, params) in queries.items():
+        plan = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), params).all()
+        median, p95 = measure(lambda: db.session.execute(text(sql), params).all(), repeat=10)
+        print(f'{name:20s} median {median:8.2f} ms  p95 {p95:8.2f} ms')
+        for row in plan:
+            print(f'{"":22s}{row[-1]}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        # Stav před migrací 0003: bez indexů
+        for name in INDEXES:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        db.session.execute(text('DELETE FROM schema_version WHERE version >= 3'))
+        db.session.commit()
+
+        customers, workers = seed(users=args.users, orders=args.orders)
+        queries = hot_queries(customers[0], workers[0])
+
+        report('bez indexů', queries)
+        run_migrations()
+        db.session.execute(text('ANALYZE'))
+        report('po migraci 0003', queries)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""Zátěžový test životního cyklu zakázky přes API.
+
+Každý virtuální uživatel opakuje tok: registrace zákazníka a brigádníka →
+ověření e-mailu → přihlášení → vytvoření zakázky → seznam zakázek →
+převzetí → dokončení → platba → hodnocení obou stran → hodnocení brigádníka.
+OpenAI nahrazuje AI_BACKEND=stub, SendGrid souborový e-mailový backend.
+Databáze se předem naplní --users uživateli a --orders zakázkami.
+Schválení brigádníka (admin) a ověřovací token se berou přímo z databáze.
+
+Režimy:
+  client   - Flask test client nad src.main v tomto procesu (počítá i SQL dotazy)
+  gunicorn - skutečný gunicorn proces na lokálním portu (HTTP přes httpx)
+
+Výsledek (p50/p95/p99, propustnost, dotazy na požadavek) jde uložit jako
+baseline a další běhy s ní porovnat - při zhoršení skončí s kódem 1:
+    python -m benchmarks.bench_lifecycle --mode client --save-baseline benchmarks/baselines/lifecycle.json
+    python -m benchmarks.bench_lifecycle --mode client --baseline benchmarks/baselines/lifecycle.json
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from benchmarks.common import make_app, seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOISE_FLOOR_MS = 2.0  # Menší rozdíly latence se za zhoršení nepovažují
+MIN_TAIL_SAMPLES = 100
+
+class FlowError(Exception):
+    pass
+
+def endpoint_name(method, url):
+    path = url.split('?')[0]
+    path = re.sub(r'/verify-email/[^/]+', '/verify-email/<token>', path)
+    path = re.sub(r'/\d+', '/<id>', path)
+    return f'{method} {path}'
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+def make_photo():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (1600, 1200), (90, 140, 60)).save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)  # endpoint -> [(ms, ok, dotazy)]
+
+    def add(self, endpoint, ms, ok, queries):
+        with self._lock:
+            self.samples[endpoint].append((ms, ok, queries))
+
+class ClientTransport:
+    """Flask test client; počet SQL dotazů se počítá ve vlákně požadavku"""
+    def __init__(self, app, counter):
+        self.client = app.test_client()
+        self.counter = counter
+
+    def request(self, method, url, json=None, form=None, photo=None):
+        data = None
+        if form is not None:
+            data = dict(form)
+            if photo is not None:
+                data['photo'] = (io.BytesIO(photo), 'photo.jpg')
+        self.counter.queries = 0
+        response = self.client.open(url, method=method, json=json, data=data)
+        return response.status_code, response.get_json(silent=True), self.counter.queries
+
+class HttpTransport:
+    """HTTP klient s vlastními cookies (session) proti běžícímu serveru"""
+    def __init__(self, base_url):
+        import httpx
+        self.client = httpx.Client(base_url=base_url, timeout=60)
+
+    def request(self, method, url, json=None, form=None, photo=None):
+        files = {'photo': ('photo.jpg', photo, 'image/jpeg')} if photo is not None else None
+        response = self.client.request(method, url, json=json, data=form, files=files)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body, None
+
+def lifecycle(new_transport, db_path, tag, photo, recorder):
+    customer, worker = new_transport(), new_transport()
+
+    def call(transport, method, url, expected=200, **kwargs):
+        start = time.perf_counter()
+        status, body, queries = transport.request(method, url, **kwargs)
+        recorder.add(endpoint_name(method, url), (time.perf_counter() - start) * 1000, status == expected, queries)
+        if status != expected:
+            raise FlowError(f'{method} {url}: {status} {body}')
+        return body
+
+    password = 'Heslo-123'
+    people = {}
+    for role, transport in (('zakaznik', customer), ('brigadnik', worker)):
+        data = {'jmeno': 'Zátěž', 'prijmeni': tag, 'telefon': '777000000', 'email': f'{role}-{tag}@example.cz',
+                'password': password, 'confirm_password': password, 'role': role}
+        if role == 'brigadnik':
+            data.update({'naradi': ['sekačka'], 'datum_narozeni': '1990-01-01', 'volne_dny': ['po', 'st']})
+        people[role] = call(transport, 'POST', '/api/register', 201, json=data)['user_id']
+
+    with sqlite3.connect(db_path, timeout=30) as connection:
+        tokens = dict(connection.execute(
+            'SELECT id, verification_token FROM user WHERE id IN (?, ?)', (people['zakaznik'], people['brigadnik'])
+        ).fetchall())
+        connection.execute('UPDATE user SET is_approved = 1 WHERE id = ?', (people['brigadnik'],))
+    connection.close()
+
+    for role, transport in (('zakaznik', customer), ('brigadnik', worker)):
+        call(transport, 'GET', f"/api/verify-email/{tokens[people[role]]}")
+        call(transport, 'POST', '/api/login', json={'email': f'{role}-{tag}@example.cz', 'password': password})
+
+    order = call(customer, 'POST', '/api/orders', 201, photo=photo, form={
+        'title': f'Zakázka {tag}', 'description': 'Posekat trávu a uklidit listí', 'adresa': 'Praha',
+        'latitude': '50.08', 'longitude': '14.43', 'ma_vse_potrebne': 'true'})['order']
+    order_id = order['id']
+    call(worker, 'GET', '/api/orders?limit=20')
+    call(worker, 'POST', f'/api/orders/{order_id}/take')
+    call(worker, 'POST', f'/api/orders/{order_id}/complete', json={'final_price': 1200})
+    call(customer, 'POST', f'/api/orders/{order_id}/pay', json={'payment_type': 'full'})
+    call(customer, 'POST', f'/api/orders/{order_id}/rate', json={'rating': 5, 'comment': 'Výborné'})
+    call(worker, 'POST', f'/api/orders/{order_id}/rate', json={'rating': 4})
+    call(customer, 'GET', f"/api/ratings/{people['brigadnik']}")
+
+def run_flows(new_transport, db_path, args, recorder):
+    """Spustí --concurrency vláken po --flows tocích. Vrací (počet toků, chyby, doba)."""
+    photo = make_photo() if args.photo else None
+    errors = []
+    run_id = f'{os.getpid()}{int(time.time()) % 100000}'
+
+    def user_loop(thread_index):
+        for flow in range(args.flows):
+            try:
+                lifecycle(new_transport, db_path, f'{run_id}-{thread_index}-{flow}', photo, recorder)
+            except FlowError as error:
+                errors.append(str(error))
+
+    threads = [threading.Thread(target=user_loop, args=(i,)) for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return args.concurrency * args.flows, errors, time.perf_counter() - start
+
+def run_client(db_uri, db_path, args, recorder):
+    from sqlalchemy import event
+    os.environ['DATABASE_URL'] = db_uri
+    from src.main import app
+    from src.models.user import db
+
+    counter = threading.local()
+
+    def count_query(*_):
+        if hasattr(counter, 'queries'):
+            counter.queries += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+    return run_flows(lambda: ClientTransport(app, counter), db_path, args, recorder)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def run_gunicorn(db_uri, db_path, args, recorder):
+    port = free_port()
+    log = tempfile.NamedTemporaryFile(prefix='bench_gunicorn_', suffix='.log', delete=False)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--threads', str(args.threads),
+         '--bind', f'127.0.0.1:{port}', 'src.main:app'],
+        cwd=ROOT, env=dict(os.environ, DATABASE_URL=db_uri), stdout=log, stderr=log
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f'gunicorn se nespustil, viz {log.name}')
+                time.sleep(0.2)
+        return run_flows(lambda: HttpTransport(f'http://127.0.0.1:{port}'), db_path, args, recorder)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        log.close()
+
+def summarize(recorder, flows, elapsed, args):
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        latencies = [ms for ms, _, _ in samples]
+        queries = [q for _, _, q in samples if q is not None]
+        endpoints[endpoint] = {
+            'count': len(samples),
+            'errors': sum(not ok for _, ok, _ in samples),
+            'p50': round(percentile(latencies, 0.5), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+            'queries': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    requests = sum(len(samples) for samples in recorder.samples.values())
+    return {
+        'params': {key: getattr(args, key) for key in ('users', 'orders', 'concurrency', 'flows', 'photo', 'workers', 'threads')},
+        'flows_per_s': round(flows / elapsed, 2),
+        'requests_per_s': round(requests / elapsed, 2),
+        'endpoints': endpoints,
+    }
+
+def print_summary(summary, mode):
+    print(f"{'endpoint':<36} {'počet':>6} {'chyby':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'dotazy':>7}")
+    for endpoint, row in summary['endpoints'].items():
+        queries = f"{row['queries']:.1f}" if row['queries'] is not None else '-'
+        print(f"{endpoint:<36} {row['count']:>6} {row['errors']:>6} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+              f"{row['p99']:>8.1f} {queries:>7}")
+    print(f"{mode}: {summary['flows_per_s']} toků/s, {summary['requests_per_s']} požadavků/s")
+
+def compare(summary, baseline, tolerance):
+    """Seznam zhoršení proti baseline (latence a propustnost o víc než tolerance, dotazy o jakékoli)"""
+    regressions = []
+    if summary['params'] != baseline['params']:
+        print(f"Pozor: parametry se liší od baseline {baseline['params']}")
+    if summary['flows_per_s'] < baseline['flows_per_s'] * (1 - tolerance):
+        regressions.append(f"propustnost {baseline['flows_per_s']} -> {summary['flows_per_s']} toků/s")
+    for endpoint, before in baseline['endpoints'].items():
+        now = summary['endpoints'].get(endpoint)
+        if now is None:
+            continue
+        # Ocas rozdělení je při pár desítkách vzorků jen šum - p95 se hlídá od MIN_TAIL_SAMPLES
+        keys = ('p50', 'p95') if min(now['count'], before['count']) >= MIN_TAIL_SAMPLES else ('p50',)
+        for key in keys:
+            if now[key] > before[key] * (1 + tolerance) and now[key] - before[key] > NOISE_FLOOR_MS:
+                regressions.append(f"{endpoint}: {key} {before[key]} -> {now[key]} ms")
+        if before['queries'] is not None and now['queries'] is not None and now['queries'] > before['queries']:
+            regressions.append(f"{endpoint}: dotazy {before['queries']} -> {now['queries']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--users', type=int, default=1000, help='předem vytvoření uživatelé')
+    parser.add_argument('--orders', type=int, default=20000, help='předem vytvořené zakázky')
+    parser.add_argument('--concurrency', type=int, default=4, help='souběžní virtuální uživatelé')
+    parser.add_argument('--flows', type=int, default=10, help='počet toků na virtuálního uživatele')
+    parser.add_argument('--photo', action='store_true', help='nahrávat k zakázce fotku')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workery')
+    parser.add_argument('--threads', type=int, default=4, help='vlákna na gunicorn worker')
+    parser.add_argument('--baseline', help='porovnat s uloženou baseline (JSON)')
+    parser.add_argument('--save-baseline', help='uložit výsledek jako baseline (JSON)')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='povolené zhoršení latence a propustnosti')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_lifecycle_')
+    os.environ.update({
+        'AI_BACKEND': 'stub',
+        'EMAIL_BACKEND': 'file',
+        'EMAIL_FILE_DIR': os.path.join(workdir, 'outbox'),
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+    })
+    db_path = os.path.join(workdir, 'app.db')
+    db_uri = f'sqlite:///{db_path}'
+    seed_app = make_app(db_uri)
+    with seed_app.app_context():
+        seed(args.users, args.orders)
+
+    recorder = Recorder()
+    runner = run_client if args.mode == 'client' else run_gunicorn
+    flows, errors, elapsed = runner(db_uri, db_path, args, recorder)
+    summary = summarize(recorder, flows, elapsed, args)
+    print_summary(summary, args.mode)
+    for error in errors[:10]:
+        print('chyba toku:', error)
+
+    status = 1 if errors else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get(args.mode)
+        if baseline is None:
+            print(f'Baseline pro režim {args.mode} neexistuje')
+        else:
+            regressions = compare(summary, baseline, args.tolerance)
+            for regression in regressions:
+                print('ZHORŠENÍ:', regression)
+            if regressions:
+                status = 1
+            else:
+                print(f'Bez zhoršení proti baseline (tolerance {args.tolerance:.0%})')
+    if args.save_baseline:
+        baselines = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline) as f:
+                baselines = json.load(f)
+        baselines[args.mode] = summary
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f'Baseline uložena do {args.save_baseline}')
+    sys.exit(status)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Párování brigádníků a zakázek: stavba indexu, dotazy a dávkové doporučení.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_matching --users 10000 --orders 5000
+"""
+import json
+import time
+import random
+import argparse
+from src.models.user import db, User, Order
+from src.utils.matching import MatchingIndex, TOOLS, DAYS
+from benchmarks.common import make_app, seed, measure
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=5000)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        customers, workers = seed(users=args.users, orders=args.orders)
+        rnd = random.Random(7)
+        db.session.execute(User.__table__.update().where(User.id == db.bindparam('uid')).values(
+            naradi=db.bindparam('naradi'), volne_dny=db.bindparam('volne_dny')
+        ), [{
+            'uid': worker_id,
+            'naradi': json.dumps(rnd.sample(TOOLS, rnd.randint(1, 5))),
+            'volne_dny': json.dumps(rnd.sample(DAYS, rnd.randint(1, 7)))
+        } for worker_id in workers])
+        db.session.commit()
+
+        start = time.perf_counter()
+        index = MatchingIndex().build()
+        print(f'build: {len(index.workers)} brigádníků, {len(index.orders)} otevřených zakázek '
+              f'za {(time.perf_counter() - start) * 1000:.0f} ms')
+
+        worker_ids = list(index.workers)
+        order_ids = list(index.orders)
+        median, p95 = measure(lambda: index.rank_orders(rnd.choice(worker_ids)), repeat=50)
+        print(f'rank_orders  median {median:7.2f} ms  p95 {p95:7.2f} ms')
+        median, p95 = measure(lambda: index.rank_workers(rnd.choice(order_ids)), repeat=50)
+        print(f'rank_workers median {median:7.2f} ms  p95 {p95:7.2f} ms')
+
+        start = time.perf_counter()
+        index.precompute_recommendations(top_n=10)
+        print(f'precompute top-10 pro všechny: {time.perf_counter() - start:.2f} s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Vyhledání zakázek v okolí: plný průchod + haversine vs. předvýběr podle mřížky.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_nearby --orders 50000
+"""
+import argparse
+import random
+from src.models.user import db, Order
+from src.utils.geo import cell_ranges, haversine_km
+from benchmarks.common import make_app, seed, measure
+
+def full_scan(lat, lon, radius_km):
+    rows = db.session.query(Order.id, Order.latitude, Order.longitude).filter(Order.status == 'open').all()
+    return sorted((d, i) for d, i in ((haversine_km(lat, lon, a, b), i) for i, a, b in rows) if d <= radius_km)
+
+def grid(lat, lon, radius_km):
+    rows = db.session.query(Order.id, Order.latitude, Order.longitude).filter(
+        Order.status == 'open',
+        db.or_(*[Order.geo_cell.between(first, last) for first, last in cell_ranges(lat, lon, radius_km)])
+    ).all()
+    return sorted((d, i) for d, i in ((haversine_km(lat, lon, a, b), i) for i, a, b in rows) if d <= radius_km)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=50000, help='počet otevřených zakázek')
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        seed(users=2000, orders=args.orders)
+        db.session.query(Order).update({'status': 'open', 'worker_id': None})
+        db.session.commit()
+        # Naplnění geo_cell stejně jako migrace 0004
+        db.session.execute(db.text('DELETE FROM schema_version WHERE version = 4'))
+        db.session.execute(db.text('UPDATE "order" SET geo_cell = NULL'))
+        db.session.commit()
+        from src.utils.migrations import run_migrations
+        run_migrations()
+
+        rnd = random.Random(1)
+        points = [(48.8 + rnd.random() * 2.0, 12.5 + rnd.random() * 6.0) for _ in range(20)]
+        for radius_km in (5, 20, 50):
+            assert all(full_scan(a, b, radius_km) == grid(a, b, radius_km) for a, b in points[:3])
+            it = iter(points * 10)
+            scan = measure(lambda: full_scan(*next(it), radius_km))
+            it = iter(points * 10)
+            cells = measure(lambda: grid(*next(it), radius_km))
+            print(f'radius {radius_km:3d} km  full scan median {scan[0]:8.2f} ms  grid median {cells[0]:8.2f} ms')
+
+if __name__ == '__main__':
+    main()
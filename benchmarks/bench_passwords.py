@@ -0,0 +1,121 @@
+"""Propustnost přihlášení s hashováním hesel ve vlákně požadavku a v poolu procesů.
+
+--threads vláken (jako vlákna gunicorn workerů) se současně přihlašuje a
+jedno další vlákno mezitím čte seznam zakázek - jeho latence ukazuje, jak
+nápor přihlášení zdržuje ostatní endpointy. Na konci ověří přepočítání
+starého pbkdf2 hashe při přihlášení. Rozdíl mezi režimy je vidět jen na
+víceprocesorovém stroji (nproc > 1).
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_passwords --threads 8 --logins 200
+"""
+import os
+import time
+import argparse
+import threading
+from threading import BoundedSemaphore
+from werkzeug.security import generate_password_hash
+from src.models.user import db, User
+from src.utils import passwords
+from benchmarks.common import make_app, login_client, seed
+
+PASSWORD = 'Heslo-123'
+
+def configure(workers, max_pending):
+    if passwords._pool is not None:
+        passwords._pool.shutdown()
+    passwords._pool = None
+    passwords.PASSWORD_WORKERS = workers
+    passwords._slots = BoundedSemaphore(max_pending)
+
+def run(app, admin_id, emails, workers, args):
+    configure(workers, args.max_pending)
+    if workers:
+        passwords.hash_password('zahřátí')  # Start procesů poolu se nepočítá
+    reader = login_client(app, admin_id, 'admin')
+    stop = threading.Event()
+    read_latencies, login_latencies, statuses = [], [], []
+    lock = threading.Lock()
+
+    def read_loop():
+        while not stop.is_set():
+            start = time.perf_counter()
+            reader.get('/api/orders?limit=20')
+            read_latencies.append((time.perf_counter() - start) * 1000)
+
+    def login_loop(index):
+        client = app.test_client()
+        for i in range(index, args.logins, args.threads):
+            start = time.perf_counter()
+            response = client.post('/api/login', json={'email': emails[i % len(emails)], 'password': PASSWORD})
+            with lock:
+                login_latencies.append((time.perf_counter() - start) * 1000)
+                statuses.append(response.status_code)
+
+    read_thread = threading.Thread(target=read_loop)
+    read_thread.start()
+    time.sleep(0.5)
+    idle_reads = len(read_latencies)
+    threads = [threading.Thread(target=login_loop, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    read_thread.join()
+
+    reads = sorted(read_latencies[idle_reads:])
+    logins = sorted(login_latencies)
+    label = f'pool {workers} procesů' if workers else 've vlákně'
+    print(f"{label:<18} přihlášení: {len(logins) / elapsed:6.1f} /s p50 {logins[len(logins) // 2]:7.1f} ms "
+          f"p95 {logins[int(len(logins) * 0.95)]:7.1f} ms (200: {statuses.count(200)}, 503: {statuses.count(503)}) | "
+          f"čtení během náporu p50 {reads[len(reads) // 2] if reads else 0:6.1f} ms "
+          f"p95 {reads[int(len(reads) * 0.95)] if reads else 0:6.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='procesy poolu')
+    parser.add_argument('--max-pending', type=int, default=64)
+    args = parser.parse_args()
+
+    app = make_app(with_routes=True)
+    password_hash = generate_password_hash(PASSWORD, method=passwords.PASSWORD_HASH_METHOD,
+                                           salt_length=passwords.PASSWORD_SALT_LENGTH)
+    with app.app_context():
+        seed(200, 5000)
+        admin = User(jmeno='A', prijmeni='A', telefon='1', email='admin@example.cz', password_hash='x',
+                     role='admin', email_verified=True, is_approved=True)
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+        emails = []
+        for i in range(args.threads * 4):
+            user = User(jmeno='Z', prijmeni=str(i), telefon='1', email=f'login{i}@example.cz',
+                        password_hash=password_hash, role='zakaznik', email_verified=True)
+            db.session.add(user)
+            emails.append(user.email)
+        db.session.commit()
+
+    print(f'CPU: {os.cpu_count()}, metoda {passwords.PASSWORD_HASH_METHOD}, {args.threads} vláken, {args.logins} přihlášení')
+    for workers in (0, args.workers):
+        run(app, admin_id, emails, workers, args)
+
+    # Starý hash (pbkdf2) se při přihlášení přepočítá na nastavenou metodu
+    with app.app_context():
+        legacy = User(jmeno='L', prijmeni='L', telefon='1', email='legacy@example.cz', role='zakaznik',
+                      password_hash=generate_password_hash(PASSWORD, method='pbkdf2:sha256:600000'),
+                      email_verified=True)
+        db.session.add(legacy)
+        db.session.commit()
+    response = app.test_client().post('/api/login', json={'email': 'legacy@example.cz', 'password': PASSWORD})
+    with app.app_context():
+        method = db.session.query(User.password_hash).filter_by(email='legacy@example.cz').scalar().split('$')[0]
+    print(f'přepočítání starého hashe: přihlášení {response.status_code}, pbkdf2:sha256:600000 -> {method}')
+    configure(0, args.max_pending)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Lokální model ceny: přesnost proti finálním cenám a doba odhadu.
+
+Naplní databázi syntetickou historií zaplacených zakázek (cena podle typu
+práce, plochy nebo hodin z textu, regionu a ma_vse_potrebne, s šumem),
+uložený odhad napodobí nepřesné LLM. Vypíše offline vyhodnocení
+(evaluate-price-model), dobu jednoho odhadu a kolik nových zakázek by
+model ocenil sám, bez volání OpenAI.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_price_model --orders 20000
+"""
+import os
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+from src.models.user import db, User, Order
+from src.utils import price_model
+from benchmarks.common import make_app
+
+# (popis, AI analýza, cena za jednotku, jednotka: m2 | hod)
+WORK = [
+    ('Posekat trávník', 'Vysoká tráva, rovný terén.', 6, 'm2'),
+    ('Ostříhat živý plot', 'Přerostlý plot, potřeba žebřík.', 35, 'm2'),
+    ('Uklidit listí', 'Hodně listí pod stromy.', 250, 'hod'),
+    ('Vyplet záhony', 'Zarostlé záhony, ruční pletí.', 280, 'hod'),
+    ('Prořezat ovocné stromy', 'Staré stromy, silné větve.', 400, 'hod'),
+    ('Natřít plot', 'Dřevěný plot, starý nátěr.', 60, 'm2'),
+]
+REGIONS = [((50.08, 14.43), 1.3), ((49.19, 16.61), 1.1), ((49.82, 18.26), 0.9), ((49.74, 13.37), 1.0)]
+
+def synthetic_order(rnd):
+    description, analysis, unit_price, unit = rnd.choice(WORK)
+    amount = rnd.randint(50, 800) if unit == 'm2' else rnd.randint(1, 8)
+    (lat, lon), region = rnd.choice(REGIONS)
+    equipped = rnd.random() < 0.5
+    price = unit_price * amount * region * (0.9 if equipped else 1.0) * rnd.lognormvariate(0, 0.15)
+    text = f'{description}, asi {amount} m²' if unit == 'm2' else f'{description}, asi {amount} hodin'
+    return {'description': text, 'ai_analysis': analysis if rnd.random() < 0.7 else None,
+            'latitude': lat + rnd.uniform(-0.2, 0.2), 'longitude': lon + rnd.uniform(-0.2, 0.2),
+            'ma_vse_potrebne': equipped, 'final_price': round(max(price, 200), -1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=20000, help='zakázky v historii')
+    parser.add_argument('--new', type=int, default=1000, help='nové zakázky k ocenění')
+    args = parser.parse_args()
+    if price_model.np is None:
+        raise SystemExit('Lokální model ceny potřebuje NumPy (pip install numpy)')
+
+    os.environ.setdefault('AI_BACKEND', 'stub')
+    rnd = random.Random(11)
+    app = make_app()
+    with app.app_context():
+        customer = User(jmeno='Z', prijmeni='Z', telefon='1', email='z@example.cz', password_hash='x',
+                        role='zakaznik', email_verified=True)
+        db.session.add(customer)
+        db.session.commit()
+        rows = []
+        for i in range(args.orders):
+            order = synthetic_order(rnd)
+            # Uložený odhad napodobí LLM: správný řád, ale velký rozptyl
+            order['estimated_price'] = round(order['final_price'] * rnd.lognormvariate(0, 0.45), -1)
+            rows.append(dict(order, title=f'Zakázka {i}', adresa='Adresa', status='paid', final_price_confirmed=True,
+                             customer_id=customer.id, created_at=datetime.utcnow()))
+        db.session.execute(Order.__table__.insert(), rows)
+        db.session.commit()
+
+        print(json.dumps(price_model.evaluate(), indent=2))
+
+        model = price_model.rebuild_price_model()
+        new_orders = [synthetic_order(rnd) for _ in range(args.new)]
+        start = time.perf_counter()
+        estimates = [model.predict(o['description'], o['ai_analysis'], o['ma_vse_potrebne'], o['latitude'],
+                                   o['longitude']) for o in new_orders]
+        elapsed = time.perf_counter() - start
+        confident = sum(estimate.confident for estimate in estimates)
+        sample = new_orders[0], estimates[0]
+        print(f"odhad: {elapsed / len(new_orders) * 1e6:.1f} µs na zakázku, bez OpenAI {confident}/{len(new_orders)} "
+              f"(PRICE_MODEL_MAX_SPREAD {price_model.PRICE_MODEL_MAX_SPREAD})")
+        print(f"příklad: {sample[0]['description']!r} -> {sample[1].price:.0f} Kč "
+              f"({sample[1].low:.0f}-{sample[1].high:.0f}), skutečně {sample[0]['final_price']:.0f} Kč")
+        unknown = model.predict('Vyčistit bazén od řas', None, False, None, None)
+        print(f"neznámá práce bez polohy: {unknown.price:.0f} Kč ({unknown.low:.0f}-{unknown.high:.0f}), "
+              f"spolehlivý {unknown.confident}")
+
+if __name__ == '__main__':
+    main()
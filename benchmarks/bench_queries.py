@@ -0,0 +1,74 @@
+"""Počet SQL dotazů na požadavek s cache identity uživatele a bez ní.
+
+AUTH_CACHE_TTL=0 odpovídá původnímu chování (načtení uživatele v každém
+požadavku), výchozí TTL drží identitu v cache procesu.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_queries --orders 5000
+"""
+import argparse
+from sqlalchemy import event
+from src.models.user import db, User, Order
+from src.utils import auth
+from benchmarks.common import make_app, login_client, seed, measure
+
+def endpoints(order_id, worker_id):
+    """(role, metoda, URL) - jen požadavky, které nemění data"""
+    return [
+        ('zakaznik', 'get', '/api/orders?limit=50'),
+        ('zakaznik', 'get', f'/api/orders/{order_id}'),
+        ('zakaznik', 'get', f'/api/orders/{order_id}/analysis'),
+        ('brigadnik', 'get', '/api/orders?limit=50'),
+        ('brigadnik', 'get', '/api/orders/nearby?lat=50.08&lon=14.43&radius_km=20'),
+        ('brigadnik', 'get', '/api/matching/orders?limit=10'),
+        ('brigadnik', 'get', f'/api/ratings/{worker_id}'),
+        ('admin', 'get', '/api/orders?limit=50'),
+        ('admin', 'get', '/api/statistics'),
+        ('admin', 'get', '/api/admin/ai-cache'),
+        ('admin', 'get', f'/api/matching/orders/{order_id}/workers'),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app(with_routes=True)
+    with app.app_context():
+        customers, workers = seed(args.users, args.orders)
+        admin = User(jmeno='A', prijmeni='A', telefon='1', email='admin@example.cz', password_hash='x',
+                     role='admin', email_verified=True, is_approved=True)
+        db.session.add(admin)
+        db.session.commit()
+        worker_id = db.session.query(User.id).filter_by(role='brigadnik', is_approved=True).first()[0]
+        customer_id = customers[0]
+        order_id = db.session.query(Order.id).filter_by(customer_id=customer_id).first()[0]
+        users = {'zakaznik': customer_id, 'brigadnik': worker_id, 'admin': admin.id}
+
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+
+    clients = {role: login_client(app, user_id, role) for role, user_id in users.items()}
+    print(f"{'endpoint':<58} {'role':<10} {'dotazy TTL=0':>12} {'dotazy cache':>12} {'ms TTL=0':>9} {'ms cache':>9}")
+    totals = [0, 0]
+    for role, method, url in endpoints(order_id, worker_id):
+        client = clients[role]
+        row = []
+        for ttl in (0, 30):
+            auth.AUTH_CACHE_TTL = ttl
+            auth._cache.clear()
+            getattr(client, method)(url)  # Zahřátí (u TTL>0 naplní cache)
+            statements.clear()
+            response = getattr(client, method)(url)
+            assert response.status_code == 200, (url, response.status_code, response.data[:200])
+            row.append(len(statements))
+            row.append(measure(lambda: getattr(client, method)(url), args.repeat)[0])
+        totals[0] += row[0]
+        totals[1] += row[2]
+        print(f"{url:<58} {role:<10} {row[0]:>12} {row[2]:>12} {row[1]:>9.2f} {row[3]:>9.2f}")
+    print(f"{'celkem':<69} {totals[0]:>12} {totals[1]:>12}")
+
+if __name__ == '__main__':
+    main()
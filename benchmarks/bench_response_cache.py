@@ -0,0 +1,84 @@
+"""Cache odpovědí a podmíněné GET pro seznam zakázek, detail a hodnocení.
+
+Pro každý endpoint měří dobu a počet SQL dotazů:
+  bez cache - verze i odpovědi se pokaždé zahodí (původní cesta + čtení verzí)
+  cache     - opakovaný požadavek obslouží LRU cache procesu
+  304       - klient pošle If-None-Match s posledním ETagem
+a nakonec ověří, že změna zakázky vrátí novou odpověď.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_response_cache --orders 20000
+"""
+import argparse
+from sqlalchemy import event
+from src.models.user import db, User, Order
+from src.utils import http_cache
+from benchmarks.common import make_app, login_client, seed, measure
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = make_app(with_routes=True)
+    with app.app_context():
+        customers, workers = seed(args.users, args.orders)
+        worker_id = db.session.query(User.id).filter_by(role='brigadnik', is_approved=True).first()[0]
+        order_id = db.session.query(Order.id).filter_by(customer_id=customers[0]).first()[0]
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+
+    clients = {'zakaznik': login_client(app, customers[0], 'zakaznik'),
+               'brigadnik': login_client(app, worker_id, 'brigadnik')}
+    endpoints = [
+        ('brigadnik', '/api/orders?limit=50'),
+        ('brigadnik', '/api/orders'),
+        ('zakaznik', f'/api/orders/{order_id}'),
+        ('brigadnik', f'/api/ratings/{worker_id}'),
+    ]
+
+    print(f"{'endpoint':<32} {'ms bez cache':>12} {'ms cache':>9} {'ms 304':>7} "
+          f"{'dotazy':>7} {'cache':>6} {'304':>4}")
+    for role, url in endpoints:
+        client = clients[role]
+
+        def cold():
+            http_cache.clear_cache()
+            return client.get(url)
+
+        def count(func):
+            statements.clear()
+            response = func()
+            return response, len(statements)
+
+        response, cold_queries = count(cold)
+        assert response.status_code == 200, (url, response.status_code)
+        etag = response.headers['ETag']
+        _, hit_queries = count(lambda: client.get(url))
+        not_modified, conditional_queries = count(lambda: client.get(url, headers={'If-None-Match': etag}))
+        assert not_modified.status_code == 304, (url, not_modified.status_code)
+
+        cold_ms = measure(cold, args.repeat)[0]
+        client.get(url)
+        hit_ms = measure(lambda: client.get(url), args.repeat)[0]
+        conditional_ms = measure(lambda: client.get(url, headers={'If-None-Match': etag}), args.repeat)[0]
+        print(f"{url:<32} {cold_ms:>12.2f} {hit_ms:>9.2f} {conditional_ms:>7.2f} "
+              f"{cold_queries:>7} {hit_queries:>6} {conditional_queries:>4}")
+
+    # Změna zakázky musí ETag zneplatnit
+    client = clients['zakaznik']
+    url = f'/api/orders/{order_id}'
+    etag = client.get(url).headers['ETag']
+    with app.app_context():
+        db.session.get(Order, order_id).title = 'Změněná zakázka'
+        http_cache.order_changed(order_id)
+        db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.json['title'] == 'Změněná zakázka'
+    print(f"po změně zakázky: {response.status_code}, ETag {etag} -> {response.headers['ETag']}")
+    print('cache:', http_cache.cache_stats())
+
+if __name__ == '__main__':
+    main()
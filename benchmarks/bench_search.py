@@ -0,0 +1,99 @@
+"""Fulltextové hledání v zakázkách (FTS5) přes GET /api/orders/search.
+
+Naplní databázi zakázkami s různorodými texty, změří dobu hledání pro
+brigádníka a admina a ověří, že index sleduje vytvoření, úpravu a smazání
+zakázky a že hledání nezávisí na diakritice.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_search --orders 100000
+"""
+import random
+import argparse
+from sqlalchemy import text
+from src.models.user import db, User, Order
+from src.utils.http_cache import clear_cache
+from benchmarks.common import make_app, login_client, seed, measure
+
+WORK = ['Posekat trávník', 'Ostříhat živý plot', 'Uklidit listí', 'Vyplet záhony', 'Prořezat ovocné stromy',
+        'Odvézt větve', 'Zrýt zahradu', 'Zalévat skleník', 'Natřít plot', 'Vyčistit jezírko']
+DETAILS = ['u rodinného domu', 'na chalupě', 'za garáží', 'u bytového domu', 'na svahu', 'kolem bazénu',
+           'v sadu', 'před restaurací', 'na zahrádce', 'u školky']
+CITIES = ['Praha', 'Brno', 'Ostrava', 'Plzeň', 'Liberec', 'Olomouc', 'České Budějovice', 'Hradec Králové',
+          'Ústí nad Labem', 'Pardubice', 'Zlín', 'Jihlava']
+ANALYSES = ['Vysoká tráva, střední obtížnost, asi 3 hodiny práce.', 'Přerostlý živý plot, potřeba nůžky a žebřík.',
+            'Hodně listí a větví, práce na půl dne.', 'Zarostlé záhony, ruční pletí.', None]
+
+QUERIES = ['plot', 'trava', 'Plzeň', 'listí chalupa', 'ovocne stromy', 'jezirko Brno', 'zebrik']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    app = make_app(with_routes=True)
+    with app.app_context():
+        customers, _ = seed(args.users, args.orders)
+        ids = [row[0] for row in db.session.query(Order.id)]
+        db.session.execute(text(
+            'UPDATE "order" SET title = :title, description = :description, adresa = :adresa, '
+            'ai_analysis = :ai_analysis WHERE id = :id'
+        ), [{'id': order_id, 'title': rnd.choice(WORK), 'adresa': f'{rnd.choice(CITIES)} {rnd.randint(1, 200)}',
+             'description': f'{rnd.choice(WORK)} {rnd.choice(DETAILS)}', 'ai_analysis': rnd.choice(ANALYSES)}
+            for order_id in ids])
+        db.session.commit()
+        worker_id = db.session.query(User.id).filter_by(role='brigadnik', is_approved=True).first()[0]
+        admin = User(jmeno='A', prijmeni='A', telefon='1', email='admin@example.cz', password_hash='x',
+                     role='admin', email_verified=True, is_approved=True)
+        db.session.add(admin)
+        db.session.commit()
+        users = {'brigadnik': worker_id, 'zakaznik': customers[0], 'admin': admin.id}
+
+    print(f"{'dotaz':<16} {'role':<10} {'výsledků':>9} {'ms p50':>7} {'ms p95':>7}  první výsledek")
+    for role, user_id in users.items():
+        client = login_client(app, user_id, role)
+        for q in QUERIES:
+            url = f'/api/orders/search?q={q}&limit=20'
+
+            def search():
+                clear_cache()  # Měří se hledání, ne cache odpovědí
+                return client.get(url)
+
+            response = search()
+            assert response.status_code == 200, response.data
+            median, p95 = measure(search, args.repeat)
+            first = response.json[0]['title'] if response.json else '-'
+            print(f"{q:<16} {role:<10} {len(response.json):>9} {median:>7.2f} {p95:>7.2f}  {first}")
+
+    # Index sleduje změny zakázek
+    admin_client = login_client(app, users['admin'], 'admin')
+    customer_client = login_client(app, customers[0], 'zakaznik')
+
+    def found(q):
+        clear_cache()
+        return [order['id'] for order in admin_client.get(f'/api/orders/search?q={q}').json]
+
+    order_id = customer_client.post('/api/orders', data={'title': 'Vyčištění okapů', 'description': 'Ucpané okapy',
+                                                          'adresa': 'Třeboň'}).json['order']['id']
+    created = order_id in found('okapu trebon')
+    with app.app_context():
+        db.session.get(Order, order_id).title = 'Výměna okapů'
+        db.session.commit()
+    updated = order_id in found('vymena') and order_id not in found('vycisteni')
+    customer_client.delete(f'/api/orders/{order_id}')
+    deleted = order_id not in found('okapu')
+    print(f'synchronizace indexu: vytvoření {created}, úprava {updated}, smazání {deleted}')
+
+    # Okno řazení podle relevance se počítá až z viditelných zakázek - zákazník
+    # najde i svou nejstarší zakázku, i když je obecných shod víc než okno
+    with app.app_context():
+        oldest = db.session.query(Order.id, Order.title).filter_by(customer_id=customers[0]) \
+            .order_by(Order.id).first()
+    clear_cache()
+    own = [order['id'] for order in customer_client.get(f'/api/orders/search?q={oldest.title}&limit=100').json]
+    print(f'nejstarší zakázka zákazníka ve výsledcích: {oldest.id in own}')
+
+if __name__ == '__main__':
+    main()
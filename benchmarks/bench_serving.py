@@ -0,0 +1,228 @@
+"""Souběžná kapacita jednoho gunicorn procesu při pomalých službách.
+
+Spustí gunicorn s jedním workerem postupně s třídou workeru sync, gthread a
+gevent (je-li nainstalovaný) a OpenAI i e-mail nahradí stuby s latencí
+--latency s (AI_STUB_LATENCY, EMAIL_STUB_LATENCY). Scénáře:
+  inline - JOBS_SYNC=true: odhad ceny běží přímo v požadavku POST /api/orders
+           a --concurrency klientů najednou vytváří zakázky
+  jobs   - výchozí fronta úloh: vytvoření zakázky na AI nečeká, měří se
+           i doba, než jsou hotové všechny odhady ceny
+  stream - --streams otevřených SSE streamů a mezitím GET /api/orders
+Kapacita je počet současně obsloužených pomalých požadavků
+(propustnost × latence služby).
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_serving --latency 2 --concurrency 16
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.util
+import httpx
+from werkzeug.security import generate_password_hash
+from src.models.user import db, User
+from benchmarks.common import make_app
+from benchmarks.bench_lifecycle import ROOT, free_port, percentile
+
+PASSWORD = 'Heslo-123'
+HASH_METHOD = 'pbkdf2:sha256:1000'  # Hashování hesel se tu neměří
+
+def start_server(worker_class, env, args):
+    port = free_port()
+    log = tempfile.NamedTemporaryFile(prefix=f'bench_serving_{worker_class}_', suffix='.log', delete=False)
+    env = dict(os.environ, WEB_WORKER_CLASS=worker_class, WEB_CONCURRENCY='1', WEB_THREADS=str(args.threads),
+               WEB_TIMEOUT='120', **env)
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', 'src.main:app'],
+                               cwd=ROOT, env=env, stdout=log, stderr=log)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/api/orders', timeout=1)
+            break
+        except httpx.HTTPError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError(f'gunicorn se nespustil, viz {log.name}')
+            time.sleep(0.2)
+    return process, f'http://127.0.0.1:{port}', log
+
+def stop_server(process, log):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    log.close()
+
+def login(base_url, email):
+    response = httpx.post(f'{base_url}/api/login', json={'email': email, 'password': PASSWORD}, timeout=30)
+    response.raise_for_status()
+    return dict(response.cookies)
+
+def create_orders(base_url, cookies, tag, args):
+    """--concurrency klientů najednou vytvoří zakázku. Vrací (latence ms, chyby, doba, id)."""
+    latencies, errors, ids = [], [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.concurrency)
+
+    def client_loop(index):
+        with httpx.Client(base_url=base_url, cookies=cookies, timeout=args.latency * args.concurrency + 60) as client:
+            barrier.wait()
+            for round_ in range(args.rounds):
+                # Jedinečný popis - odhad ceny se nesmí vzít z AI cache
+                start = time.perf_counter()
+                try:
+                    response = client.post('/api/orders', data={
+                        'title': f'Souběh {tag}', 'description': f'Posekat trávu {tag}-{index}-{round_}-{time.time()}',
+                        'adresa': 'Praha'})
+                    ok = response.status_code == 201
+                except httpx.HTTPError as error:
+                    response, ok = error, False
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if ok:
+                        ids.append(response.json()['order']['id'])
+                    else:
+                        errors.append(str(getattr(response, 'status_code', response)))
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start, ids
+
+def wait_for_analyses(db_path, ids, timeout):
+    """Doba (s), než mají všechny zakázky hotový odhad ceny, None při vypršení"""
+    start = time.perf_counter()
+    placeholders = ', '.join('?' * len(ids))
+    while time.perf_counter() - start < timeout:
+        with sqlite3.connect(db_path, timeout=30) as connection:
+            pending = connection.execute(
+                f"SELECT COUNT(*) FROM \"order\" WHERE id IN ({placeholders}) AND analysis_status = 'pending'", ids
+            ).fetchone()[0]
+        connection.close()
+        if not pending:
+            return time.perf_counter() - start
+        time.sleep(0.1)
+    return None
+
+def report(worker_class, scenario, latencies, errors, elapsed, args, extra=''):
+    count = len(latencies)
+    # Kapacita dává smysl jen tam, kde požadavek čeká na službu
+    capacity = f'{(count - len(errors)) / elapsed * args.latency:.1f}' if scenario == 'inline' else '-'
+    print(f"{worker_class:<8} {scenario:<7} {count:>5} {len(errors):>6} {elapsed:>7.1f} {count / elapsed:>7.2f} "
+          f"{percentile(latencies, 0.5):>8.0f} {percentile(latencies, 1.0):>8.0f} {capacity:>9}  {extra}")
+
+def run_inline(worker_class, db_path, email, args):
+    process, base_url, log = start_server(worker_class, {'JOBS_SYNC': 'true'}, args)
+    try:
+        latencies, errors, elapsed, _ = create_orders(base_url, login(base_url, email), 'inline', args)
+    finally:
+        stop_server(process, log)
+    report(worker_class, 'inline', latencies, errors, elapsed, args)
+
+def run_jobs(worker_class, db_path, email, args):
+    process, base_url, log = start_server(worker_class, {'JOBS_SYNC': 'false'}, args)
+    try:
+        latencies, errors, elapsed, ids = create_orders(base_url, login(base_url, email), 'jobs', args)
+        done = wait_for_analyses(db_path, ids, args.latency * len(ids) + 60) if ids else 0
+    finally:
+        stop_server(process, log)
+    analyses = f'odhady ceny hotové za {done:.1f} s' if done is not None else 'odhady ceny nedoběhly'
+    report(worker_class, 'jobs', latencies, errors, elapsed, args, analyses)
+
+def run_stream(worker_class, db_path, email, args):
+    """Otevřené SSE streamy a mezitím čtení seznamu zakázek"""
+    process, base_url, log = start_server(worker_class, {'JOBS_SYNC': 'false'}, args)
+    stop = threading.Event()
+    try:
+        cookies = login(base_url, email)
+
+        def listen():
+            try:
+                with httpx.Client(base_url=base_url, cookies=cookies, timeout=None) as client:
+                    with client.stream('GET', '/api/orders/stream') as response:
+                        for _ in response.iter_lines():
+                            if stop.is_set():
+                                break
+            except httpx.HTTPError:
+                pass
+
+        listeners = [threading.Thread(target=listen, daemon=True) for _ in range(args.streams)]
+        for listener in listeners:
+            listener.start()
+        time.sleep(1)
+        latencies, errors = [], []
+        start = time.perf_counter()
+        with httpx.Client(base_url=base_url, cookies=cookies, timeout=args.latency * 2) as client:
+            for _ in range(5):
+                request_start = time.perf_counter()
+                try:
+                    if client.get('/api/orders?limit=20').status_code != 200:
+                        errors.append('status')
+                except httpx.TimeoutException:
+                    errors.append('timeout')
+                latencies.append((time.perf_counter() - request_start) * 1000)
+        elapsed = time.perf_counter() - start
+        stop.set()
+    finally:
+        stop_server(process, log)
+    report(worker_class, 'stream', latencies, errors, elapsed, args,
+           f'{args.streams} streamů, GET /api/orders vypršel {errors.count("timeout")}×')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=2.0, help='latence stubu OpenAI a e-mailu (s)')
+    parser.add_argument('--concurrency', type=int, default=16, help='souběžní klienti')
+    parser.add_argument('--rounds', type=int, default=1, help='požadavků na klienta')
+    parser.add_argument('--threads', type=int, default=16, help='WEB_THREADS pro gthread')
+    parser.add_argument('--streams', type=int, default=8, help='otevřené SSE streamy ve scénáři stream')
+    parser.add_argument('--worker-class', action='append', choices=['sync', 'gthread', 'gevent'],
+                        help='jen vybrané třídy workeru (lze opakovat)')
+    parser.add_argument('--scenario', action='append', choices=['inline', 'jobs', 'stream'],
+                        help='jen vybrané scénáře (lze opakovat)')
+    args = parser.parse_args()
+
+    worker_classes = args.worker_class or ['sync', 'gthread', 'gevent']
+    if 'gevent' in worker_classes and importlib.util.find_spec('gevent') is None:
+        print('gevent není nainstalovaný (pip install gevent) - třída gevent se přeskočí')
+        worker_classes.remove('gevent')
+    scenarios = {'inline': run_inline, 'jobs': run_jobs, 'stream': run_stream}
+
+    workdir = tempfile.mkdtemp(prefix='bench_serving_')
+    db_path = os.path.join(workdir, 'app.db')
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'AI_BACKEND': 'stub',
+        'AI_STUB_LATENCY': str(args.latency),
+        'EMAIL_BACKEND': 'stub',
+        'EMAIL_STUB_LATENCY': str(args.latency),
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'PASSWORD_HASH_METHOD': HASH_METHOD,
+        'PASSWORD_WORKERS': '0',
+    })
+    app = make_app(os.environ['DATABASE_URL'])
+    with app.app_context():
+        customer = User(jmeno='Z', prijmeni='Z', telefon='1', email='zakaznik@example.cz', role='zakaznik',
+                        password_hash=generate_password_hash(PASSWORD, method=HASH_METHOD), email_verified=True)
+        db.session.add(customer)
+        db.session.commit()
+        email = customer.email
+
+    print(f'latence služeb {args.latency} s, {args.concurrency} klientů × {args.rounds}, 1 proces, '
+          f'gthread {args.threads} vláken')
+    print(f"{'worker':<8} {'scénář':<7} {'počet':>5} {'chyby':>6} {'doba s':>7} {'req/s':>7} "
+          f"{'p50 ms':>8} {'max ms':>8} {'kapacita':>9}")
+    for worker_class in worker_classes:
+        for name in args.scenario or scenarios:
+            scenarios[name](worker_class, db_path, email, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Souběžné přijímání stejné zakázky: právě jeden vítěz a propustnost.
+
+Spuštění z kořene repozitáře:
+    python -m benchmarks.bench_take_race --workers 16 --rounds 50
+    python -m benchmarks.bench_take_race --processes --workers 8 --rounds 20
+"""
+import time
+import argparse
+import threading
+import multiprocessing
+from src.models.user import db, User, Order
+from benchmarks.common import make_app, login_client
+
+def create_orders(app, customer_id, count):
+    with app.app_context():
+        orders = [Order(title='Závod', description='d', adresa='a', customer_id=customer_id,
+                        estimated_price=600, analysis_status='done') for _ in range(count)]
+        db.session.add_all(orders)
+        db.session.commit()
+        return [order.id for order in orders]
+
+def race_worker(db_uri, worker_id, order_ids, start_event, results):
+    """Jeden brigádník zkouší přijmout všechny zakázky v pořadí"""
+    app = make_app(db_uri, migrate=False, with_routes=True)
+    client = login_client(app, worker_id, 'brigadnik')
+    start_event.wait()
+    for order_id in order_ids:
+        response = client.post(f'/api/orders/{order_id}/take')
+        results.append((order_id, worker_id, response.status_code))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=16, help='počet souběžných brigádníků')
+    parser.add_argument('--rounds', type=int, default=50, help='počet zakázek, o které se soupeří')
+    parser.add_argument('--processes', action='store_true', help='procesy místo vláken')
+    args = parser.parse_args()
+
+    app = make_app(with_routes=True)
+    db_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    with app.app_context():
+        customer = User(jmeno='Z', prijmeni='Z', telefon='1', email='z@example.cz', password_hash='x',
+                        role='zakaznik', email_verified=True)
+        workers = [User(jmeno='B', prijmeni=str(i), telefon='1', email=f'b{i}@example.cz', password_hash='x',
+                        role='brigadnik', email_verified=True, is_approved=True) for i in range(args.workers)]
+        db.session.add_all([customer] + workers)
+        db.session.commit()
+        customer_id, worker_ids = customer.id, [worker.id for worker in workers]
+    order_ids = create_orders(app, customer_id, args.rounds)
+
+    if args.processes:
+        manager = multiprocessing.Manager()
+        results, start_event = manager.list(), manager.Event()
+        runners = [multiprocessing.Process(target=race_worker, args=(db_uri, w, order_ids, start_event, results))
+                   for w in worker_ids]
+    else:
+        results, start_event = [], threading.Event()
+        runners = [threading.Thread(target=race_worker, args=(db_uri, w, order_ids, start_event, results))
+                   for w in worker_ids]
+
+    for runner in runners:
+        runner.start()
+    time.sleep(1.0 if args.processes else 0.2)
+    start = time.perf_counter()
+    start_event.set()
+    for runner in runners:
+        runner.join()
+    elapsed = time.perf_counter() - start
+
+    results = list(results)
+    winners = {}
+    for order_id, worker_id, status in results:
+        if status == 200:
+            winners.setdefault(order_id, []).append(worker_id)
+    errors = [status for _, _, status in results if status not in (200, 400, 409)]
+    with app.app_context():
+        stored = dict(db.session.query(Order.id, Order.worker_id).filter(Order.id.in_(order_ids)).all())
+
+    exactly_one = all(len(winners.get(order_id, [])) == 1 for order_id in order_ids)
+    consistent = all(winners[order_id][0] == stored[order_id] for order_id in order_ids if order_id in winners)
+    print(f'{len(results)} požadavků za {elapsed:.2f} s ({len(results) / elapsed:.0f} req/s)')
+    print(f'právě jeden vítěz u každé zakázky: {exactly_one}, shoda s DB: {consistent}, chyby: {len(errors)}')
+
+if __name__ == '__main__':
+    main()
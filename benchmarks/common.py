@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.user import db, User, Order
+from src.utils.migrations import run_migrations
+from src.utils.database import init_database
+
+STATUSES = ['open', 'taken', 'completed', 'paid']
+
+def make_app(db_uri=None, migrate=True, with_routes=False, wal=None):
+    """Samostatná Flask aplikace nad dočasnou SQLite databází (volitelně s API blueprinty).
+    wal=None bere SQLITE_WAL z prostředí jako aplikace."""
+    if db_uri is None:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='bench_')
+        os.close(fd)
+        db_uri = f'sqlite:///{path}'
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_database(app, db, wal=wal)
+    with app.app_context():
+        db.create_all()
+        if migrate:
+            run_migrations()
+
+    if with_routes:
+        from src.routes.user import user_bp
+        from src.routes.order import order_bp
+        from src.routes.matching import matching_bp
+        from src.utils.jobs import init_jobs
+        app.config['SECRET_KEY'] = 'benchmark'
+        app.config['JOBS_SYNC'] = True
+        app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp(prefix='bench_uploads_')
+        app.register_blueprint(user_bp, url_prefix='/api')
+        app.register_blueprint(order_bp, url_prefix='/api')
+        app.register_blueprint(matching_bp, url_prefix='/api')
+        init_jobs(app)
+    return app
+
+def login_client(app, user_id, role):
+    """Testovací klient s přihlášenou session"""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['user_role'] = role
+    return client
+
+def seed(users=1000, orders=100000, workers_ratio=0.3, seed_value=42):
+    """Naplní databázi náhodnými uživateli a zakázkami (volat v app contextu)"""
+    rnd = random.Random(seed_value)
+    now = datetime.utcnow()
+    user_rows = []
+    for i in range(users):
+        role = 'brigadnik' if rnd.random() < workers_ratio else 'zakaznik'
+        verified = rnd.random() < 0.9
+        user_rows.append({
+            'jmeno': f'Jmeno{i}', 'prijmeni': f'Prijmeni{i}', 'telefon': '777000000',
+            'email': f'user{i}@example.cz', 'password_hash': 'x', 'role': role,
+            'email_verified': verified, 'verification_token': None if verified else f'token{i}',
+            'is_approved': role == 'brigadnik' and rnd.random() < 0.8,
+            'created_at': now - timedelta(days=rnd.randint(0, 730))
+        })
+    db.session.execute(User.__table__.insert(), user_rows)
+    db.session.commit()
+
+    ids = [row[0] for row in db.session.query(User.id, User.role).all()]
+    roles = dict(db.session.query(User.id, User.role).all())
+    customers = [i for i in ids if roles[i] == 'zakaznik']
+    workers = [i for i in ids if roles[i] == 'brigadnik']
+
+    batch = []
+    for i in range(orders):
+        status = rnd.choices(STATUSES, weights=[3, 1, 1, 5])[0]
+        price = float(rnd.randint(200, 5000))
+        batch.append({
+            'title': f'Zakázka {i}', 'description': 'Posekat trávu a uklidit listí',
+            'adresa': 'Praha', 'latitude': 48.6 + rnd.random() * 2.4, 'longitude': 12.1 + rnd.random() * 6.8,
+            'ma_vse_potrebne': rnd.random() < 0.5, 'estimated_price': price,
+            'final_price': price if status in ('completed', 'paid') else None,
+            'final_price_confirmed': status in ('completed', 'paid'),
+            'status': status, 'analysis_status': 'done',
+            'payment_status': 'completed' if status == 'paid' else 'pending',
+            'customer_id': rnd.choice(customers),
+            'worker_id': rnd.choice(workers) if status != 'open' else None,
+            'created_at': now - timedelta(minutes=rnd.randint(0, 525600))
+        })
+        if len(batch) == 10000:
+            db.session.execute(Order.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Order.__table__.insert(), batch)
+    db.session.commit()
+    return customers, workers
+
+def measure(func, repeat=20):
+    """Vrátí (medián, p95) doby běhu v milisekundách"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
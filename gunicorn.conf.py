@@ -0,0 +1,48 @@
+import os
+
+# Konfigurace gunicornu - načte se automaticky při spuštění z kořene
+# repozitáře (gunicorn --bind 0.0.0.0:$PORT src.main:app).
+#
+# Aplikace je WSGI a na pomalé služby (OpenAI, SendGrid, SMTP) v požadavku
+# nečeká - AI analýza a odhad ceny běží ve frontě úloh, e-maily v dispečeru.
+# Worker ale drží i SSE streamy (/api/orders/stream, až STREAM_MAX_SECONDS)
+# a v režimu JOBS_SYNC i volání OpenAI. Proto je výchozí worker gthread:
+# čekající požadavek blokuje jen jedno ze WEB_THREADS vláken procesu.
+# Streamů proces pustí nejvýše STREAM_MAX_CONNECTIONS (další dostanou 503
+# a klient se dotazuje), aby vlákna zbyla na ostatní požadavky. Události
+# streamu se šíří jen v rámci procesu, SSE proto vyžaduje WEB_CONCURRENCY=1.
+#
+# WEB_WORKER_CLASS:
+#   sync    - jeden požadavek na proces (původní chování; SSE stream
+#             zablokuje celý worker a po WEB_TIMEOUT s ho gunicorn zabije)
+#   gthread - WEB_THREADS souběžných požadavků na proces (výchozí)
+#   gevent  - kooperativní greenlety, WEB_WORKER_CONNECTIONS souběžných
+#             požadavků na proces (pip install gevent). Gunicorn před
+#             načtením aplikace patchne socket, ssl, time a threading, takže
+#             klienti OpenAI (httpx), SendGrid (urllib) i smtplib při čekání
+#             na síť pustí ostatní požadavky; vlákna fronty úloh a dispečeru
+#             se stanou greenlety. Ovladač PostgreSQL se patchne přes
+#             psycogreen, je-li nainstalovaný. SQLite a hashování hesel bez
+#             poolu (PASSWORD_WORKERS=0) drží smyčku po dobu volání.
+
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+if worker_class not in WORKER_CLASSES:
+    raise ValueError(f"Neznámý WEB_WORKER_CLASS: {worker_class} (možnosti: {', '.join(WORKER_CLASSES)})")
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('WEB_THREADS', 16)) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', 1000))
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        return
+    patch_psycopg()
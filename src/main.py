@@ -1,5 +1,8 @@
 import os
 import sys
+import json
+import time
+import click
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
@@ -8,47 +11,169 @@ from flask_cors import CORS
 from src.models.user import db, User
 from src.routes.user import user_bp
 from src.routes.order import order_bp
+from src.routes.matching import matching_bp
+from src.utils.jobs import init_jobs
+from src.utils.email_utils import init_email, create_email_backend, process_outbox, retry_dead, outbox_stats
+from src.utils.migrations import run_migrations
+from src.utils.database import init_database
+from src.utils.matching import get_matching_index, save_recommendations
+from src.utils.stats import rebuild_stats
+from src.utils.search import rebuild_search_index
+from src.utils.repricing import reprice_open_orders
+from src.utils.price_model import evaluate as evaluate_price_model
+from src.utils.storage import UploadRequest, get_storage
+from src.utils.assets import StaticAssets, build_assets
+from src.utils.metrics import init_metrics
+
+# Výstup flask build-assets
+ASSETS_BUILD_DIR = os.path.join(os.path.dirname(__file__), 'build', 'static')
 
 # ---------- Flask app ----------
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-CORS(app)
+def background_services():
+    """Fronta úloh a dispečer e-mailů běží jen v procesu, který obsluhuje
+    požadavky (gunicorn, python src/main.py), ne v příkazech flask ...
+    BACKGROUND_SERVICES=true|false to přebije (např. pro flask run)."""
+    value = os.getenv('BACKGROUND_SERVICES')
+    if value:
+        return value.lower() == 'true'
+    return os.getenv('FLASK_RUN_FROM_CLI') != 'true'
+
+def create_app(background=None):
+    """Vytvoří aplikaci: konfigurace, databáze a migrace, fronta úloh, e-maily, CLI a routy.
+    background=None rozhodne o službách na pozadí podle background_services()."""
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    app.request_class = UploadRequest  # Nahrávané fotky se streamují na disk a hashují
+    CORS(app, expose_headers=['X-Next-Cursor'])
+
+    # Blueprints
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(order_bp, url_prefix='/api')
+    app.register_blueprint(matching_bp, url_prefix='/api')
+
+    # Database - DATABASE_URL a parametry poolu z prostředí (viz utils/database.py)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
+
+    # Úložiště fotek zakázek: lokální složka nebo S3 kompatibilní bucket
+    app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', os.path.join(app.static_folder, 'uploads'))
+    app.config['STORAGE_BACKEND'] = os.getenv('STORAGE_BACKEND', 'local')
+    app.config['S3_BUCKET'] = os.getenv('S3_BUCKET')
+    app.config['S3_ENDPOINT_URL'] = os.getenv('S3_ENDPOINT_URL')
+    app.config['S3_PUBLIC_URL'] = os.getenv('S3_PUBLIC_URL')
+
+    init_database(app, db)
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+
+    app.config['BACKGROUND_SERVICES'] = background_services() if background is None else background
+
+    # Fronta úloh na pozadí (AI analýza a odhad ceny)
+    init_jobs(app, start=app.config['BACKGROUND_SERVICES'])
+
+    # Dispečer odchozích e-mailů (ověření registrace)
+    init_email(app, start=app.config['BACKGROUND_SERVICES'])
+
+    # Měření požadavků po fázích: Server-Timing, /metrics a profiler pomalých požadavků
+    init_metrics(app)
 
-# Blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(order_bp, url_prefix='/api')
+    # Statické soubory s hashem v názvu a předkomprimované (viz utils/assets.py)
+    app.extensions['static_assets'] = StaticAssets(app.static_folder, ASSETS_BUILD_DIR)
 
-# Database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
+    register_commands(app)
+    register_static_routes(app)
+    return app
 
-db.init_app(app)
-with app.app_context():
-    db.create_all()
+# ---------- CLI ----------
+def register_commands(app):
+    @app.cli.command('precompute-matches')
+    @click.option('--top', default=20, help='Počet doporučených zakázek na brigádníka')
+    def precompute_matches(top):
+        """Přestaví index párování a uloží doporučení pro všechny brigádníky (GET /api/matching/orders)."""
+        index = get_matching_index(max_age=0)
+        start = time.perf_counter()
+        recommendations = index.precompute_recommendations(top_n=top)
+        save_recommendations(recommendations)
+        click.echo(f"{len(recommendations)} brigádníků × {len(index.orders)} zakázek za {time.perf_counter() - start:.2f} s")
+
+    @app.cli.command('send-emails')
+    @click.option('--retry-dead', 'retry_dead_letters', is_flag=True, help='Znovu zařadit e-maily, které vyčerpaly pokusy.')
+    def send_emails_command(retry_dead_letters):
+        """Odešle e-maily z fronty, které jsou na řadě, a vypíše stav fronty."""
+        if retry_dead_letters:
+            click.echo(f"Znovu zařazeno: {retry_dead()}")
+        backend = create_email_backend(app.config)
+        while process_outbox(backend, max_attempts=app.config['EMAIL_MAX_ATTEMPTS']):
+            pass
+        click.echo(json.dumps(outbox_stats()))
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Sestaví statické soubory s hashem v názvu a předkomprimované varianty."""
+        manifest = build_assets(app.static_folder, ASSETS_BUILD_DIR)
+        click.echo(json.dumps(manifest, indent=2))
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Přepočítá materializované statistiky z tabulek order a user."""
+        counters = rebuild_stats()
+        click.echo(json.dumps(counters))
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Znovu sestaví fulltextový index zakázek (FTS5)."""
+        rebuild_search_index()
+        click.echo('Index zakázek přestavěn')
+
+    @app.cli.command('reprice-orders')
+    @click.option('--batch-size', type=int, default=None, help='Zakázek na jedno volání OpenAI (výchozí PRICE_BATCH_SIZE)')
+    @click.option('--concurrency', type=int, default=None, help='Současně běžících dávek (výchozí REPRICE_CONCURRENCY)')
+    @click.option('--use-cache', is_flag=True, help='Použít uložené odhady (jinak se přepočítají a přepíšou).')
+    def reprice_orders_command(batch_size, concurrency, use_cache):
+        """Přecení otevřené zakázky hromadným odhadem ceny."""
+        def progress(summary):
+            click.echo(f"{summary['done']}/{summary['total']} zakázek, změněno {summary['updated']}, "
+                       f"{summary['seconds']:.1f} s", err=True)
+
+        summary = reprice_open_orders(batch_size, concurrency, use_cache, progress=progress)
+        click.echo(json.dumps(summary))
+
+    @app.cli.command('evaluate-price-model')
+    @click.option('--test-fraction', default=0.2, help='Podíl nejnovějších zakázek pro vyhodnocení')
+    @click.option('--limit', type=int, default=None, help='Nejvýše zakázek z historie (výchozí PRICE_MODEL_MAX_SAMPLES)')
+    def evaluate_price_model_command(test_fraction, limit):
+        """Vyhodnotí lokální model ceny proti finálním cenám nejnovějších zakázek."""
+        try:
+            report = evaluate_price_model(test_fraction, limit)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(json.dumps(report, indent=2))
 
 # ---------- Static routes ----------
-@app.route('/uploads/<filename>')
-def uploaded_file(filename):
-    uploads_dir = os.path.join(app.static_folder, 'uploads')
-    return send_from_directory(uploads_dir, filename)
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+def register_static_routes(app):
+    static_assets = app.extensions['static_assets']
+
+    @app.route('/uploads/<filename>')
+    def uploaded_file(filename):
+        return get_storage().send(filename)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        # Neznámé cesty vrací index.html (routování na straně klienta)
+        entry = static_assets.get(path) or static_assets.get('index.html')
+        if entry is None:
             return "index.html not found", 404
+        return static_assets.send(entry)
+
+# Podprocesy poolů fotek a hesel (spawn) importují spuštěný skript znovu jako
+# __mp_main__ - aplikace se v nich nesmí vytvořit podruhé (migrace, obnova
+# fronty úloh, dispečer e-mailů)
+if __name__ != '__mp_main__':
+    app = create_app()
 
 # ---------- Run ----------
 if __name__ == '__main__':
+    app.extensions['static_assets'].auto_reload = True  # Změny v src/static se projeví bez restartu
     app.run(host='0.0.0.0', port=5000, debug=True)
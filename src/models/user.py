@@ -1,11 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.utils.passwords import hash_password, verify_password
 from datetime import datetime
 import secrets
+import json
 
 db = SQLAlchemy()
 
 class User(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_verification_token', 'verification_token'),
+        db.Index('ix_user_role_approved', 'role', 'is_approved'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     # Základní údaje
     jmeno = db.Column(db.String(80), nullable=False)
@@ -30,6 +36,10 @@ class User(db.Model):
     # Nastavení zákazníka
     potrebuje_pomoc = db.Column(db.Boolean, default=False)  # "Moc tomu nerozumím"
     
+    # Agregát hodnocení (udržuje utils/ratings.py) - brigádník od zákazníků, zákazník od brigádníků
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    
     # Časové značky
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -40,10 +50,10 @@ class User(db.Model):
     worker_ratings = db.relationship('Rating', backref='rated_worker', lazy=True, foreign_keys='Rating.worker_id')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
     
     def generate_verification_token(self):
         self.verification_token = secrets.token_urlsafe(32)
@@ -56,6 +66,10 @@ class User(db.Model):
             return True
         return False
 
+    @property
+    def rating_average(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else None
+
     def __repr__(self):
         return f'<User {self.jmeno} {self.prijmeni}>'
 
@@ -73,21 +87,37 @@ class User(db.Model):
             'datum_narozeni': self.datum_narozeni.isoformat() if self.datum_narozeni else None,
             'volne_dny': self.volne_dny,
             'potrebuje_pomoc': self.potrebuje_pomoc,
+            'rating_average': self.rating_average,
+            'rating_count': self.rating_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 class Order(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_customer_created', 'customer_id', 'created_at'),
+        db.Index('ix_order_worker_created', 'worker_id', 'created_at'),
+        db.Index('ix_order_status_created', 'status', 'created_at'),
+        db.Index('ix_order_created', 'created_at', 'id'),
+        db.Index('ix_order_status_price', 'status', 'final_price'),
+        db.Index('ix_order_status_geo_cell', 'status', 'geo_cell'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     adresa = db.Column(db.String(500), nullable=False)
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    geo_cell = db.Column(db.Integer, nullable=True)  # Buňka prostorové mřížky (viz utils/geo.py)
     photo_filename = db.Column(db.String(255), nullable=True)
+    photo_variants = db.Column(db.Text, nullable=True)  # Zmenšené varianty fotky (JSON, viz utils/images.py)
+    photo_sha256 = db.Column(db.String(64), nullable=True)  # Fotka v úložišti (PhotoBlob), NULL u starých zakázek
     ai_analysis = db.Column(db.Text, nullable=True)  # AI analýza obrázku
     ma_vse_potrebne = db.Column(db.Boolean, default=False)  # Má zákazník vše potřebné
     estimated_price = db.Column(db.Float, nullable=True)  # Odhadovaná cena
+    analysis_status = db.Column(db.String(20), default='pending')  # 'pending', 'running', 'done', 'failed'
     final_price = db.Column(db.Float, nullable=True)  # Finální cena
+    final_price_confirmed = db.Column(db.Boolean, default=False)  # Finální cenu zadal brigádník (ne převzatý odhad)
     status = db.Column(db.String(20), default='open')  # 'open', 'taken', 'completed', 'paid'
     payment_status = db.Column(db.String(20), default='pending')  # 'pending', 'partial', 'completed'
     customer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -99,8 +129,16 @@ class Order(db.Model):
     def __repr__(self):
         return f'<Order {self.title}>'
 
-    def to_dict(self):
-        return {
+    # Pole, která lze vyžádat přes ?fields= (projekce v GET /api/orders)
+    DICT_FIELDS = (
+        'id', 'title', 'description', 'adresa', 'latitude', 'longitude', 'photo_filename', 'photo_variants',
+        'ai_analysis', 'ma_vse_potrebne', 'estimated_price', 'analysis_status', 'final_price',
+        'status', 'payment_status', 'customer_id', 'worker_id', 'customer_name', 'worker_name',
+        'worker_rating', 'created_at', 'taken_at', 'completed_at'
+    )
+
+    def to_dict(self, fields=None):
+        data = {
             'id': self.id,
             'title': self.title,
             'description': self.description,
@@ -108,22 +146,56 @@ class Order(db.Model):
             'latitude': self.latitude,
             'longitude': self.longitude,
             'photo_filename': self.photo_filename,
+            'photo_variants': json.loads(self.photo_variants) if self.photo_variants else None,
             'ai_analysis': self.ai_analysis,
             'ma_vse_potrebne': self.ma_vse_potrebne,
             'estimated_price': self.estimated_price,
+            'analysis_status': self.analysis_status,
             'final_price': self.final_price,
             'status': self.status,
             'payment_status': self.payment_status,
             'customer_id': self.customer_id,
             'worker_id': self.worker_id,
-            'customer_name': f"{self.customer.jmeno} {self.customer.prijmeni}" if self.customer else None,
-            'worker_name': f"{self.worker.jmeno} {self.worker.prijmeni}" if self.worker else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'taken_at': self.taken_at.isoformat() if self.taken_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
         }
+        # Jména se načítají přes vztahy - jen pokud jsou potřeba
+        if fields is None or 'customer_name' in fields:
+            data['customer_name'] = f"{self.customer.jmeno} {self.customer.prijmeni}" if self.customer else None
+        if fields is None or 'worker_name' in fields:
+            data['worker_name'] = f"{self.worker.jmeno} {self.worker.prijmeni}" if self.worker else None
+        if fields is None or 'worker_rating' in fields:
+            data['worker_rating'] = self.worker.rating_average if self.worker else None
+        if fields is not None:
+            data = {field: data[field] for field in fields}
+        return data
+
+class PhotoBlob(db.Model):
+    """Fotka uložená podle SHA-256 obsahu, sdílená zakázkami se stejnou fotkou"""
+    __tablename__ = 'photo_blob'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    filename = db.Column(db.String(80), nullable=True)  # Originál (po zmenšení na varianty smazán)
+    variants = db.Column(db.Text, nullable=True)  # Zmenšené varianty (JSON, viz utils/images.py)
+    refs = db.Column(db.Integer, nullable=False, default=0)  # Počet zakázek s touto fotkou
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def files(self):
+        """Všechny soubory fotky v úložišti"""
+        files = [self.filename] if self.filename else []
+        if self.variants:
+            variants = json.loads(self.variants)
+            files += list(variants['jpeg'].values()) + list(variants['webp'].values())
+        return files
 
 class Rating(db.Model):
+    __table_args__ = (
+        db.Index('ix_rating_worker', 'worker_id', 'worker_rating'),
+        db.Index('ix_rating_customer', 'customer_id', 'customer_rating'),
+        db.Index('ix_rating_order', 'order_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -150,3 +222,119 @@ class Rating(db.Model):
         }
 email_verified = db.Column(db.Boolean, default=False)
 email_token = db.Column(db.String(255), nullable=True)
+
+class Job(db.Model):
+    """Úloha ve frontě na pozadí (přežije restart aplikace)"""
+    __table_args__ = (
+        db.Index('ix_job_status_started', 'status', 'started_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # např. 'order_analysis'
+    payload = db.Column(db.Text, nullable=False)  # JSON string
+    status = db.Column(db.String(20), default='queued')  # 'queued', 'running', 'done', 'failed'
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    progress = db.Column(db.Text, nullable=True)  # JSON string (viz jobs.report_progress)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'progress': json.loads(self.progress) if self.progress else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class EmailOutbox(db.Model):
+    """Odchozí e-mail čekající na odeslání dispečerem (viz utils/email_utils.py)"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='queued')  # 'queued', 'sending', 'sent', 'dead'
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'to_email': self.to_email,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+class AICacheEntry(db.Model):
+    """Uložený výsledek AI volání (klíč = SHA-256 obsahu)"""
+    key = db.Column(db.String(64), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)  # 'image_analysis', 'price'
+    value = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'kind': self.kind,
+            'value': self.value,
+            'hits': self.hits,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None
+        }
+
+class StatsCounter(db.Model):
+    """Průběžně udržovaný součet pro admin statistiky (viz utils/stats.py)"""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+class StatsBucket(db.Model):
+    """Zakázky a tržby za den / týden"""
+    period = db.Column(db.String(10), primary_key=True)  # 'day', 'week'
+    bucket_start = db.Column(db.Date, primary_key=True)
+    orders_created = db.Column(db.Integer, nullable=False, default=0)
+    orders_paid = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'period': self.period,
+            'bucket_start': self.bucket_start.isoformat(),
+            'orders_created': self.orders_created,
+            'orders_paid': self.orders_paid,
+            'revenue': self.revenue
+        }
+
+class ResourceVersion(db.Model):
+    """Čítač změn zdroje pro ETagy a cache odpovědí (viz utils/http_cache.py)"""
+    __tablename__ = 'resource_version'
+    name = db.Column(db.String(50), primary_key=True)  # 'orders', 'order:12', 'ratings:7'
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class WorkerRecommendation(db.Model):
+    """Předpočítaná doporučení zakázek pro brigádníka (flask precompute-matches)"""
+    __tablename__ = 'worker_recommendation'
+    worker_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Text, nullable=False)  # JSON [[id zakázky, skóre, vzdálenost km], ...]
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
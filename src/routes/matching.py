@@ -0,0 +1,75 @@
+from flask import Blueprint, g, jsonify, request, session
+from src.models.user import User, Order, db
+from src.utils.matching import get_matching_index, stored_recommendations
+from src.routes.order import orders_query
+from src.utils.auth import require_role
+
+matching_bp = Blueprint('matching', __name__)
+
+MAX_RESULTS = 100
+
+@matching_bp.route('/matching/orders', methods=['GET'])
+@require_role('brigadnik', approved=True, error='Doporučení zakázek je pouze pro brigádníky')
+def recommend_orders():
+    """Otevřené zakázky doporučené přihlášenému brigádníkovi"""
+    user = g.identity
+    
+    try:
+        limit = min(int(request.args.get('limit', 20)), MAX_RESULTS)
+        lat = float(request.args['lat']) if request.args.get('lat') else None
+        lon = float(request.args['lon']) if request.args.get('lon') else None
+    except ValueError:
+        return jsonify({'error': 'Neplatný parametr'}), 400
+    
+    # Dávková doporučení jen bez vlastní polohy (ta mění vzdálenosti)
+    ranked = stored_recommendations(user.id) if lat is None else None
+    if ranked is None or len(ranked) < limit:
+        ranked = get_matching_index().rank_orders(user.id, limit=limit, lat=lat, lon=lon)
+    ranked = ranked[:limit]
+    
+    orders = {order.id: order for order in orders_query().filter(Order.id.in_([order_id for order_id, _, _ in ranked]))}
+    result = []
+    for order_id, score, distance in ranked:
+        if order_id not in orders or orders[order_id].status != 'open':
+            continue  # Zakázka mezitím přijata nebo smazána
+        data = orders[order_id].to_dict()
+        data['match_score'] = round(score, 3)
+        data['distance_km'] = round(distance, 2) if distance is not None else None
+        result.append(data)
+    return jsonify(result), 200
+
+@matching_bp.route('/matching/orders/<int:order_id>/workers', methods=['GET'])
+@require_role()
+def recommend_workers(order_id):
+    """Brigádníci nejvhodnější pro zakázku (admin nebo zákazník zakázky)"""
+    order = Order.query.get_or_404(order_id)
+    user = g.identity
+    if user.role != 'admin' and order.customer_id != session['user_id']:
+        return jsonify({'error': 'Nemáte oprávnění zobrazit tuto zakázku'}), 403
+    
+    try:
+        limit = min(int(request.args.get('limit', 20)), MAX_RESULTS)
+    except ValueError:
+        return jsonify({'error': 'Neplatný parametr'}), 400
+    
+    ranked = get_matching_index().rank_workers(order_id, limit=limit)
+    
+    # Index je až INDEX_TTL_SECONDS starý - brigádník mohl být mezitím smazán nebo ztratit schválení
+    workers = {worker.id: worker for worker in User.query.filter(
+        User.id.in_([worker_id for worker_id, _, _ in ranked]), User.role == 'brigadnik', User.is_approved.is_(True)
+    )}
+    result = []
+    for worker_id, score, distance in ranked:
+        worker = workers.get(worker_id)
+        if worker is None:
+            continue
+        result.append({
+            'id': worker.id,
+            'jmeno': worker.jmeno,
+            'prijmeni': worker.prijmeni,
+            'naradi': worker.naradi,
+            'volne_dny': worker.volne_dny,
+            'match_score': round(score, 3),
+            'distance_km': round(distance, 2) if distance is not None else None
+        })
+    return jsonify(result), 200
@@ -1,193 +1,417 @@
-from flask import Blueprint, jsonify, request, session
-from src.models.user import User, Order, Rating, db
-from werkzeug.utils import secure_filename
+from flask import Blueprint, Response, g, jsonify, request, session
+from src.models.user import User, Order, Rating, Job, db
+from sqlalchemy.orm import joinedload
 import os
 import json
-from datetime import datetime
-import openai
+import time
+import queue
 import base64
+import threading
+from datetime import datetime, timedelta
+from src.utils.ai_utils import analyze_image_with_ai, estimate_prices_batch, DEFAULT_PRICE
+from src.utils.jobs import job_handler, enqueue, dispatch
+from src.utils.ai_cache import cache_stats, invalidate
+from src.utils.geo import grid_cell, cell_ranges, haversine_km
+from src.utils.matching import order_opened, order_closed
+from src.utils.events import bus, publish_order_event, format_sse
+from src.utils.order_state import apply_transition, delete_open_order
+from src.utils.stats import record_order_created, record_order_paid, record_order_deleted, get_stats, get_series
+from src.utils.images import variant_files
+from src.utils.storage import get_storage, store_upload, ensure_variants, release_blob, purge_blob, delete_files
+from src.utils.auth import require_role
+from src.utils.ratings import set_rating, rating_summary
+from src.utils.http_cache import order_changed, conditional_get
+from src.utils.search import query_terms, search_order_ids
+from src.utils.repricing import REPRICE_CONCURRENCY
+from src.utils.price_model import estimate_order_price
 
 order_bp = Blueprint('order', __name__)
 
-UPLOAD_FOLDER = 'src/static/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def analyze_image_with_ai(image_path):
-    """Analýza obrázku pomocí OpenAI Vision API"""
-    try:
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-        
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Analyzuj tento obrázek zahradní práce. Popiš co vidíš, jaký typ práce je potřeba, odhadni obtížnost a dobu trvání. Odpověz v češtině."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=300
-        )
-        
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Chyba při analýze obrázku: {str(e)}"
+def orders_query():
+    """Dotaz na zakázky včetně jmen zákazníka a brigádníka v jednom SELECTu (bez N+1)"""
+    return Order.query.options(
+        joinedload(Order.customer).load_only(User.jmeno, User.prijmeni),
+        joinedload(Order.worker).load_only(User.jmeno, User.prijmeni, User.rating_count, User.rating_sum)
+    )
 
-def estimate_price(description, ai_analysis):
-    """Odhad ceny na základě popisu a AI analýzy"""
-    try:
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"""Na základě následujícího popisu práce a AI analýzy obrázku odhadni cenu v českých korunách.
-                    
-Popis práce: {description}
-AI analýza: {ai_analysis}
-
-Odpověz pouze číslem (cena v Kč) bez dalšího textu. Zohledni běžné ceny zahradních prací v ČR."""
-                }
-            ],
-            max_tokens=50
-        )
-        
-        price_text = response.choices[0].message.content.strip()
-        # Extrakce čísla z odpovědi
-        import re
-        price_match = re.search(r'\d+', price_text)
-        if price_match:
-            return float(price_match.group())
-        else:
-            return 500.0  # Výchozí cena
-    except Exception as e:
-        return 500.0  # Výchozí cena při chybě
+@job_handler('order_analysis', on_failure=lambda payload: _mark_analysis_failed(payload['order_id']))
+def run_order_analysis(payload):
+    """Úloha na pozadí: AI analýza fotky a odhad ceny zakázky"""
+    order = db.session.get(Order, payload['order_id'])
+    if order is None:
+        return  # Zakázka mezitím zrušena
+
+    order.analysis_status = 'running'
+    order_changed(order.id)
+    db.session.commit()
+
+    ai_analysis = None
+    if order.photo_sha256:
+        blob = ensure_variants(order.photo_sha256)
+        if blob is not None and blob.variants:
+            order.photo_filename = json.loads(blob.variants)['analysis']
+            order.photo_variants = blob.variants
+            order_changed(order.id)
+            db.session.commit()
+    photo_filename, description = order.photo_filename, order.description
+    ma_vse_potrebne, latitude, longitude = order.ma_vse_potrebne, order.latitude, order.longitude
+    db.session.commit()  # Na OpenAI se čeká bez spojení z poolu
+    if photo_filename:
+        with get_storage().local_path(photo_filename) as image_path:
+            ai_analysis = analyze_image_with_ai(image_path)
+    # Lokální model z historie cen, OpenAI jen při nízké spolehlivosti
+    estimated_price, _ = estimate_order_price(description, ai_analysis, ma_vse_potrebne, latitude, longitude)
+
+    order.ai_analysis = ai_analysis
+    order.estimated_price = estimated_price
+    order.analysis_status = 'done'
+    order_changed(order.id)
+    db.session.commit()
+    publish_order_event('updated', order)
+
+def _release_photo(order):
+    """Uvolní fotku mazané zakázky. Vrací funkci, která po commitu smaže
+    soubory, pokud fotku už nepoužívá jiná zakázka."""
+    if order.photo_sha256:
+        sha256 = order.photo_sha256
+        release_blob(sha256)
+        return lambda: purge_blob(sha256)
+    # Starší zakázky mají vlastní soubory mimo photo_blob
+    files = variant_files(json.loads(order.photo_variants) if order.photo_variants else None)
+    files += [order.photo_filename] if order.photo_filename else []
+    return lambda: delete_files(files)
+
+def _mark_analysis_failed(order_id):
+    order = db.session.get(Order, order_id)
+    if order is not None:
+        order.analysis_status = 'failed'
+        order.estimated_price = order.estimated_price or DEFAULT_PRICE
+        order_changed(order_id)
 
 @order_bp.route('/orders', methods=['POST'])
+@require_role('zakaznik', error='Pouze zákazníci mohou vytvářet zakázky')
 def create_order():
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
-    user = User.query.get(session['user_id'])
-    if user.role != 'zakaznik':
-        return jsonify({'error': 'Pouze zákazníci mohou vytvářet zakázky'}), 403
-    
     data = request.form
     
     required_fields = ['title', 'description', 'adresa']
     if not all(k in data for k in required_fields):
         return jsonify({'error': 'Chybí povinná pole'}), 400
     
-    # Zpracování nahrané fotky
+    # Zpracování nahrané fotky - uloží se pod hashem obsahu (stejná fotka jen jednou)
     photo_filename = None
-    ai_analysis = None
+    photo_sha256 = None
     
     if 'photo' in request.files:
         file = request.files['photo']
         if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Přidání timestamp pro jedinečnost
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-            filename = timestamp + filename
-            
-            # Vytvoření upload složky pokud neexistuje
-            os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-            
-            file_path = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(file_path)
-            photo_filename = filename
-            
-            # AI analýza obrázku
-            ai_analysis = analyze_image_with_ai(file_path)
-    
-    # Odhad ceny pomocí AI
-    estimated_price = estimate_price(data['description'], ai_analysis or "Bez obrázku")
-    
-    # Vytvoření zakázky
+            extension = file.filename.rsplit('.', 1)[1].lower()
+            photo_sha256, photo_filename = store_upload(file, extension)
+    
+    latitude = float(data.get('latitude', 0)) if data.get('latitude') else None
+    longitude = float(data.get('longitude', 0)) if data.get('longitude') else None
+    
+    # Vytvoření zakázky - AI analýza a odhad ceny proběhnou na pozadí
     order = Order(
         title=data['title'],
         description=data['description'],
         adresa=data['adresa'],
-        latitude=float(data.get('latitude', 0)) if data.get('latitude') else None,
-        longitude=float(data.get('longitude', 0)) if data.get('longitude') else None,
+        latitude=latitude,
+        longitude=longitude,
+        geo_cell=grid_cell(latitude, longitude),
         photo_filename=photo_filename,
-        ai_analysis=ai_analysis,
+        photo_sha256=photo_sha256,
         ma_vse_potrebne=data.get('ma_vse_potrebne', 'false').lower() == 'true',
-        estimated_price=estimated_price,
+        analysis_status='pending',
         customer_id=session['user_id']
     )
     
     db.session.add(order)
+    db.session.flush()
+    job = enqueue('order_analysis', {'order_id': order.id})
+    record_order_created(order)
+    order_changed(order.id)
     db.session.commit()
+    dispatch(job.id)
+    order_opened(order)
+    publish_order_event('created', order)
     
     return jsonify({
         'message': 'Zakázka vytvořena',
         'order': order.to_dict()
     }), 201
 
+@order_bp.route('/orders/<int:order_id>/analysis', methods=['GET'])
+@require_role()
+@conditional_get('order:{order_id}')
+def get_order_analysis(order_id):
+    """Stav AI analýzy zakázky (pro polling z klienta)"""
+    order = Order.query.get_or_404(order_id)
+    user = g.identity
+    
+    if user.role != 'admin' and order.customer_id != session['user_id'] and order.worker_id != session['user_id']:
+        return jsonify({'error': 'Nemáte oprávnění zobrazit tuto zakázku'}), 403
+    
+    return jsonify({
+        'order_id': order.id,
+        'analysis_status': order.analysis_status,
+        'ai_analysis': order.ai_analysis,
+        'estimated_price': order.estimated_price
+    }), 200
+
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(order):
+    """Kurzor pro stránkování podle (created_at, id)"""
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(order_id)
+
+def parse_date_arg(value, end=False):
+    """Datum nebo datum+čas v ISO formátu; samotné datum 'do' zahrnuje celý den"""
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def apply_order_filters(query, args):
+    """Filtry ?status=, ?created_from=, ?created_to=, ?price_min=, ?price_max="""
+    if args.get('status'):
+        query = query.filter(Order.status.in_(args['status'].split(',')))
+    if args.get('created_from'):
+        query = query.filter(Order.created_at >= parse_date_arg(args['created_from']))
+    if args.get('created_to'):
+        query = query.filter(Order.created_at < parse_date_arg(args['created_to'], end=True))
+
+    price = db.func.coalesce(Order.final_price, Order.estimated_price)
+    if args.get('price_min'):
+        query = query.filter(price >= float(args['price_min']))
+    if args.get('price_max'):
+        query = query.filter(price <= float(args['price_max']))
+    return query
+
 @order_bp.route('/orders', methods=['GET'])
+@require_role()
+@conditional_get('orders', 'ratings')
 def get_orders():
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
-    user = User.query.get(session['user_id'])
+    """Seznam zakázek podle role.
+
+    Volitelně stránkovaný (?limit=, ?cursor=; další kurzor je v hlavičce
+    X-Next-Cursor), filtrovaný (viz apply_order_filters) a s projekcí ?fields=.
+    """
+    user = g.identity
+    
+    fields = None
+    if request.args.get('fields'):
+        fields = request.args['fields'].split(',')
+        if any(field not in Order.DICT_FIELDS for field in fields):
+            return jsonify({'error': 'Neplatné pole v parametru fields'}), 400
+    
+    # Jména (a hodnocení brigádníka) se joinují jen pokud jsou ve výstupu
+    if fields is None or {'customer_name', 'worker_name', 'worker_rating'} & set(fields):
+        query = orders_query()
+    else:
+        query = Order.query
     
     if user.role == 'zakaznik':
         # Zákazník vidí pouze své zakázky
-        orders = Order.query.filter_by(customer_id=session['user_id']).order_by(Order.created_at.desc()).all()
+        query = query.filter_by(customer_id=session['user_id'])
     elif user.role == 'brigadnik':
         if not user.is_approved:
             return jsonify({'error': 'Váš účet brigádníka ještě nebyl schválen'}), 403
         # Brigádník vidí všechny otevřené zakázky a své přijaté
-        orders = Order.query.filter(
+        query = query.filter(
             (Order.status == 'open') | (Order.worker_id == session['user_id'])
-        ).order_by(Order.created_at.desc()).all()
+        )
     elif user.role == 'admin':
         # Admin vidí všechny zakázky
-        orders = Order.query.order_by(Order.created_at.desc()).all()
+        pass
     else:
         return jsonify({'error': 'Neplatná role'}), 403
     
-    return jsonify([order.to_dict() for order in orders])
+    try:
+        query = apply_order_filters(query, request.args)
+        if request.args.get('cursor'):
+            cursor_created_at, cursor_id = decode_cursor(request.args['cursor'])
+            query = query.filter(
+                (Order.created_at < cursor_created_at) |
+                ((Order.created_at == cursor_created_at) & (Order.id < cursor_id))
+            )
+        limit = min(int(request.args['limit']), MAX_PAGE_SIZE) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({'error': 'Neplatný parametr filtru nebo kurzoru'}), 400
+    
+    query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    
+    if limit is None:
+        orders = query.all()
+        return jsonify([order.to_dict(fields) for order in orders])
+    
+    # Načteme o jednu navíc, abychom věděli, jestli existuje další stránka
+    orders = query.limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    
+    response = jsonify([order.to_dict(fields) for order in orders])
+    if has_more:
+        response.headers['X-Next-Cursor'] = encode_cursor(orders[-1])
+    return response
+
+@order_bp.route('/orders/search', methods=['GET'])
+@require_role(approved=True)
+@conditional_get('orders', 'ratings')
+def search_orders():
+    """Fulltextové hledání (?q=) v zakázkách viditelných pro uživatele, řazené
+    podle relevance. Stránkování ?limit=, ?cursor= (další kurzor je v hlavičce
+    X-Next-Cursor), volitelně ?status=."""
+    user = g.identity
+    q = request.args.get('q', '')
+    if not query_terms(q):
+        return jsonify({'error': 'Chybí hledaný text'}), 400
+    try:
+        limit = min(int(request.args.get('limit', 20)), MAX_PAGE_SIZE)
+        offset = int(request.args['cursor']) if request.args.get('cursor') else 0
+    except ValueError:
+        return jsonify({'error': 'Neplatný parametr'}), 400
+    statuses = request.args['status'].split(',') if request.args.get('status') else None
+    
+    # O jeden výsledek navíc, abychom věděli, jestli existuje další stránka
+    rows = search_order_ids(q, user.id, user.role, statuses, limit + 1, offset)
+    orders = {order.id: order for order in orders_query().filter(Order.id.in_([order_id for order_id, _ in rows[:limit]]))}
+    result = []
+    for order_id, score in rows[:limit]:
+        if order_id in orders:  # Mezitím smazaná zakázka
+            result.append(dict(orders[order_id].to_dict(), search_score=score))
+    
+    response = jsonify(result)
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = str(offset + limit)
+    return response
+
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = 300  # Pak se klient (EventSource) sám znovu připojí
+# Každý stream drží jedno vlákno gthread workeru (WEB_THREADS), proto jich
+# proces pustí nejvýše tolik, aby zbyla vlákna pro ostatní požadavky.
+# Další klienti dostanou 503 a seznam zakázek si obnovují dotazováním.
+STREAM_MAX_CONNECTIONS = int(os.getenv('STREAM_MAX_CONNECTIONS', 8))
+STREAM_RETRY_AFTER_SECONDS = 60
+
+_stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONNECTIONS)
+
+@order_bp.route('/orders/stream', methods=['GET'])
+@require_role(approved=True)
+def stream_orders():
+    """Server-Sent Events se změnami zakázek viditelných pro přihlášeného uživatele"""
+    user_id, role = g.identity.id, g.identity.role
+    db.session.close()  # Spojení s DB se po dobu streamu nedrží
+    
+    if not _stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Příliš mnoho otevřených streamů, zkuste to později'})
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER_SECONDS)
+        return response, 503
+    
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0) or None
+    except ValueError:
+        last_event_id = None
+    
+    def generate():
+        subscriber, missed = bus.subscribe(last_event_id)
+        try:
+            yield 'retry: 3000\n\n'
+            for event in missed:
+                message = format_sse(event, user_id, role)
+                if message:
+                    yield message
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event = subscriber.get(timeout=min(STREAM_HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                message = format_sse(event, user_id, role)
+                if message:
+                    yield message
+        finally:
+            bus.unsubscribe(subscriber)
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Místo se uvolní při uzavření odpovědi, i když se generátor nespustil
+    response.call_on_close(_stream_slots.release)
+    return response
+
+MAX_RADIUS_KM = 300
+
+@order_bp.route('/orders/nearby', methods=['GET'])
+@require_role('brigadnik', 'admin', approved=True, error='Pouze brigádníci mohou hledat zakázky v okolí')
+def get_nearby_orders():
+    """Otevřené zakázky v okolí bodu (?lat=, ?lon=, ?radius_km=) seřazené podle vzdálenosti"""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius_km = min(float(request.args.get('radius_km', 20)), MAX_RADIUS_KM)
+        limit = min(int(request.args.get('limit', 50)), MAX_PAGE_SIZE)
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Chybí nebo je neplatné lat, lon, radius_km'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius_km <= 0:
+        return jsonify({'error': 'Souřadnice mimo rozsah'}), 400
+    
+    # Předvýběr podle buněk mřížky (index status, geo_cell), pak přesná vzdálenost
+    candidates = db.session.query(Order.id, Order.latitude, Order.longitude).filter(
+        Order.status == 'open',
+        db.or_(*[Order.geo_cell.between(first, last) for first, last in cell_ranges(lat, lon, radius_km)])
+    ).all()
+    
+    nearby = []
+    for order_id, order_lat, order_lon in candidates:
+        distance = haversine_km(lat, lon, order_lat, order_lon)
+        if distance <= radius_km:
+            nearby.append((distance, order_id))
+    nearby.sort()
+    nearby = nearby[:limit]
+    
+    # Celé zakázky se načítají jen pro vrácenou stránku
+    orders = {order.id: order for order in orders_query().filter(Order.id.in_([order_id for _, order_id in nearby]))}
+    result = []
+    for distance, order_id in nearby:
+        data = orders[order_id].to_dict()
+        data['distance_km'] = round(distance, 2)
+        result.append(data)
+    return jsonify(result), 200
 
 @order_bp.route('/orders/<int:order_id>/take', methods=['POST'])
+@require_role('brigadnik', approved=True, error='Pouze brigádníci mohou přijímat zakázky')
 def take_order(order_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
-    user = User.query.get(session['user_id'])
-    if user.role != 'brigadnik':
-        return jsonify({'error': 'Pouze brigádníci mohou přijímat zakázky'}), 403
-    
-    if not user.is_approved:
-        return jsonify({'error': 'Váš účet brigádníka ještě nebyl schválen'}), 403
-    
     order = Order.query.get_or_404(order_id)
     
+    # Stejná odpověď jako při prohraném souběhu níže - klient nerozliší, jestli
+    # ho jiný brigádník předběhl před načtením zakázky, nebo až při zápisu
     if order.status != 'open':
-        return jsonify({'error': 'Zakázka již není dostupná'}), 400
-    
-    order.worker_id = session['user_id']
-    order.status = 'taken'
-    order.taken_at = datetime.utcnow()
-    order.payment_status = 'partial'  # Zákazník platí 1/3
+        return jsonify({'error': 'Zakázka již není dostupná'}), 409
+    
+    # Podmíněný UPDATE - ze souběžných brigádníků uspěje jen jeden
+    taken = apply_transition(order_id, 'take', values={
+        'worker_id': session['user_id'],
+        'taken_at': datetime.utcnow(),
+        'payment_status': 'partial'  # Zákazník platí 1/3
+    })
+    if not taken:
+        db.session.rollback()
+        return jsonify({'error': 'Zakázka již není dostupná'}), 409
     db.session.commit()
+    order_closed(order.id)
+    publish_order_event('updated', order)
     
     return jsonify({
         'message': 'Zakázka přijata. Zákazník bude požádán o zaplacení 1/3 částky.',
@@ -196,10 +420,8 @@ def take_order(order_id):
     }), 200
 
 @order_bp.route('/orders/<int:order_id>/update-price', methods=['PUT'])
+@require_role()
 def update_price(order_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
     order = Order.query.get_or_404(order_id)
     
     # Pouze brigádník, který si zakázku vzal, může upravit cenu
@@ -214,7 +436,10 @@ def update_price(order_id):
         return jsonify({'error': 'Chybí nová cena'}), 400
     
     order.final_price = float(data['price'])
+    order.final_price_confirmed = True
+    order_changed(order_id)
     db.session.commit()
+    publish_order_event('updated', order)
     
     return jsonify({
         'message': 'Cena zakázky aktualizována',
@@ -222,10 +447,8 @@ def update_price(order_id):
     }), 200
 
 @order_bp.route('/orders/<int:order_id>/complete', methods=['POST'])
+@require_role()
 def complete_order(order_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
     order = Order.query.get_or_404(order_id)
     
     # Pouze brigádník, který si zakázku vzal, ji může dokončit
@@ -236,13 +459,19 @@ def complete_order(order_id):
         return jsonify({'error': 'Zakázka není ve stavu "přijato"'}), 400
     
     data = request.json
-    final_price = data.get('final_price', order.estimated_price)
-    
-    order.status = 'completed'
-    order.final_price = float(final_price) if final_price else order.estimated_price
-    order.completed_at = datetime.utcnow()
-    order.payment_status = 'pending_final'  # Čeká na doplacení zbytku
+    final_price = data.get('final_price')
+    
+    completed = apply_transition(order_id, 'complete', worker_id=session['user_id'], values={
+        'final_price': float(final_price) if final_price else order.estimated_price,
+        'final_price_confirmed': bool(final_price),  # Jinak převzatý odhad - model ceny se z něj neučí
+        'completed_at': datetime.utcnow(),
+        'payment_status': 'pending_final'  # Čeká na doplacení zbytku
+    })
+    if not completed:
+        db.session.rollback()
+        return jsonify({'error': 'Zakázka není ve stavu "přijato"'}), 409
     db.session.commit()
+    publish_order_event('updated', order)
     
     remaining_payment = order.final_price - (order.estimated_price / 3 if order.estimated_price else 0)
     
@@ -253,23 +482,25 @@ def complete_order(order_id):
     }), 200
 
 @order_bp.route('/orders/<int:order_id>/cancel', methods=['POST'])
+@require_role()
 def cancel_order(order_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
     order = Order.query.get_or_404(order_id)
-    user = User.query.get(session['user_id'])
+    user = g.identity
     
     # Brigádník může zrušit svou přijatou zakázku
     if user.role == 'brigadnik' and order.worker_id == session['user_id']:
         if order.status != 'taken':
             return jsonify({'error': 'Lze zrušit pouze přijatou zakázku'}), 400
         
-        order.worker_id = None
-        order.status = 'open'
-        order.taken_at = None
-        order.payment_status = 'pending'
+        released = apply_transition(order_id, 'release', worker_id=session['user_id'], values={
+            'worker_id': None, 'taken_at': None, 'payment_status': 'pending'
+        })
+        if not released:
+            db.session.rollback()
+            return jsonify({'error': 'Lze zrušit pouze přijatou zakázku'}), 409
         db.session.commit()
+        order_opened(order)
+        publish_order_event('updated', order)
         
         return jsonify({
             'message': 'Zakázka zrušena a vrácena do seznamu dostupných',
@@ -281,25 +512,26 @@ def cancel_order(order_id):
         if order.status != 'open':
             return jsonify({'error': 'Lze zrušit pouze otevřenou zakázku'}), 400
         
-        # Smazání fotky pokud existuje
-        if order.photo_filename:
-            photo_path = os.path.join(UPLOAD_FOLDER, order.photo_filename)
-            if os.path.exists(photo_path):
-                os.remove(photo_path)
-        
-        db.session.delete(order)
+        record_order_deleted(order)
+        delete_photo = _release_photo(order)
+        if not delete_open_order(order_id, customer_id=session['user_id']):
+            db.session.rollback()
+            return jsonify({'error': 'Lze zrušit pouze otevřenou zakázku'}), 409
         db.session.commit()
         
+        # Smazání fotky, pokud ji už nepoužívá jiná zakázka
+        delete_photo()
+        order_closed(order_id)
+        publish_order_event('deleted', order_id=order_id)
+        
         return jsonify({'message': 'Zakázka zrušena'}), 200
     
     else:
         return jsonify({'error': 'Nemáte oprávnění zrušit tuto zakázku'}), 403
 
 @order_bp.route('/orders/<int:order_id>/pay', methods=['POST'])
+@require_role()
 def pay_order(order_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
     order = Order.query.get_or_404(order_id)
     
     # Pouze zákazník, který zakázku vytvořil, může platit
@@ -309,17 +541,22 @@ def pay_order(order_id):
     data = request.json
     payment_type = data.get('payment_type', 'full')  # 'partial' nebo 'full'
     
-    if payment_type == 'partial' and order.status == 'taken':
+    if payment_type == 'partial':
         # Částečná platba (1/3) při přijetí zakázky
-        order.payment_status = 'partial'
-    elif payment_type == 'full' and order.status == 'completed':
+        paid = apply_transition(order_id, 'pay_partial', customer_id=session['user_id'], values={'payment_status': 'partial'})
+    elif payment_type == 'full':
         # Doplacení zbytku po dokončení
-        order.payment_status = 'completed'
-        order.status = 'paid'
+        paid = apply_transition(order_id, 'pay', customer_id=session['user_id'], values={'payment_status': 'completed'})
+        if paid:
+            record_order_paid(order)
     else:
-        return jsonify({'error': 'Neplatný typ platby nebo stav zakázky'}), 400
+        paid = False
     
+    if not paid:
+        db.session.rollback()
+        return jsonify({'error': 'Neplatný typ platby nebo stav zakázky'}), 400
     db.session.commit()
+    publish_order_event('updated', order)
     
     return jsonify({
         'message': 'Platba proběhla úspěšně',
@@ -327,17 +564,18 @@ def pay_order(order_id):
     }), 200
 
 @order_bp.route('/orders/<int:order_id>/rate', methods=['POST'])
+@require_role()
 def rate_order(order_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
     order = Order.query.get_or_404(order_id)
-    user = User.query.get(session['user_id'])
+    user = g.identity
     
     if order.status != 'paid':
         return jsonify({'error': 'Lze hodnotit pouze zaplacené zakázky'}), 400
     
     data = request.json
+    value = data.get('rating')
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= 5):
+        return jsonify({'error': 'Hodnocení musí být celé číslo 1-5'}), 400
     
     # Najít nebo vytvořit hodnocení
     rating = Rating.query.filter_by(order_id=order_id).first()
@@ -350,16 +588,16 @@ def rate_order(order_id):
         db.session.add(rating)
     
     if user.role == 'zakaznik' and order.customer_id == session['user_id']:
-        # Zákazník hodnotí brigádníka
-        rating.worker_rating = data.get('rating')
-        rating.worker_comment = data.get('comment', '')
+        side = 'worker'  # Zákazník hodnotí brigádníka
     elif user.role == 'brigadnik' and order.worker_id == session['user_id']:
-        # Brigádník hodnotí zákazníka
-        rating.customer_rating = data.get('rating')
-        rating.customer_comment = data.get('comment', '')
+        side = 'customer'  # Brigádník hodnotí zákazníka
     else:
         return jsonify({'error': 'Nemáte oprávnění hodnotit tuto zakázku'}), 403
     
+    # Hodnocení i agregát hodnoceného uživatele v jedné transakci
+    if not set_rating(rating, side, value, data.get('comment', '')):
+        db.session.rollback()
+        return jsonify({'error': 'Hodnocení bylo mezitím změněno, zkuste to znovu'}), 409
     db.session.commit()
     
     return jsonify({
@@ -368,12 +606,11 @@ def rate_order(order_id):
     }), 200
 
 @order_bp.route('/orders/<int:order_id>', methods=['GET'])
+@require_role()
+@conditional_get('order:{order_id}', 'ratings')
 def get_order(order_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
     order = Order.query.get_or_404(order_id)
-    user = User.query.get(session['user_id'])
+    user = g.identity
     
     # Kontrola oprávnění
     if user.role == 'admin':
@@ -385,86 +622,169 @@ def get_order(order_id):
     return jsonify(order.to_dict())
 
 @order_bp.route('/orders/<int:order_id>', methods=['DELETE'])
+@require_role()
 def delete_order(order_id):
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
     order = Order.query.get_or_404(order_id)
-    user = User.query.get(session['user_id'])
+    user = g.identity
     
     # Pouze admin nebo zákazník může smazat zakázku
     if user.role == 'admin':
         # Admin může smazat jakoukoli zakázku
-        pass
+        record_order_deleted(order)
+        delete_photo = _release_photo(order)
+        order_changed(order_id)
+        db.session.delete(order)
     elif user.role == 'zakaznik' and order.customer_id == session['user_id']:
         # Zákazník může smazat svou zakázku pouze pokud není přijata
         if order.status != 'open':
             return jsonify({'error': 'Nelze smazat zakázku, která již byla přijata'}), 400
+        record_order_deleted(order)
+        delete_photo = _release_photo(order)
+        if not delete_open_order(order_id, customer_id=session['user_id']):
+            db.session.rollback()
+            return jsonify({'error': 'Nelze smazat zakázku, která již byla přijata'}), 400
     else:
         return jsonify({'error': 'Nemáte oprávnění smazat tuto zakázku'}), 403
     
-    # Smazání fotky pokud existuje
-    if order.photo_filename:
-        photo_path = os.path.join(UPLOAD_FOLDER, order.photo_filename)
-        if os.path.exists(photo_path):
-            os.remove(photo_path)
-    
-    db.session.delete(order)
     db.session.commit()
     
+    # Smazání fotky, pokud ji už nepoužívá jiná zakázka
+    delete_photo()
+    order_closed(order_id)
+    publish_order_event('deleted', order_id=order_id)
+    
     return jsonify({'message': 'Zakázka smazána'}), 200
 
 @order_bp.route('/statistics', methods=['GET'])
+@require_role('admin', error='Pouze admin má přístup ke statistikám')
 def get_statistics():
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
+    # Základní statistiky z materializovaných čítačů (utils/stats.py)
+    stats = get_stats()
     
-    user = User.query.get(session['user_id'])
+    # Volitelně časová řada: ?series=day|week&buckets=30
+    period = request.args.get('series')
+    if period:
+        if period not in ('day', 'week'):
+            return jsonify({'error': 'Neplatné období (day, week)'}), 400
+        stats['series'] = get_series(period, min(request.args.get('buckets', 30, type=int), 366))
     
-    if user.role != 'admin':
-        return jsonify({'error': 'Pouze admin má přístup ke statistikám'}), 403
+    return jsonify(stats), 200
+
+@order_bp.route('/admin/ai-cache', methods=['GET'])
+@require_role('admin', error='Pouze admin má přístup ke cache')
+def get_ai_cache_stats():
+    """Statistiky cache AI analýz a odhadů cen"""
+    return jsonify(cache_stats()), 200
+
+@order_bp.route('/admin/ai-cache', methods=['DELETE'])
+@require_role('admin', error='Pouze admin má přístup ke cache')
+def invalidate_ai_cache():
+    """Zneplatnění cache (volitelně jen daný typ ?kind= nebo klíč ?key=)"""
+    deleted = invalidate(kind=request.args.get('kind'), key=request.args.get('key'))
     
-    # Základní statistiky
-    total_orders = Order.query.count()
-    completed_orders = Order.query.filter_by(status='paid').count()
-    total_revenue = db.session.query(db.func.sum(Order.final_price)).filter_by(status='paid').scalar() or 0
-    total_customers = User.query.filter_by(role='zakaznik').count()
-    total_workers = User.query.filter_by(role='brigadnik').count()
-    approved_workers = User.query.filter_by(role='brigadnik', is_approved=True).count()
+    return jsonify({'message': 'Cache zneplatněna', 'deleted': deleted}), 200
+
+MAX_ESTIMATE_ITEMS = 100
+
+@order_bp.route('/admin/price-estimates', methods=['POST'])
+@require_role('admin', error='Pouze admin může odhadovat ceny')
+def estimate_prices():
+    """Hromadný odhad cen bez zakázek: {"items": [{"description", "ai_analysis"}], "use_cache"}"""
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Chybí seznam items'}), 400
+    if len(items) > MAX_ESTIMATE_ITEMS:
+        return jsonify({'error': f'Nejvýše {MAX_ESTIMATE_ITEMS} položek'}), 400
+    if not all(isinstance(item, dict) and isinstance(item.get('description'), str) and item['description'].strip()
+               for item in items):
+        return jsonify({'error': 'Každá položka musí mít description'}), 400
+    
+    estimates = estimate_prices_batch([(item['description'], item.get('ai_analysis')) for item in items],
+                                      use_cache=data.get('use_cache', True) is not False)
+    return jsonify({'estimates': [{'price': price, 'source': source} for price, source in estimates]}), 200
+
+@order_bp.route('/admin/orders/reprice', methods=['POST'])
+@require_role('admin', error='Pouze admin může přecenit zakázky')
+def reprice_orders():
+    """Spustí přecenění otevřených zakázek na pozadí (průběh: GET /api/admin/jobs/<id>)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        batch_size = int(data['batch_size']) if data.get('batch_size') else None
+        concurrency = int(data['concurrency']) if data.get('concurrency') else REPRICE_CONCURRENCY
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Neplatný parametr'}), 400
+    if (batch_size is not None and not 1 <= batch_size <= MAX_ESTIMATE_ITEMS) or not 1 <= concurrency <= 16:
+        return jsonify({'error': f'batch_size musí být 1-{MAX_ESTIMATE_ITEMS}, concurrency 1-16'}), 400
+    
+    running = Job.query.filter(Job.kind == 'reprice_open_orders', Job.status.in_(('queued', 'running'))).first()
+    if running:
+        return jsonify({'error': 'Přecenění už běží', 'job': running.to_dict()}), 409
+    
+    job = enqueue('reprice_open_orders', {'batch_size': batch_size, 'concurrency': concurrency,
+                                          'use_cache': bool(data.get('use_cache', False))})
+    db.session.commit()
+    dispatch(job.id)
     
-    return jsonify({
-        'total_orders': total_orders,
-        'completed_orders': completed_orders,
-        'total_revenue': total_revenue,
-        'total_customers': total_customers,
-        'total_workers': total_workers,
-        'approved_workers': approved_workers,
-        'completion_rate': (completed_orders / total_orders * 100) if total_orders > 0 else 0
-    }), 200
+    return jsonify({'message': 'Přecenění spuštěno', 'job': job.to_dict()}), 202
+
+@order_bp.route('/admin/jobs/<int:job_id>', methods=['GET'])
+@require_role('admin', error='Pouze admin má přístup k úlohám')
+def get_job(job_id):
+    """Stav a průběh úlohy na pozadí"""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({'error': 'Úloha nenalezena'}), 404
+    return jsonify(job.to_dict()), 200
 
 @order_bp.route('/ratings/<int:user_id>', methods=['GET'])
+@require_role()
+@conditional_get('ratings:{user_id}')
 def get_user_ratings(user_id):
-    """Získání hodnocení konkrétního uživatele"""
-    if 'user_id' not in session:
-        return jsonify({'error': 'Nepřihlášen'}), 401
-    
+    """Hodnocení uživatele: agregát z tabulky user a historie - bez parametrů
+    celá, s ?limit= nebo ?cursor= po stránkách (další kurzor je v hlavičce
+    X-Next-Cursor)"""
     user = User.query.get_or_404(user_id)
     
     if user.role == 'brigadnik':
         # Hodnocení brigádníka od zákazníků
-        ratings = Rating.query.filter_by(worker_id=user_id).filter(Rating.worker_rating.isnot(None)).all()
-        avg_rating = db.session.query(db.func.avg(Rating.worker_rating)).filter_by(worker_id=user_id).scalar()
+        query = Rating.query.filter_by(worker_id=user_id).filter(Rating.worker_rating.isnot(None))
     elif user.role == 'zakaznik':
         # Hodnocení zákazníka od brigádníků
-        ratings = Rating.query.filter_by(customer_id=user_id).filter(Rating.customer_rating.isnot(None)).all()
-        avg_rating = db.session.query(db.func.avg(Rating.customer_rating)).filter_by(customer_id=user_id).scalar()
+        query = Rating.query.filter_by(customer_id=user_id).filter(Rating.customer_rating.isnot(None))
     else:
         return jsonify({'error': 'Neplatná role pro hodnocení'}), 400
     
+    paged = bool(request.args.get('limit') or request.args.get('cursor'))
+    try:
+        limit = min(int(request.args.get('limit', 20)), MAX_PAGE_SIZE) if paged else None
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'error': 'Neplatný parametr'}), 400
+    if cursor is not None:
+        query = query.filter(Rating.id < cursor)
+    query = query.order_by(Rating.id.desc())
+    ratings = query.limit(limit + 1).all() if paged else query.all()
+    
+    result = {'user_id': user_id, **rating_summary(user.rating_sum, user.rating_count),
+              'ratings': [rating.to_dict() for rating in ratings[:limit]]}
+    response = jsonify(result)
+    if paged and len(ratings) > limit:
+        response.headers['X-Next-Cursor'] = str(ratings[limit - 1].id)
+    return response, 200
+
+@order_bp.route('/ratings', methods=['GET'])
+@require_role()
+def get_ratings_bulk():
+    """Agregované hodnocení více uživatelů jedním dotazem (?user_ids=1,2,3)"""
+    try:
+        user_ids = {int(user_id) for user_id in request.args.get('user_ids', '').split(',') if user_id}
+    except ValueError:
+        return jsonify({'error': 'Neplatný parametr user_ids'}), 400
+    if len(user_ids) > MAX_PAGE_SIZE:
+        return jsonify({'error': f'Nejvýše {MAX_PAGE_SIZE} uživatelů'}), 400
+    
+    rows = db.session.query(User.id, User.rating_sum, User.rating_count).filter(User.id.in_(user_ids)).all()
     return jsonify({
-        'user_id': user_id,
-        'average_rating': round(avg_rating, 2) if avg_rating else None,
-        'total_ratings': len(ratings),
-        'ratings': [rating.to_dict() for rating in ratings]
+        str(user_id): rating_summary(rating_sum, rating_count) for user_id, rating_sum, rating_count in rows
     }), 200
-
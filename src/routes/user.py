@@ -1,33 +1,19 @@
 from flask import Blueprint, jsonify, request, session
 from src.models.user import User, db
+from src.utils.stats import record_user_created
 import json
 from datetime import datetime
 import secrets
-import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from src.utils.email_utils import queue_verification_email, wake_dispatcher
+from src.utils.metrics import timed
+from src.utils.passwords import PasswordHashingBusy, needs_rehash
 
 user_bp = Blueprint('user', __name__)
 
-# --- SendGrid klient ---
-sg = SendGridAPIClient(api_key=os.getenv("SENDGRID_API_KEY"))
-FROM_EMAIL = os.getenv("FROM_EMAIL", "rychleryce@gmail.com")
-
-def send_verification_email(user, verification_token):
-    """Odešle ověřovací e-mail přes SendGrid."""
-    verify_url = f"https://rychleryce2.onrender.com/api/verify-email/{verification_token}"
-    html = f"""
-    <h3>Ověřte svůj e-mail</h3>
-    <p>Klikněte na odkaz pro dokončení registrace:</p>
-    <a href="{verify_url}">{verify_url}</a>
-    """
-    mail = Mail(
-        from_email=FROM_EMAIL,
-        to_emails=user.email,
-        subject="Potvrďte svůj e-mail – Rychlé Rýče",
-        html_content=html
-    )
-    sg.send(mail)
+def hashing_busy():
+    response = jsonify({'error': 'Server je přetížen, zkuste to prosím za chvíli znovu'})
+    response.headers['Retry-After'] = '2'
+    return response, 503
 
 # ---------- REGISTRACE ----------
 @user_bp.route('/register', methods=['POST'])
@@ -55,7 +41,11 @@ def register():
         email=data['email'],
         role=data['role']
     )
-    user.set_password(data['password'])
+    try:
+        with timed('password'):
+            user.set_password(data['password'])
+    except PasswordHashingBusy:
+        return hashing_busy()
 
     if data['role'] == 'brigadnik':
         user.naradi = json.dumps(data['naradi'])
@@ -69,10 +59,12 @@ def register():
 
     user.verification_token = secrets.token_urlsafe(32)
     db.session.add(user)
-    db.session.commit()
-
+    record_user_created(user)
+    # E-mail se odešle na pozadí - registrace nečeká na SendGrid
     if data['role'] != 'admin':
-        send_verification_email(user, user.verification_token)
+        queue_verification_email(user)
+    db.session.commit()
+    wake_dispatcher()
 
     return jsonify({
         'message': 'Registrace úspěšná. Zkontrolujte svůj email pro potvrzení.',
@@ -97,13 +89,27 @@ def login():
         return jsonify({'error': 'Chybí email nebo heslo'}), 400
 
     user = User.query.filter_by(email=data['email']).first()
-    if not user or not user.check_password(data['password']):
+    try:
+        with timed('password'):
+            password_ok = user is not None and user.check_password(data['password'])
+    except PasswordHashingBusy:
+        return hashing_busy()
+    if not password_ok:
         return jsonify({'error': 'Neplatné údaje'}), 401
     if not user.email_verified:
         return jsonify({'error': 'Email nebyl ověřen'}), 403
     if user.role == 'brigadnik' and not user.is_approved:
         return jsonify({'error': 'Účet čeká na schválení'}), 403
 
+    # Hash se starými parametry přepočítat - heslo teď známe
+    if needs_rehash(user.password_hash):
+        try:
+            with timed('password'):
+                user.set_password(data['password'])
+            db.session.commit()
+        except PasswordHashingBusy:
+            db.session.rollback()  # Přepočítá se při dalším přihlášení
+
     session['user_id'] = user.id
     session['user_role'] = user.role
     return jsonify({'message': 'Přihlášení úspěšné', 'user': user.to_dict()}), 200
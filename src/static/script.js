@@ -1,6 +1,8 @@
 // Globální proměnné
 let currentUser = null;
 let currentOrders = [];
+let orderStream = null;
+let orderPollTimer = null;
 let map = null;
 let selectedLocation = null;
 let currentRegistrationEmail = null;
@@ -46,6 +48,9 @@ function setupEventListeners() {
     // Star rating
     setupStarRating();
     
+    // Hledání v zakázkách brigádníka
+    setupOrderSearch();
+    
     // Zavření modálů při kliknutí mimo
     window.addEventListener('click', function(event) {
         if (event.target.classList.contains('modal')) {
@@ -348,7 +353,9 @@ async function resendVerification() {
 async function logout() {
     try {
         await fetch(`${API_BASE}/logout`, { method: 'POST' });
+        stopOrderStream();
         currentUser = null;
+        currentOrders = [];
         showHomePage();
         showNotification('Odhlášení úspěšné', 'success');
     } catch (error) {
@@ -385,6 +392,8 @@ function showDashboard() {
         document.getElementById('adminDashboard').classList.remove('hidden');
         loadAdminData();
     }
+    
+    startOrderStream();
 }
 
 // Avatar pomocník
@@ -593,7 +602,11 @@ async function handleCreateOrder(event) {
         if (response.ok) {
             showNotification('Zakázka vytvořena! AI analyzuje obrázek a odhadne cenu.', 'success');
             event.target.reset();
-            loadCustomerOrders();
+            applyOrderEvent({ type: 'created', order: result.order });
+            // Výsledek analýzy přijde přes SSE; bez EventSource se stav dotazuje
+            if (!orderStream) {
+                pollOrderAnalysis(result.order.id);
+            }
             
             if (currentUser.potrebuje_pomoc) {
                 showAvatarHelper('Skvělé! Vaše zakázka byla vytvořena. AI analyzoval obrázek a odhadl cenu. Nyní čekejte na brigádníka, který si vaši zakázku vybere.');
@@ -606,63 +619,127 @@ async function handleCreateOrder(event) {
     }
 }
 
-// Načtení zakázek zákazníka
-async function loadCustomerOrders() {
+// Čekání na dokončení AI analýzy zakázky (běží na pozadí)
+async function pollOrderAnalysis(orderId, attempt = 0) {
+    if (attempt >= 30) return;
+    
     try {
-        const response = await fetch(`${API_BASE}/orders`);
-        const orders = await response.json();
+        const response = await fetch(`${API_BASE}/orders/${orderId}/analysis`);
+        if (!response.ok) return;
         
-        const container = document.getElementById('customerOrders');
-        container.innerHTML = '';
-        
-        if (orders.length === 0) {
-            container.innerHTML = '<p>Zatím nemáte žádné zakázky.</p>';
+        const result = await response.json();
+        if (result.analysis_status === 'done' || result.analysis_status === 'failed') {
+            loadCustomerOrders();
             return;
         }
-        
-        orders.forEach(order => {
-            const orderElement = createOrderElement(order, 'customer');
-            container.appendChild(orderElement);
-        });
+    } catch (error) {
+        return;
+    }
+    
+    setTimeout(() => pollOrderAnalysis(orderId, attempt + 1), 2000);
+}
+
+// Načtení zakázek zákazníka
+async function loadCustomerOrders() {
+    try {
+        const response = await fetch(`${API_BASE}/orders`);
+        currentOrders = await response.json();
+        renderCustomerOrders();
     } catch (error) {
         showNotification('Chyba při načítání zakázek', 'error');
     }
 }
 
+function renderCustomerOrders() {
+    const container = document.getElementById('customerOrders');
+    container.innerHTML = '';
+    
+    if (currentOrders.length === 0) {
+        container.innerHTML = '<p>Zatím nemáte žádné zakázky.</p>';
+        return;
+    }
+    
+    currentOrders.forEach(order => {
+        const orderElement = createOrderElement(order, 'customer');
+        container.appendChild(orderElement);
+    });
+}
+
 // Načtení zakázek brigádníka
 async function loadWorkerOrders() {
     try {
         const response = await fetch(`${API_BASE}/orders`);
-        const orders = await response.json();
-        
+        currentOrders = await response.json();
+        renderWorkerOrders();
+    } catch (error) {
+        showNotification('Chyba při načítání zakázek', 'error');
+    }
+}
+
+// Fulltextové hledání (GET /api/orders/search) - výsledky nahradí dostupné zakázky
+let orderSearchTimer = null;
+
+function setupOrderSearch() {
+    const searchInput = document.getElementById('orderSearch');
+    if (!searchInput) return;
+    searchInput.addEventListener('input', function() {
+        clearTimeout(orderSearchTimer);
+        orderSearchTimer = setTimeout(() => searchOrders(this.value.trim()), 300);
+    });
+}
+
+async function searchOrders(query) {
+    if (!query) {
+        renderWorkerOrders();
+        return;
+    }
+    try {
+        const response = await fetch(`${API_BASE}/orders/search?status=open&limit=50&q=${encodeURIComponent(query)}`);
+        const results = await response.json();
+        if (!response.ok) {
+            showNotification(results.error || 'Chyba při hledání', 'error');
+            return;
+        }
         const availableContainer = document.getElementById('availableOrders');
-        const myContainer = document.getElementById('myOrders');
-        
         availableContainer.innerHTML = '';
-        myContainer.innerHTML = '';
-        
-        const availableOrders = orders.filter(order => order.status === 'open');
-        const myOrders = orders.filter(order => order.worker_id === currentUser.id);
-        
-        if (availableOrders.length === 0) {
-            availableContainer.innerHTML = '<p>Žádné dostupné zakázky.</p>';
-        } else {
-            availableOrders.forEach(order => {
-                const orderElement = createOrderElement(order, 'available');
-                availableContainer.appendChild(orderElement);
-            });
-        }
-        
-        if (myOrders.length === 0) {
-            myContainer.innerHTML = '<p>Nemáte žádné přijaté zakázky.</p>';
-        } else {
-            myOrders.forEach(order => {
-                const orderElement = createOrderElement(order, 'worker');
-                myContainer.appendChild(orderElement);
-            });
+        if (results.length === 0) {
+            availableContainer.innerHTML = '<p>Žádné zakázky neodpovídají hledání.</p>';
+            return;
         }
+        results.forEach(order => {
+            availableContainer.appendChild(createOrderElement(order, 'available'));
+        });
     } catch (error) {
-        showNotification('Chyba při načítání zakázek', 'error');
+        showNotification('Chyba při hledání', 'error');
+    }
+}
+
+function renderWorkerOrders() {
+    const availableContainer = document.getElementById('availableOrders');
+    const myContainer = document.getElementById('myOrders');
+    
+    availableContainer.innerHTML = '';
+    myContainer.innerHTML = '';
+    
+    const availableOrders = currentOrders.filter(order => order.status === 'open');
+    const myOrders = currentOrders.filter(order => order.worker_id === currentUser.id);
+    
+    if (availableOrders.length === 0) {
+        availableContainer.innerHTML = '<p>Žádné dostupné zakázky.</p>';
+    } else {
+        availableOrders.forEach(order => {
+            const orderElement = createOrderElement(order, 'available');
+            availableContainer.appendChild(orderElement);
+        });
+    }
+    
+    if (myOrders.length === 0) {
+        myContainer.innerHTML = '<p>Nemáte žádné přijaté zakázky.</p>';
+    } else {
+        myOrders.forEach(order => {
+            const orderElement = createOrderElement(order, 'worker');
+            myContainer.appendChild(orderElement);
+        });
     }
 }
 
@@ -670,7 +747,7 @@ async function loadWorkerOrders() {
 async function loadAdminData() {
     try {
         // Statistiky
-        const statsResponse = await fetch(`${API_BASE}/statistics`);
+        const statsResponse = await fetch(`${API_BASE}/statistics?series=day&buckets=14`);
         const stats = await statsResponse.json();
         
         const statsContainer = document.getElementById('adminStats');
@@ -699,6 +776,7 @@ async function loadAdminData() {
                 <h4>Úspěšnost</h4>
                 <p class="stat-number">${stats.completion_rate.toFixed(1)}%</p>
             </div>
+            ${renderStatsSeries(stats.series || [])}
         `;
         
         // Brigádníci ke schválení
@@ -731,21 +809,141 @@ async function loadAdminData() {
         
         // Všechny zakázky
         const ordersResponse = await fetch(`${API_BASE}/orders`);
-        const orders = await ordersResponse.json();
-        
-        const ordersContainer = document.getElementById('allOrders');
-        ordersContainer.innerHTML = '';
-        orders.forEach(order => {
-            const orderElement = createOrderElement(order, 'admin');
-            ordersContainer.appendChild(orderElement);
-        });
+        currentOrders = await ordersResponse.json();
+        renderAdminOrders();
         
     } catch (error) {
         showNotification('Chyba při načítání admin dat', 'error');
     }
 }
 
+// Jednoduchý sloupcový graf zakázek za poslední dny
+function renderStatsSeries(series) {
+    if (series.length === 0) return '';
+    
+    const maxOrders = Math.max(...series.map(bucket => bucket.orders_created), 1);
+    const bars = series.map(bucket => `
+        <div title="${bucket.bucket_start}: ${bucket.orders_created} zakázek, ${bucket.revenue} Kč"
+             style="display:inline-block; width:${100 / series.length}%; height:${Math.round(bucket.orders_created / maxOrders * 60)}px; background:currentColor; opacity:0.6; vertical-align:bottom;"></div>
+    `).join('');
+    
+    return `
+        <div class="stat-card">
+            <h4>Zakázky za posledních ${series.length} dní</h4>
+            <div style="height:60px; line-height:0;">${bars}</div>
+        </div>
+    `;
+}
+
+function renderAdminOrders() {
+    const ordersContainer = document.getElementById('allOrders');
+    ordersContainer.innerHTML = '';
+    currentOrders.forEach(order => {
+        const orderElement = createOrderElement(order, 'admin');
+        ordersContainer.appendChild(orderElement);
+    });
+}
+
+function renderOrders() {
+    if (!currentUser) return;
+    
+    if (currentUser.role === 'zakaznik') {
+        renderCustomerOrders();
+    } else if (currentUser.role === 'brigadnik') {
+        renderWorkerOrders();
+    } else if (currentUser.role === 'admin') {
+        renderAdminOrders();
+    }
+}
+
+// Průběžné změny zakázek ze serveru (Server-Sent Events)
+function startOrderStream() {
+    stopOrderStream();
+    if (!window.EventSource) return;
+    
+    orderStream = new EventSource(`${API_BASE}/orders/stream`);
+    orderStream.addEventListener('order', event => {
+        applyOrderEvent(JSON.parse(event.data));
+    });
+    orderStream.addEventListener('error', () => {
+        // Výpadek spojení EventSource sám obnoví; při odmítnutí (503 - server
+        // má plno streamů) skončí ve stavu CLOSED a seznam se dotazuje
+        if (orderStream && orderStream.readyState === EventSource.CLOSED) {
+            stopOrderStream();
+            startOrderPolling();
+        }
+    });
+}
+
+function stopOrderStream() {
+    if (orderStream) {
+        orderStream.close();
+        orderStream = null;
+    }
+    if (orderPollTimer) {
+        clearInterval(orderPollTimer);
+        orderPollTimer = null;
+    }
+}
+
+// Náhrada streamu - seznam zakázek se obnoví každých 30 s, po dvou
+// obnoveních se stream zkusí otevřít znovu
+function startOrderPolling() {
+    let refreshes = 0;
+    orderPollTimer = setInterval(() => {
+        if (!currentUser) return stopOrderStream();
+        reloadOrders();
+        refreshes += 1;
+        if (refreshes >= 2) {
+            startOrderStream();
+        }
+    }, 30000);
+}
+
+function reloadOrders() {
+    if (currentUser.role === 'zakaznik') {
+        loadCustomerOrders();
+    } else if (currentUser.role === 'brigadnik') {
+        loadWorkerOrders();
+    } else if (currentUser.role === 'admin') {
+        loadAdminData();
+    }
+}
+
+// Lokální úprava seznamu zakázek místo nového stažení celého seznamu
+function applyOrderEvent(event) {
+    const index = currentOrders.findIndex(order => order.id === event.order.id);
+    
+    if (event.type === 'deleted') {
+        if (index === -1) return;
+        currentOrders.splice(index, 1);
+    } else if (index === -1) {
+        currentOrders.unshift(event.order);
+    } else {
+        currentOrders[index] = event.order;
+    }
+    
+    renderOrders();
+}
+
 // Vytvoření elementu zakázky
+// Fotka zakázky - zmenšené varianty (WebP s JPEG fallbackem), jinak původní soubor
+function orderPhotoHtml(order) {
+    if (!order.photo_filename) return '';
+    const variants = order.photo_variants;
+    if (!variants) {
+        return `<img src="/uploads/${order.photo_filename}" alt="Foto zakázky" style="max-width: 200px;" loading="lazy">`;
+    }
+    const srcset = files => Object.entries(files).map(([width, name]) => `/uploads/${name} ${width}w`).join(', ');
+    return `
+        <picture>
+            <source type="image/webp" srcset="${srcset(variants.webp)}" sizes="200px">
+            <img src="/uploads/${variants.jpeg['320'] || order.photo_filename}" srcset="${srcset(variants.jpeg)}" sizes="200px"
+                 alt="Foto zakázky" style="max-width: 200px;" loading="lazy">
+        </picture>
+    `;
+}
+
 function createOrderElement(order, type) {
     const div = document.createElement('div');
     div.className = 'order-card';
@@ -795,10 +993,11 @@ function createOrderElement(order, type) {
         ${order.estimated_price ? `<p><strong>Odhadovaná cena:</strong> ${order.estimated_price} Kč</p>` : ''}
         ${order.final_price ? `<p><strong>Finální cena:</strong> ${order.final_price} Kč</p>` : ''}
         ${order.ai_analysis ? `<p><strong>AI analýza:</strong> ${order.ai_analysis}</p>` : ''}
-        ${order.photo_filename ? `<img src="/uploads/${order.photo_filename}" alt="Foto zakázky" style="max-width: 200px;">` : ''}
+        ${order.analysis_status === 'pending' || order.analysis_status === 'running' ? '<p><em>AI analýza a odhad ceny probíhá...</em></p>' : ''}
+        ${orderPhotoHtml(order)}
         <p><strong>Vytvořeno:</strong> ${new Date(order.created_at).toLocaleString('cs-CZ')}</p>
         ${order.customer_name ? `<p><strong>Zákazník:</strong> ${order.customer_name}</p>` : ''}
-        ${order.worker_name ? `<p><strong>Brigádník:</strong> ${order.worker_name}</p>` : ''}
+        ${order.worker_name ? `<p><strong>Brigádník:</strong> ${order.worker_name}${order.worker_rating ? ` (★ ${order.worker_rating})` : ''}</p>` : ''}
         <div class="order-actions">
             ${actionsHtml}
         </div>
@@ -861,7 +1060,7 @@ async function takeOrder(orderId) {
         
         if (response.ok) {
             showNotification('Zakázka přijata!', 'success');
-            loadWorkerOrders();
+            applyOrderEvent({ type: 'updated', order: result.order });
         } else {
             showNotification(result.error, 'error');
         }
@@ -887,7 +1086,7 @@ async function completeOrder(orderId) {
         
         if (response.ok) {
             showNotification('Zakázka dokončena!', 'success');
-            loadWorkerOrders();
+            applyOrderEvent({ type: 'updated', order: result.order });
         } else {
             showNotification(result.error, 'error');
         }
@@ -913,7 +1112,7 @@ async function updatePrice(orderId) {
         
         if (response.ok) {
             showNotification('Cena aktualizována!', 'success');
-            loadWorkerOrders();
+            applyOrderEvent({ type: 'updated', order: result.order });
         } else {
             showNotification(result.error, 'error');
         }
@@ -934,10 +1133,10 @@ async function cancelOrder(orderId) {
         
         if (response.ok) {
             showNotification('Zakázka zrušena', 'success');
-            if (currentUser.role === 'brigadnik') {
-                loadWorkerOrders();
+            if (result.order) {
+                applyOrderEvent({ type: 'updated', order: result.order });
             } else {
-                loadCustomerOrders();
+                applyOrderEvent({ type: 'deleted', order: { id: orderId } });
             }
         } else {
             showNotification(result.error, 'error');
@@ -961,7 +1160,7 @@ async function payOrder(orderId, paymentType) {
         
         if (response.ok) {
             showNotification('Platba proběhla úspěšně!', 'success');
-            loadCustomerOrders();
+            applyOrderEvent({ type: 'updated', order: result.order });
         } else {
             showNotification(result.error, 'error');
         }
@@ -980,11 +1179,7 @@ async function deleteOrder(orderId) {
         
         if (response.ok) {
             showNotification('Zakázka smazána', 'success');
-            if (currentUser.role === 'admin') {
-                loadAdminData();
-            } else {
-                loadCustomerOrders();
-            }
+            applyOrderEvent({ type: 'deleted', order: { id: orderId } });
         } else {
             const result = await response.json();
             showNotification(result.error, 'error');
@@ -1133,17 +1328,23 @@ function showAvatarWithImage(message, avatarType = 'pomocnik') {
     const avatarIcon = document.getElementById('avatarIcon');
     const avatarMessage = document.getElementById('avatarMessage');
     
-    // Změnit avatar podle typu práce
+    // Změnit avatar podle typu práce (WebP, PNG jako záloha)
     const avatarImages = {
-        'pomocnik': '/avatar-pomocnik.png',
-        'sekani': '/avatar-sekani.png',
-        'strihani': '/avatar-strihani.png',
-        'natirani': '/avatar-natirani.png',
-        'zahradni': '/avatar-zahradni.png'
+        'pomocnik': ['/avatar-pomocnik.webp', '/avatar-pomocnik.png'],
+        'sekani': ['/avatar-sekani.webp', '/avatar-sekani.png'],
+        'strihani': ['/avatar-strihani.webp', '/avatar-strihani.png'],
+        'natirani': ['/avatar-natirani.webp', '/avatar-natirani.png'],
+        'zahradni': ['/avatar-zahradni.webp', '/avatar-zahradni.png']
     };
     
     if (avatarImages[avatarType]) {
-        avatarIcon.innerHTML = `<img src="${avatarImages[avatarType]}" alt="Avatar ${avatarType}" style="width: 60px; height: 60px; border-radius: 50%;">`;
+        const [webp, png] = avatarImages[avatarType];
+        avatarIcon.innerHTML = `
+            <picture>
+                <source type="image/webp" srcset="${webp}">
+                <img src="${png}" alt="Avatar ${avatarType}" width="60" height="60" style="width: 60px; height: 60px; border-radius: 50%;">
+            </picture>
+        `;
     } else {
         avatarIcon.innerHTML = '🤖';
     }
@@ -0,0 +1,128 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import select, func, text, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from src.models.user import db, AICacheEntry
+
+# Perzistentní cache výsledků AI volání. Analýza obrázku je klíčovaná
+# SHA-256 nahraných bajtů, odhad ceny SHA-256 normalizovaného popisu + analýzy.
+# Čtení i zápisy jdou mimo session volajícího, vlastním krátkým spojením;
+# uložení je upsert (ON CONFLICT), takže souběžné odhady stejného textu
+# nenarazí na UNIQUE constraint.
+
+IMAGE_ANALYSIS = 'image_analysis'
+PRICE = 'price'
+
+DEFAULT_TTL = int(os.getenv('AI_CACHE_TTL', 30 * 24 * 3600))  # 30 dní
+DEFAULT_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 10000))
+
+_counters = {IMAGE_ANALYSIS: {'hits': 0, 'misses': 0}, PRICE: {'hits': 0, 'misses': 0}}
+_counters_lock = threading.Lock()
+
+def _config(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+def _count(kind, field):
+    with _counters_lock:
+        _counters[kind][field] += 1
+
+def normalize_text(text):
+    """Sjednotí text pro klíč cache (velikost písmen, mezery, unicode)"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return re.sub(r'\s+', ' ', text).strip()
+
+def image_key(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def price_key(description, ai_analysis):
+    text = normalize_text(description) + '\x00' + normalize_text(ai_analysis)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def _write(statement, params=None):
+    """Zápis do cache ve vlastní transakci. Cache je jen zkratka - když zápis
+    selže (zámek databáze, souběh), výsledek se prostě neuloží."""
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(statement, params or {})
+        return True
+    except SQLAlchemyError:
+        return False
+
+def cache_get(kind, key):
+    """Vrátí uloženou hodnotu nebo None (prošlé záznamy rovnou maže).
+    Cache má vlastní spojení: transakci volajícího nepotvrdí a spojení se vrátí
+    do poolu dřív, než volající při neúspěchu začne čekat na OpenAI."""
+    table = AICacheEntry.__table__
+    match = (table.c.key == key) & (table.c.kind == kind)
+    now = datetime.utcnow()
+    ttl = _config('AI_CACHE_TTL', DEFAULT_TTL)
+    try:
+        with db.engine.connect() as connection:
+            row = connection.execute(select(table.c.value, table.c.created_at).where(match)).first()
+    except SQLAlchemyError:
+        row = None
+
+    if row is not None and row.created_at < now - timedelta(seconds=ttl):
+        _write(table.delete().where(match))
+        row = None
+
+    if row is None:
+        _count(kind, 'misses')
+        return None
+
+    _count(kind, 'hits')
+    _write(table.update().where(match).values(hits=func.coalesce(table.c.hits, 0) + 1, last_used_at=now))
+    return row.value
+
+_UPSERT = text(
+    'INSERT INTO ai_cache_entry (key, kind, value, hits, created_at, last_used_at) '
+    'VALUES (:key, :kind, :value, 0, :now, :now) '
+    'ON CONFLICT (key, kind) DO UPDATE SET value = excluded.value, created_at = excluded.created_at, '
+    'last_used_at = excluded.last_used_at'
+).bindparams(bindparam('now', type_=db.DateTime))
+
+def cache_set(kind, key, value):
+    """Uloží hodnotu a případně vyřadí nejdéle nepoužité záznamy (LRU).
+    Přepsaná hodnota platí znovu celé AI_CACHE_TTL; při souběžném uložení
+    stejného klíče vyhraje poslední zápis."""
+    if _write(_UPSERT, {'key': key, 'kind': kind, 'value': value, 'now': datetime.utcnow()}):
+        _evict(kind)
+
+def _evict(kind):
+    table = AICacheEntry.__table__
+    max_entries = _config('AI_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+    try:
+        with db.engine.connect() as connection:
+            excess = connection.execute(select(func.count()).where(table.c.kind == kind)).scalar() - max_entries
+    except SQLAlchemyError:
+        return
+    if excess <= 0:
+        return
+    oldest = select(table.c.key).where(table.c.kind == kind) \
+        .order_by(table.c.last_used_at.asc()).limit(excess)
+    _write(table.delete().where(table.c.kind == kind, table.c.key.in_(oldest)))
+
+def invalidate(kind=None, key=None):
+    """Smaže záznamy cache (všechny, daného typu nebo konkrétní klíč). Vrací počet."""
+    query = AICacheEntry.query
+    if kind:
+        query = query.filter_by(kind=kind)
+    if key:
+        query = query.filter_by(key=key)
+    deleted = query.delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def cache_stats():
+    with _counters_lock:
+        counters = {kind: dict(values) for kind, values in _counters.items()}
+    for kind in counters:
+        counters[kind]['entries'] = AICacheEntry.query.filter_by(kind=kind).count()
+    return counters
@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import time
+import base64
+import openai
+from flask import current_app, has_app_context
+from src.utils.ai_cache import cache_get, cache_set, image_key, price_key, IMAGE_ANALYSIS, PRICE
+from src.utils.metrics import timed
+
+DEFAULT_PRICE = 500.0  # Výchozí cena, když odhad selže
+# Hromadný odhad: víc zakázek v jednom volání, odpověď jako JSON. Ceny mimo
+# rozsah nebo chybějící položky se odhadnou jednotlivě (estimate_price).
+PRICE_BATCH_SIZE = int(os.getenv('PRICE_BATCH_SIZE', 20))
+MIN_PRICE, MAX_PRICE = 50.0, 500000.0
+
+def get_ai_client():
+    """Vrátí klienta pro OpenAI API (v testech lze podstrčit přes AI_CLIENT)."""
+    if has_app_context() and current_app.config.get('AI_CLIENT') is not None:
+        return current_app.config['AI_CLIENT']
+    if os.getenv('AI_BACKEND') == 'stub':
+        return StubAIClient()
+    return openai.OpenAI()
+
+class StubAIClient:
+    """Lokální náhrada OpenAI klienta - vrací pevné odpovědi bez síťového volání.
+    AI_STUB_LATENCY (s) napodobí pomalé API (benchmarky souběhu)."""
+
+    def __init__(self, analysis="Tráva cca 200 m², střední obtížnost, asi 3 hodiny práce.", price="800", latency=None):
+        self.analysis = analysis
+        self.price = price
+        self.latency = float(os.getenv('AI_STUB_LATENCY', 0)) if latency is None else latency
+        self.calls = []
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages, **kwargs):
+        self.calls.append(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        content = messages[0]['content']
+        if kwargs.get('response_format', {}).get('type') == 'json_object':
+            # Hromadný odhad - cena pro každé id z promptu
+            prices = [{'id': int(i), 'price': float(self.price)} for i in re.findall(r'"id": (\d+)', content)]
+            text = json.dumps({'prices': prices})
+        else:
+            text = self.analysis if isinstance(content, list) else self.price
+        message = type('Message', (), {'content': text})()
+        choice = type('Choice', (), {'message': message})()
+        return type('Response', (), {'choices': [choice]})()
+
+def analyze_image_with_ai(image_path):
+    """Analýza obrázku pomocí OpenAI Vision API. Chyba (OpenAI, čtení souboru)
+    se propaguje - úloha analýzy se pak zopakuje."""
+    with open(image_path, "rb") as image_file:
+        image_bytes = image_file.read()
+
+    # Stejná fotka už byla analyzována - bez volání API
+    key = image_key(image_bytes)
+    cached = cache_get(IMAGE_ANALYSIS, key)
+    if cached is not None:
+        return cached
+
+    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+
+    client = get_ai_client()
+    with timed('openai'):
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Analyzuj tento obrázek zahradní práce. Popiš co vidíš, jaký typ práce je potřeba, odhadni obtížnost a dobu trvání. Odpověz v češtině."
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{base64_image}"
+                            }
+                        }
+                    ]
+                }
+            ],
+            max_tokens=300
+        )
+
+    analysis = response.choices[0].message.content
+    cache_set(IMAGE_ANALYSIS, key, analysis)
+    return analysis
+
+def estimate_price(description, ai_analysis, use_cache=True, default=DEFAULT_PRICE):
+    """Odhad ceny na základě popisu a AI analýzy (use_cache=False cache přepíše,
+    default se vrátí, když odhad selže)"""
+    try:
+        key = price_key(description, ai_analysis)
+        cached = cache_get(PRICE, key) if use_cache else None
+        if cached is not None:
+            return float(cached)
+
+        client = get_ai_client()
+        with timed('openai'):
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {
+                        "role": "user",
+                        "content": f"""Na základě následujícího popisu práce a AI analýzy obrázku odhadni cenu v českých korunách.
+
+Popis práce: {description}
+AI analýza: {ai_analysis}
+
+Odpověz pouze číslem (cena v Kč) bez dalšího textu. Zohledni běžné ceny zahradních prací v ČR."""
+                    }
+                ],
+                max_tokens=50
+            )
+
+        price_text = response.choices[0].message.content.strip()
+        # Extrakce čísla z odpovědi
+        price_match = re.search(r'\d+', price_text)
+        if price_match:
+            price = float(price_match.group())
+            cache_set(PRICE, key, str(price))
+            return price
+        else:
+            return default
+    except Exception as e:
+        return default  # Výchozí cena při chybě
+
+def _parse_batch_prices(text, count):
+    """Ceny z JSON odpovědi hromadného odhadu: {pozice: cena}, jen platné položky"""
+    try:
+        entries = json.loads(text).get('prices')
+    except (ValueError, AttributeError):
+        return {}
+    if not isinstance(entries, list):
+        return {}
+    prices = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        position, price = entry.get('id'), entry.get('price')
+        if isinstance(price, str):
+            price = re.sub(r'[^\d.]', '', price.replace(',', '.'))
+        try:
+            position, price = int(position), float(price)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= position < count and position not in prices and MIN_PRICE <= price <= MAX_PRICE:
+            prices[position] = price
+    return prices
+
+def estimate_prices_batch(items, use_cache=True):
+    """Hromadný odhad cen. items je seznam (popis, AI analýza); vrací seznam
+    (cena, zdroj) ve stejném pořadí, zdroj je 'cache', 'batch' nebo 'single'
+    (položka chyběla nebo byla neplatná a odhadla se samostatným voláním).
+    Když selže i samostatný odhad, je položka (None, 'failed')."""
+    results = [None] * len(items)
+    keys = [price_key(description, ai_analysis or "Bez obrázku") for description, ai_analysis in items]
+    pending = []
+    for position, key in enumerate(keys):
+        cached = cache_get(PRICE, key) if use_cache else None
+        if cached is not None:
+            results[position] = (float(cached), 'cache')
+        else:
+            pending.append(position)
+
+    for start in range(0, len(pending), PRICE_BATCH_SIZE):
+        chunk = pending[start:start + PRICE_BATCH_SIZE]
+        # V promptu jsou pozice v dávce, ne id zakázek - odpověď se s nimi snáz ověří
+        lines = '\n'.join(json.dumps({'id': i, 'popis': items[position][0],
+                                      'ai_analyza': items[position][1] or "Bez obrázku"}, ensure_ascii=False)
+                           for i, position in enumerate(chunk))
+        prices = {}
+        try:
+            client = get_ai_client()
+            with timed('openai'):
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": f"""Odhadni cenu v českých korunách pro každou z následujících zahradních prací. Zohledni běžné ceny zahradních prací v ČR.
+
+Práce (JSON, jedna na řádek):
+{lines}
+
+Odpověz pouze JSON objektem {{"prices": [{{"id": <id>, "price": <cena v Kč jako číslo>}}]}} s cenou pro každé id."""
+                        }
+                    ],
+                    response_format={"type": "json_object"},
+                    max_tokens=30 * len(chunk) + 50
+                )
+            prices = _parse_batch_prices(response.choices[0].message.content, len(chunk))
+        except Exception:
+            pass  # Celá dávka selhala - každá položka se odhadne samostatně
+
+        for i, position in enumerate(chunk):
+            description, ai_analysis = items[position]
+            if i in prices:
+                cache_set(PRICE, keys[position], str(prices[i]))
+                results[position] = (prices[i], 'batch')
+            else:
+                price = estimate_price(description, ai_analysis or "Bez obrázku", use_cache=False, default=None)
+                results[position] = (price, 'single') if price is not None else (None, 'failed')
+    return results
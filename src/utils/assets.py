@@ -0,0 +1,175 @@
+import io
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+from flask import request, send_file
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:  # Volitelné - bez něj se servíruje jen gzip
+    brotli = None
+
+# Statické soubory frontendu. Při startu (nebo `flask build-assets`) se
+# soubory ze src/static zkopírují do build složky pod názvem s hashem obsahu
+# (style.3f2a9c1b.css), předkomprimují se (gzip, brotli) a odkazy v
+# index.html, script.js a style.css se přepíšou na tyto názvy. Soubory
+# s hashem se cachují natrvalo, index.html se vždy revaliduje přes ETag.
+# Tabulka souborů je v paměti - obsluha požadavku nesahá na disk kvůli
+# os.path.exists.
+
+ASSET_PREFIX = 'assets/'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESS_EXTENSIONS = ('.js', '.css', '.html', '.ico', '.svg', '.json')
+COMPRESS_MIN_SIZE = 1024
+AVATAR_SIZE = 120  # Avatar se zobrazuje 60x60 px, 2x pro retina displeje
+# Pořadí zpracování - soubor může odkazovat jen na soubory zpracované před ním
+REWRITE_ORDER = ('.css', '.js', '.html')
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def _hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{_digest(data)}{ext}"
+
+def _write(path, data, overwrite=False):
+    """Zápis přes dočasný soubor - při startu může build běžet ve více workerech"""
+    if os.path.exists(path) and not overwrite:
+        return  # Název obsahuje hash - stejný název = stejný obsah
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _avatar_variants(name, data):
+    """Zmenšený PNG (pod původním názvem) a WebP varianta avatara"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert('RGBA') if image.mode in ('RGBA', 'LA', 'P') else image.convert('RGB')
+        image.thumbnail((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+        png, webp = io.BytesIO(), io.BytesIO()
+        image.save(png, 'PNG', optimize=True)
+        image.save(webp, 'WEBP', quality=80, method=6)
+    stem = os.path.splitext(name)[0]
+    return {name: png.getvalue(), f"{stem}.webp": webp.getvalue()}
+
+def _rewrite(text, manifest):
+    """Nahradí odkazy na logické názvy (style.css, /avatar-x.png) odkazy na soubory s hashem"""
+    if not manifest:
+        return text
+    names = '|'.join(re.escape(name) for name in sorted(manifest, key=len, reverse=True))
+    pattern = re.compile(r'(["\'(])/?(' + names + r')(["\')])')
+    return pattern.sub(lambda m: f"{m.group(1)}/{ASSET_PREFIX}{manifest[m.group(2)]}{m.group(3)}", text)
+
+def _source_signature(static_folder):
+    signature = {}
+    for entry in os.scandir(static_folder):
+        if entry.is_file():
+            stat = entry.stat()
+            signature[entry.name] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+def build_assets(static_folder, build_dir):
+    """Sestaví build složku a vrátí manifest {logický název: název s hashem}.
+    Pokud se zdrojové soubory od posledního buildu nezměnily, jen načte manifest."""
+    os.makedirs(build_dir, exist_ok=True)
+    manifest_path = os.path.join(build_dir, 'manifest.json')
+    signature = _source_signature(static_folder)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous.get('sources') == signature:
+            return previous['files']
+
+    sources = {}
+    for name in signature:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        if name.startswith('avatar-') and name.endswith('.png'):
+            sources.update(_avatar_variants(name, data))
+        else:
+            sources[name] = data
+
+    def order(name):
+        ext = os.path.splitext(name)[1]
+        return REWRITE_ORDER.index(ext) + 1 if ext in REWRITE_ORDER else 0
+
+    manifest = {}
+    for name in sorted(sources, key=order):
+        data = sources[name]
+        if order(name):
+            data = _rewrite(data.decode('utf-8'), manifest).encode('utf-8')
+        # index.html má stálý název (vstupní bod), ostatní dostanou hash
+        entry_point = name == 'index.html'
+        built_name = name if entry_point else _hashed_name(name, data)
+        path = os.path.join(build_dir, built_name)
+        _write(path, data, overwrite=entry_point)
+        if name.endswith(COMPRESS_EXTENSIONS) and len(data) >= COMPRESS_MIN_SIZE:
+            _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0), overwrite=entry_point)
+            if brotli is not None:
+                _write(path + '.br', brotli.compress(data, quality=11), overwrite=entry_point)
+        manifest[name] = built_name
+
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'sources': signature, 'files': manifest}, f)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+class StaticAssets:
+    """Tabulka statických souborů v paměti (URL cesta -> soubor a hlavičky)"""
+
+    def __init__(self, static_folder, build_dir, auto_reload=False):
+        self.static_folder = static_folder
+        self.build_dir = build_dir
+        self.auto_reload = auto_reload
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        manifest = build_assets(self.static_folder, self.build_dir)
+        entries = {}
+        for name, built_name in manifest.items():
+            path = os.path.join(self.build_dir, built_name)
+            with open(path, 'rb') as f:
+                etag = _digest(f.read())
+            entry = {
+                'file': path,
+                'mimetype': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                'etag': etag,
+                'encodings': {
+                    encoding: path + suffix for encoding, suffix in (('br', '.br'), ('gzip', '.gz'))
+                    if os.path.exists(path + suffix)
+                },
+            }
+            # Logický název (/script.js) se revaliduje, název s hashem je neměnný
+            entries[name] = dict(entry, immutable=False)
+            if built_name != name:
+                entries[ASSET_PREFIX + built_name] = dict(entry, immutable=True)
+        self.entries = entries
+        self.signature = _source_signature(self.static_folder)
+
+    def get(self, path):
+        if self.auto_reload and _source_signature(self.static_folder) != self.signature:
+            self.load()  # Vývoj - změněné zdrojové soubory se hned přestaví
+        return self.entries.get(path)
+
+    def send(self, entry):
+        encoding = next((e for e in ('br', 'gzip') if e in entry['encodings'] and request.accept_encodings[e]), None)
+        path = entry['encodings'][encoding] if encoding else entry['file']
+        etag = f"{entry['etag']}-{encoding}" if encoding else entry['etag']
+
+        response = send_file(path, mimetype=entry['mimetype'], etag=etag, conditional=True,
+                             max_age=IMMUTABLE_MAX_AGE if entry['immutable'] else 0)
+        if entry['immutable']:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry['encodings']:
+            response.vary.add('Accept-Encoding')
+        return response
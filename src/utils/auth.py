@@ -0,0 +1,73 @@
+import os
+import time
+import threading
+from collections import namedtuple
+from functools import wraps
+from flask import g, has_app_context, jsonify, session
+from sqlalchemy import event
+from src.models.user import db, User
+
+# Identita přihlášeného uživatele pro autorizaci v routách. Načte se jedním
+# dotazem na pár sloupců, v rámci požadavku se drží v `g` a mezi požadavky
+# v krátkodobé cache procesu (AUTH_CACHE_TTL sekund, 0 = vypnuto).
+# Změna nebo smazání uživatele cache v tomto procesu zneplatní (události
+# SQLAlchemy níže); ostatní gunicorn workery uvidí změnu nejpozději po TTL.
+
+Identity = namedtuple('Identity', ['id', 'role', 'is_approved'])
+
+AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', 30))
+
+_cache = {}  # user_id -> (identity, čas načtení)
+_cache_lock = threading.Lock()
+
+def _load_identity(user_id):
+    row = db.session.query(User.id, User.role, User.is_approved).filter(User.id == user_id).first()
+    return Identity(*row) if row else None
+
+def current_identity():
+    """Identita přihlášeného uživatele nebo None (nepřihlášen / smazán)"""
+    if 'identity' in g:
+        return g.identity
+    user_id = session.get('user_id')
+    identity = None
+    if user_id is not None:
+        now = time.monotonic()
+        with _cache_lock:
+            cached = _cache.get(user_id)
+        if cached is not None and now - cached[1] < AUTH_CACHE_TTL:
+            identity = cached[0]
+        else:
+            identity = _load_identity(user_id)
+            if identity is not None and AUTH_CACHE_TTL > 0:
+                with _cache_lock:
+                    _cache[user_id] = (identity, now)
+    g.identity = identity
+    return identity
+
+def invalidate_identity(user_id):
+    with _cache_lock:
+        _cache.pop(user_id, None)
+    if has_app_context() and g.get('identity') is not None and g.identity.id == user_id:
+        g.pop('identity')
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, user):
+    invalidate_identity(user.id)
+
+def require_role(*roles, approved=False, error=None):
+    """Dekorátor routy: přihlášený uživatel s jednou z rolí (prázdné = libovolná).
+    approved=True vyžaduje u brigádníka schválený účet. Identita je v g.identity."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            identity = current_identity()
+            if identity is None:
+                return jsonify({'error': 'Nepřihlášen'}), 401
+            if roles and identity.role not in roles:
+                return jsonify({'error': error or 'Nedostatečná oprávnění'}), 403
+            if approved and identity.role == 'brigadnik' and not identity.is_approved:
+                return jsonify({'error': 'Váš účet brigádníka ještě nebyl schválen'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
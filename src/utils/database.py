@@ -0,0 +1,70 @@
+import os
+from sqlalchemy import event
+
+# Konfigurace databáze z prostředí. DATABASE_URL vybírá backend - pro
+# produkci s více gunicorn workery PostgreSQL s poolem spojení, pro vývoj
+# a malé nasazení SQLite soubor. SQLite běží ve WAL režimu: čtení neblokuje
+# zápis a souběžný zápis místo okamžité chyby "database is locked" čeká
+# až DB_BUSY_TIMEOUT_MS.
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')
+
+def database_uri():
+    uri = os.getenv('DATABASE_URL') or f"sqlite:///{DEFAULT_SQLITE_PATH}"
+    # Render/Heroku uvádí starší schéma postgres://, SQLAlchemy 2 ho nezná
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def engine_options(uri):
+    """Parametry create_engine pro daný backend (pool, timeouty)"""
+    options = {
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    if uri.startswith('sqlite'):
+        # Timeout spojení (s) - čekání na zámek souboru
+        options['connect_args'] = {'timeout': int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000)) / 1000}
+    else:
+        options.update({
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        })
+    return options
+
+def sqlite_pragmas(wal=None):
+    """PRAGMA příkazy pro každé nové SQLite spojení"""
+    if wal is None:
+        wal = os.getenv('SQLITE_WAL', 'true').lower() == 'true'
+    pragmas = [f"PRAGMA busy_timeout = {int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))}"]
+    if wal:
+        pragmas += [
+            'PRAGMA journal_mode = WAL',
+            'PRAGMA synchronous = NORMAL',  # Ve WAL režimu bezpečné, fsync jen při checkpointu
+        ]
+    pragmas += [
+        'PRAGMA cache_size = -20000',  # 20 MB page cache na spojení
+        'PRAGMA temp_store = MEMORY',
+    ]
+    return pragmas
+
+def init_database(app, db, wal=None):
+    """Nastaví URI a pool z prostředí (pokud nejsou v app.config), inicializuje
+    Flask-SQLAlchemy a u SQLite zaregistruje pragmy pro každé nové spojení."""
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_uri())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(wal)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
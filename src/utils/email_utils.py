@@ -1,90 +1,290 @@
 import os
-import sys
-# DON'T CHANGE THIS !!!
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.order import order_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Povolení CORS pro všechny domény
-CORS(app)
-
-# Registrace blueprintů
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(order_bp, url_prefix='/api')
-
-# Konfigurace databáze
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-# Route pro servírování nahraných obrázků
-@app.route('/uploads/<filename>')
-def uploaded_file(filename):
-    uploads_dir = os.path.join(app.static_folder, 'uploads')
-    return send_from_directory(uploads_dir, filename)
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
-
+import random
+import smtplib
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from src.models.user import db, EmailOutbox
+from src.utils.metrics import timed
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
-    import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+# Odchozí e-maily. Routy e-mail jen uloží do tabulky email_outbox ve stejné
+# transakci jako data (registrace tak nečeká na SendGrid a jeho výpadek
+# nezpůsobí 500). Dispečer na pozadí odesílá po dávkách s omezením rychlosti,
+# neúspěšné pokusy opakuje s exponenciálním odstupem a po EMAIL_MAX_ATTEMPTS
+# e-mail přesune do stavu 'dead'. Backend: SendGrid, SMTP, soubory (.eml) nebo stub.
 
-# Inicializace klienta
-sg = SendGridAPIClient(api_key=os.getenv("SENDGRID_API_KEY"))
 FROM_EMAIL = os.getenv("FROM_EMAIL", "rychleryce@gmail.com")
+APP_BASE_URL = os.getenv("APP_BASE_URL", "https://rychleryce2.onrender.com")
+
+BATCH_SIZE = 20
+POLL_SECONDS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+# ---------- Backendy ----------
+class SendGridBackend:
+    """SendGrid Web API. E-maily se stejným předmětem a obsahem (oznámení) jdou
+    jedním požadavkem s personalizací pro každého příjemce, ostatní po jednom.
+    Klienta lze předat (testy), jinak se vytvoří z API klíče."""
+
+    MAX_PERSONALIZATIONS = 1000  # Limit SendGrid na jeden požadavek
+
+    def __init__(self, api_key, client=None):
+        if client is None:
+            if not api_key:
+                raise ValueError("EMAIL_BACKEND=sendgrid vyžaduje SENDGRID_API_KEY")
+            from sendgrid import SendGridAPIClient
+            client = SendGridAPIClient(api_key=api_key)
+        self.client = client
+
+    def send_batch(self, messages):
+        """Odešle dávku, vrací {id: chyba nebo None}"""
+        groups = {}
+        for message in messages:
+            groups.setdefault((message.subject, message.html), []).append(message)
+        results = {}
+        for (subject, html), group in groups.items():
+            for start in range(0, len(group), self.MAX_PERSONALIZATIONS):
+                chunk = group[start:start + self.MAX_PERSONALIZATIONS]
+                try:
+                    self.client.send(_sendgrid_mail(subject, html, [message.to_email for message in chunk]))
+                    error = None
+                except Exception as e:
+                    error = str(e)
+                results.update((message.id, error) for message in chunk)
+        return results
+
+def _sendgrid_mail(subject, html, recipients):
+    """Jeden e-mail SendGrid; každý příjemce má vlastní personalizaci (nevidí ostatní)"""
+    from sendgrid.helpers.mail import Mail, Personalization, To
+    mail = Mail(from_email=FROM_EMAIL, subject=subject, html_content=html)
+    for recipient in recipients:
+        personalization = Personalization()
+        personalization.add_to(To(recipient))
+        mail.add_personalization(personalization)
+    return mail
+
+class SMTPBackend:
+    """SMTP server (i lokální, např. `python -m aiosmtpd -n` nebo MailHog)"""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=False):
+        self.host, self.port = host, port
+        self.username, self.password, self.use_tls = username, password, use_tls
+
+    def send_batch(self, messages):
+        # Jedno spojení pro celou dávku
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            results = {}
+            for message in messages:
+                try:
+                    smtp.send_message(_mime_message(message))
+                    results[message.id] = None
+                except smtplib.SMTPException as e:
+                    results[message.id] = str(e)
+            return results
 
-def send_verification_email(to_email, token):
-    """Odešle ověřovací e-mail přes SendGrid."""
-    verify_url = f"https://rychleryce2.onrender.com/#?token={token}"
+class FileBackend:
+    """Ukládá e-maily jako .eml soubory (vývoj a testy bez sítě)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def send_batch(self, messages):
+        os.makedirs(self.directory, exist_ok=True)
+        for message in messages:
+            with open(os.path.join(self.directory, f"{message.id:08d}.eml"), 'wb') as f:
+                f.write(bytes(_mime_message(message)))
+        return {message.id: None for message in messages}
+
+class StubBackend:
+    """Nic neodesílá, jen počká EMAIL_STUB_LATENCY sekund (benchmarky souběhu)"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def send_batch(self, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        return {message.id: None for message in messages}
+
+def _mime_message(message):
+    mime = EmailMessage()
+    mime['From'] = FROM_EMAIL
+    mime['To'] = message.to_email
+    mime['Subject'] = message.subject
+    mime.set_content(message.html, subtype='html')
+    return mime
+
+def create_email_backend(config):
+    backend = config['EMAIL_BACKEND']
+    if backend == 'sendgrid':
+        return SendGridBackend(os.getenv("SENDGRID_API_KEY"))
+    if backend == 'smtp':
+        return SMTPBackend(os.getenv('SMTP_HOST', 'localhost'), int(os.getenv('SMTP_PORT', 25)),
+                           os.getenv('SMTP_USERNAME'), os.getenv('SMTP_PASSWORD'),
+                           os.getenv('SMTP_TLS', 'false').lower() == 'true')
+    if backend == 'file':
+        return FileBackend(os.getenv('EMAIL_FILE_DIR', 'src/database/outbox'))
+    if backend == 'stub':
+        return StubBackend(float(os.getenv('EMAIL_STUB_LATENCY', 0)))
+    raise ValueError(f"Neznámý EMAIL_BACKEND: {backend}")
+
+# ---------- Fronta ----------
+def queue_email(to_email, subject, html):
+    """Přidá e-mail do session. Odešle se po commitu (zavolat wake_dispatcher())."""
+    message = EmailOutbox(to_email=to_email, subject=subject, html=html,
+                          status='queued', next_attempt_at=datetime.utcnow())
+    db.session.add(message)
+    return message
+
+def queue_verification_email(user):
+    verify_url = f"{APP_BASE_URL}/api/verify-email/{user.verification_token}"
     html = f"""
     <h3>Ověřte svůj e-mail</h3>
     <p>Klikněte na odkaz pro dokončení registrace:</p>
     <a href="{verify_url}">{verify_url}</a>
     """
-    mail = Mail(
-    from_email=FROM_EMAIL,
-    to_emails=to_email,
-    subject="Potvrďte svůj e-mail – Rychlé Rýče",
-    html_content=html
-)
-sg.send(mail)
-    from flask import request
-from src.models.user import User
-
-@app.route('/verify-email')
-def verify_email():
-    token = request.args.get('token')
-    user = User.query.filter_by(email_token=token).first_or_404()
-    user.email_verified = True
-    user.email_token = None  # Vyčistit token
+    return queue_email(user.email, "Potvrďte svůj e-mail – Rychlé Rýče", html)
+
+def backoff_seconds(attempts):
+    """Odstup před dalším pokusem: 30 s, 60 s, 120 s... max. 1 h, s náhodným rozptylem"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+class RateLimiter:
+    """Token bucket - nejvýše `per_minute` e-mailů za minutu (v rámci procesu)"""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, per_minute)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def available(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return int(self.tokens)
+
+    def take(self, count):
+        self.tokens -= count
+
+def _claim_batch(limit):
+    """Převezme až `limit` e-mailů k odeslání (podmíněný UPDATE jako u úloh)"""
+    now = datetime.utcnow()
+    candidates = [row_id for (row_id,) in db.session.query(EmailOutbox.id).filter(
+        EmailOutbox.status == 'queued', EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.id).limit(limit)]
+    claimed = []
+    for message_id in candidates:
+        if EmailOutbox.query.filter_by(id=message_id, status='queued').update(
+            {'status': 'sending', 'claimed_at': now, 'attempts': EmailOutbox.attempts + 1}
+        ):
+            claimed.append(message_id)
+    db.session.commit()
+    return EmailOutbox.query.filter(EmailOutbox.id.in_(claimed)).order_by(EmailOutbox.id).all() if claimed else []
+
+def process_outbox(backend, limit=BATCH_SIZE, max_attempts=8):
+    """Odešle jednu dávku. Vrací počet převzatých e-mailů."""
+    messages = _claim_batch(limit)
+    if not messages:
+        return 0
+    try:
+        with timed('email'):
+            results = backend.send_batch(messages)
+    except Exception:
+        # Selhala celá dávka (např. nedostupný SMTP server)
+        error = traceback.format_exc()[-2000:]
+        results = {message.id: error for message in messages}
+
+    now = datetime.utcnow()
+    for message in messages:
+        error = results.get(message.id, 'Backend nevrátil výsledek')
+        if error is None:
+            message.status = 'sent'
+            message.sent_at = now
+            message.last_error = None
+        elif message.attempts >= max_attempts:
+            message.status = 'dead'  # Dead letter - ruční kontrola, viz `flask send-emails --retry-dead`
+            message.last_error = error
+        else:
+            message.status = 'queued'
+            message.next_attempt_at = now + timedelta(seconds=backoff_seconds(message.attempts))
+            message.last_error = error
+    db.session.commit()
+    return len(messages)
+
+def recover_outbox(stale_seconds):
+    """Vrátí do fronty e-maily, které uvízly ve stavu 'sending' (pád workeru)"""
+    stale_before = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    EmailOutbox.query.filter(EmailOutbox.status == 'sending', EmailOutbox.claimed_at < stale_before).update(
+        {'status': 'queued'}, synchronize_session=False
+    )
     db.session.commit()
-    return "<h1>✅ E-mail úspěšně ověřen</h1><p>Můžete se přihlásit.</p>"
+
+def retry_dead():
+    """Znovu zařadí e-maily ve stavu 'dead'. Vrací jejich počet."""
+    count = EmailOutbox.query.filter_by(status='dead').update(
+        {'status': 'queued', 'attempts': 0, 'next_attempt_at': datetime.utcnow()}, synchronize_session=False
     )
+    db.session.commit()
+    return count
+
+def outbox_stats():
+    return dict(db.session.query(EmailOutbox.status, db.func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+
+# ---------- Dispečer ----------
+_wake = threading.Event()
+_dispatcher = None
+
+def wake_dispatcher():
+    """Po commitu nového e-mailu - dispečer nečeká na další interval"""
+    _wake.set()
+
+def _dispatch_loop(app, backend):
+    limiter = RateLimiter(app.config['EMAIL_RATE_PER_MINUTE'])
+    while True:
+        _wake.wait(POLL_SECONDS)
+        _wake.clear()
+        with app.app_context():
+            try:
+                recover_outbox(app.config['EMAIL_STALE_SECONDS'])
+                while True:
+                    allowed = min(BATCH_SIZE, limiter.available())
+                    if allowed == 0:
+                        break  # Limit vyčerpán - pokračuje se v dalším intervalu
+                    sent = process_outbox(backend, allowed, app.config['EMAIL_MAX_ATTEMPTS'])
+                    limiter.take(sent)
+                    if sent < allowed:
+                        break
+            except Exception:
+                traceback.print_exc()
+            finally:
+                db.session.remove()
+
+def init_email(app, start=True):
+    """Spustí dispečera odchozích e-mailů ve vlákně na pozadí (se start=False
+    jen nastaví konfiguraci - frontu pak odešle flask send-emails)."""
+    global _dispatcher
+    default_backend = 'sendgrid' if os.getenv('SENDGRID_API_KEY') else 'file'
+    if default_backend == 'file' and not os.getenv('EMAIL_BACKEND') and 'EMAIL_BACKEND' not in app.config \
+            and not (app.debug or os.getenv('FLASK_ENV') == 'development'):
+        app.logger.warning("SENDGRID_API_KEY ani EMAIL_BACKEND nejsou nastavené - e-maily se jen ukládají "
+                           "jako .eml soubory do EMAIL_FILE_DIR a nikomu se neodešlou")
+    app.config.setdefault('EMAIL_BACKEND', os.getenv('EMAIL_BACKEND', default_backend))
+    app.config.setdefault('EMAIL_RATE_PER_MINUTE', int(os.getenv('EMAIL_RATE_PER_MINUTE', 60)))
+    app.config.setdefault('EMAIL_MAX_ATTEMPTS', int(os.getenv('EMAIL_MAX_ATTEMPTS', 8)))
+    app.config.setdefault('EMAIL_STALE_SECONDS', 300)
+    app.config.setdefault('EMAIL_DISPATCHER', os.getenv('EMAIL_DISPATCHER', 'true').lower() == 'true')
+
+    if start and app.config['EMAIL_DISPATCHER'] and _dispatcher is None:
+        backend = create_email_backend(app.config)
+        _dispatcher = threading.Thread(target=_dispatch_loop, args=(app, backend), name='email-dispatcher', daemon=True)
+        _dispatcher.start()
+        wake_dispatcher()  # E-maily zařazené před restartem
@@ -0,0 +1,80 @@
+import json
+import queue
+import threading
+from collections import deque
+
+# Sběrnice událostí v rámci procesu. Routy po commitu publikují změny
+# zakázek, SSE endpoint /api/orders/stream je rozesílá přihlášeným klientům.
+# Poslední události se drží v kruhovém bufferu, aby klient po výpadku
+# spojení mohl navázat přes hlavičku Last-Event-ID.
+#
+# Sběrnice nepřenáší události mezi procesy: při WEB_CONCURRENCY > 1 klient
+# streamu dostane jen změny provedené ve stejném gunicorn workeru a čísla
+# událostí (Last-Event-ID) platí jen v rámci procesu. SSE proto vyžaduje
+# jeden worker (WEB_CONCURRENCY=1, souběžnost přes WEB_THREADS).
+
+HISTORY_SIZE = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+class EventBus:
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._last_id = 0
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._last_id += 1
+            event = {'id': self._last_id, 'type': event_type, 'data': data}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                pass  # Pomalý klient - po reconnectu si dočte historii
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """Vrátí (fronta nových událostí, zmeškané události od last_event_id)"""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            missed = [e for e in self._history if last_event_id is not None and e['id'] > last_event_id]
+        return subscriber, missed
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+bus = EventBus()
+
+def publish_order_event(event_type, order=None, order_id=None):
+    """Publikuje změnu zakázky ('created', 'updated', 'deleted')"""
+    if order is not None:
+        data = order.to_dict()
+    else:
+        data = {'id': order_id}
+    return bus.publish(event_type, data)
+
+def order_visible_to(order, user_id, role):
+    """Stejná pravidla viditelnosti jako GET /api/orders"""
+    if role == 'admin':
+        return True
+    if role == 'zakaznik':
+        return order.get('customer_id') == user_id
+    if role == 'brigadnik':
+        return order.get('status') == 'open' or order.get('worker_id') == user_id
+    return False
+
+def format_sse(event, user_id, role):
+    """Převede událost na SSE zprávu pro daného uživatele (None = neposílat)"""
+    event_type, order = event['type'], event['data']
+    if event_type != 'deleted' and not order_visible_to(order, user_id, role):
+        if role != 'brigadnik':
+            return None
+        # Zakázku si vzal jiný brigádník - klient ji má odebrat ze seznamu
+        event_type, order = 'deleted', {'id': order['id']}
+    payload = json.dumps({'type': event_type, 'order': order}, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: order\ndata: {payload}\n\n"
@@ -0,0 +1,49 @@
+import math
+
+# Prostorový index zakázek: mřížka 0,1° × 0,1° (cca 11 × 7 km v ČR).
+# Číslo buňky = řádek (zeměpisná šířka) * GRID_COLUMNS + sloupec (délka),
+# takže buňky jednoho řádku tvoří souvislý interval a okolí bodu se dá
+# vyhledat několika dotazy BETWEEN nad indexem (status, geo_cell).
+
+CELL_DEGREES = 0.1
+GRID_COLUMNS = 3600  # 360° / 0,1°
+EARTH_RADIUS_KM = 6371.0
+
+def _row(lat):
+    return int(math.floor((lat + 90.0) / CELL_DEGREES))
+
+def _column(lon):
+    return min(int(math.floor((lon + 180.0) / CELL_DEGREES)), GRID_COLUMNS - 1)
+
+def grid_cell(lat, lon):
+    """Číslo buňky mřížky pro souřadnice (None pokud chybí)"""
+    if lat is None or lon is None:
+        return None
+    return _row(lat) * GRID_COLUMNS + _column(lon)
+
+def bounding_box(lat, lon, radius_km):
+    """Obdélník (min_lat, max_lat, min_lon, max_lon) opsaný kruhu o poloměru radius_km"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return (
+        max(lat - dlat, -90.0), min(lat + dlat, 90.0),
+        max(lon - dlon, -180.0), min(lon + dlon, 180.0)
+    )
+
+def cell_ranges(lat, lon, radius_km):
+    """Intervaly čísel buněk (od, do) pokrývající okolí bodu - jeden na řádek mřížky"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    first_column, last_column = _column(min_lon), _column(max_lon)
+    return [
+        (row * GRID_COLUMNS + first_column, row * GRID_COLUMNS + last_column)
+        for row in range(_row(min_lat), _row(max_lat) + 1)
+    ]
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Vzdálenost dvou bodů na povrchu Země v km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
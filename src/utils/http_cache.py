@@ -0,0 +1,148 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, g, make_response, request
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from src.models.user import db, ResourceVersion
+
+# Podmíněné GET požadavky a cache odpovědí pro často dotazované seznamy.
+# Každý zdroj ('orders', 'order:<id>', 'ratings', 'ratings:<user_id>') má
+# v tabulce resource_version čítač, který se zvyšuje ve stejné transakci
+# jako změna dat (volající commituje). Z verzí, uživatele a URL vzniká slabý
+# ETag - shodný If-None-Match vrací 304, jinak se hotová odpověď vezme
+# z LRU cache procesu. Verze se čtou před dotazem na data, takže odpověď
+# nikdy není uložena pod novější verzí, než ke které patří.
+#
+# Verze si proces drží HTTP_CACHE_VERSION_TTL sekund (0 = číst pokaždé).
+# Vlastní změny zneplatní verze v procesu hned po commitu, ostatní gunicorn
+# workery je uvidí nejpozději po TTL.
+
+HTTP_CACHE_VERSION_TTL = float(os.getenv('HTTP_CACHE_VERSION_TTL', 1))
+HTTP_CACHE_SIZE = int(os.getenv('HTTP_CACHE_SIZE', 1000))  # Počet odpovědí, 0 = jen ETagy
+HTTP_CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+CACHED_HEADERS = ('Content-Type', 'X-Next-Cursor')
+
+_versions = {}  # název zdroje -> (verze, čas načtení)
+_responses = OrderedDict()  # ETag -> (tělo, status, hlavičky)
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+def bump_versions(*names):
+    """Zvýší verze zdrojů v aktuální transakci (volající commituje)"""
+    for name in names:
+        db.session.execute(text(
+            'INSERT INTO resource_version (name, version) VALUES (:name, 1) '
+            'ON CONFLICT (name) DO UPDATE SET version = resource_version.version + 1'
+        ), {'name': name})
+    db.session.info.setdefault('bumped_versions', set()).update(names)
+
+def order_changed(order_id):
+    """Zakázka se změnila - seznamy zakázek i detail mají novou verzi"""
+    bump_versions('orders', f'order:{order_id}')
+
+@event.listens_for(Session, 'after_commit')
+def _forget_bumped(session):
+    names = session.info.pop('bumped_versions', None)
+    if names:
+        with _lock:
+            for name in names:
+                _versions.pop(name, None)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_bumped(session):
+    session.info.pop('bumped_versions', None)
+
+def get_versions(names):
+    """Aktuální verze zdrojů ve stejném pořadí (neznámý zdroj má verzi 0)"""
+    now = time.monotonic()
+    result, missing = {}, []
+    with _lock:
+        for name in names:
+            cached = _versions.get(name)
+            if cached is not None and now - cached[1] < HTTP_CACHE_VERSION_TTL:
+                result[name] = cached[0]
+            else:
+                missing.append(name)
+    if missing:
+        rows = dict(db.session.query(ResourceVersion.name, ResourceVersion.version)
+                    .filter(ResourceVersion.name.in_(missing)).all())
+        with _lock:
+            for name in missing:
+                result[name] = rows.get(name, 0)
+                if HTTP_CACHE_VERSION_TTL > 0:
+                    _versions[name] = (result[name], now)
+    return [result[name] for name in names]
+
+def _cache_get(etag):
+    global _hits, _misses
+    with _lock:
+        entry = _responses.get(etag)
+        if entry is None:
+            _misses += 1
+            return None
+        _responses.move_to_end(etag)
+        _hits += 1
+        return entry
+
+def _cache_put(etag, entry):
+    if HTTP_CACHE_SIZE <= 0 or len(entry[0]) > HTTP_CACHE_MAX_ENTRY_BYTES:
+        return
+    with _lock:
+        _responses[etag] = entry
+        _responses.move_to_end(etag)
+        while len(_responses) > HTTP_CACHE_SIZE:
+            _responses.popitem(last=False)
+
+def cache_stats():
+    with _lock:
+        return {'entries': len(_responses), 'hits': _hits, 'misses': _misses,
+                'versions_cached': len(_versions)}
+
+def clear_cache():
+    global _hits, _misses
+    with _lock:
+        _responses.clear()
+        _versions.clear()
+        _hits = _misses = 0
+
+def conditional_get(*resources):
+    """Dekorátor GET routy (pod @require_role): ETag z verzí zdrojů, 304 na
+    If-None-Match a cache hotových odpovědí. Zdroje mohou obsahovat parametry
+    routy, např. 'order:{order_id}'. Cachují se jen odpovědi 200."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            identity = g.identity
+            names = [resource.format(**kwargs) for resource in resources]
+            version = '.'.join(str(v) for v in get_versions(names))
+            digest = hashlib.sha1(
+                f'{identity.id}:{identity.role}:{identity.is_approved}:{request.full_path}'.encode()
+            ).hexdigest()[:16]
+            etag = f'{version}-{digest}'
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+
+            entry = _cache_get(etag)
+            if entry is not None:
+                body, status, headers = entry
+                response = Response(body, status=status, headers=headers)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                headers = [(key, response.headers[key]) for key in CACHED_HEADERS if key in response.headers]
+                _cache_put(etag, (response.get_data(), 200, headers))
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
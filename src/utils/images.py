@@ -0,0 +1,63 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+# Zpracování nahraných fotek: jednou dekódovat a vytvořit zmenšené varianty
+# pro zobrazení (WebP + JPEG) a pro AI analýzu. Běží v poolu procesů, aby
+# CPU náročné dekódování neblokovalo vlákna aplikace.
+# Modul schválně neimportuje Flask ani modely - načítá se i v podprocesech.
+
+VARIANT_WIDTHS = (320, 640, 1024)  # 320 = náhled, 1024 = i pro AI analýzu
+ANALYSIS_WIDTH = 1024
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_TIMEOUT_SECONDS = 60
+
+_pool = None
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn - fork procesu s běžícími vlákny (fronta úloh) není bezpečný
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+def create_variants(source_path, dest_dir, stem):
+    """Vytvoří varianty fotky. Vrací {'jpeg': {šířka: soubor}, 'webp': {...}, 'analysis': soubor}"""
+    with Image.open(source_path) as image:
+        # JPEG dekodér umí zmenšovat už při dekódování (DCT scaling)
+        image.draft('RGB', (max(VARIANT_WIDTHS) * 2, max(VARIANT_WIDTHS) * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        variants = {'jpeg': {}, 'webp': {}}
+        for width in sorted(VARIANT_WIDTHS, reverse=True):
+            if image.width > width:
+                height = round(image.height * width / image.width)
+                image = image.resize((width, height), Image.LANCZOS)
+            jpeg_name = f"{stem}_{width}.jpg"
+            webp_name = f"{stem}_{width}.webp"
+            image.save(os.path.join(dest_dir, jpeg_name), 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            image.save(os.path.join(dest_dir, webp_name), 'WEBP', quality=WEBP_QUALITY, method=4)
+            # Klíče jako řetězce - varianty se ukládají do JSON
+            variants['jpeg'][str(width)] = jpeg_name
+            variants['webp'][str(width)] = webp_name
+
+    variants['analysis'] = variants['jpeg'][str(ANALYSIS_WIDTH)]
+    return variants
+
+def process_image(source_path, dest_dir, stem):
+    """Spustí create_variants v poolu procesů a počká na výsledek"""
+    if IMAGE_WORKERS <= 0:
+        return create_variants(source_path, dest_dir, stem)
+    future = _get_pool().submit(create_variants, source_path, dest_dir, stem)
+    return future.result(timeout=IMAGE_TIMEOUT_SECONDS)
+
+def variant_files(variants):
+    """Všechny soubory patřící k fotce (pro mazání)"""
+    if not variants:
+        return []
+    return list(variants['jpeg'].values()) + list(variants['webp'].values())
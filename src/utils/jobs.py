@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from src.models.user import db, Job
+
+# Fronta úloh na pozadí. Úlohy se ukládají do tabulky `job` ve stejné
+# transakci jako data, ke kterým patří, takže přežijí restart i pád workeru.
+# Neúspěšná úloha se zopakuje po JOB_RETRY_DELAY × 2^(pokus-1) sekundách,
+# nejvýše JOB_MAX_ATTEMPTS pokusů.
+
+_handlers = {}
+_failure_handlers = {}
+_executor = None
+_app = None
+_current = threading.local()  # Id úlohy, kterou právě zpracovává toto vlákno
+
+def job_handler(kind, on_failure=None):
+    """Dekorátor registrující funkci, která zpracuje úlohy daného typu."""
+    def decorator(func):
+        _handlers[kind] = func
+        if on_failure:
+            _failure_handlers[kind] = on_failure
+        return func
+    return decorator
+
+def init_jobs(app, start=True):
+    """Spustí pool workerů a znovu zařadí úlohy nedokončené před restartem.
+    Se start=False (příkazy flask ...) se pool nespustí a úlohy zařazené
+    v tomto procesu se zpracují hned ve vlákně, které je zařadilo."""
+    global _executor, _app
+    _app = app
+    app.config.setdefault('JOB_WORKERS', int(os.getenv('JOB_WORKERS', 4)))
+    app.config.setdefault('JOBS_SYNC', os.getenv('JOBS_SYNC', 'false').lower() == 'true')
+    app.config.setdefault('JOB_MAX_ATTEMPTS', 3)
+    app.config.setdefault('JOB_RETRY_DELAY', float(os.getenv('JOB_RETRY_DELAY', 5)))
+    app.config.setdefault('JOB_STALE_SECONDS', 600)
+    if not start:
+        return
+
+    if not app.config['JOBS_SYNC'] and _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'], thread_name_prefix='job')
+
+    with app.app_context():
+        recover_jobs()
+
+def enqueue(kind, payload):
+    """Přidá úlohu do session. Po commitu je potřeba zavolat dispatch(job.id)."""
+    job = Job(kind=kind, payload=json.dumps(payload), status='queued')
+    db.session.add(job)
+    return job
+
+def dispatch(job_id):
+    """Předá uloženou úlohu ke zpracování (v JOBS_SYNC režimu hned v tomto vlákně)."""
+    if _executor is None:
+        run_job(job_id)
+    else:
+        _executor.submit(_run_in_app_context, job_id)
+
+def _run_in_app_context(job_id):
+    with _app.app_context():
+        try:
+            run_job(job_id)
+        finally:
+            db.session.remove()
+
+def run_job(job_id):
+    """Zpracuje jednu úlohu. Vrací True, pokud ji toto volání skutečně provedlo."""
+    # Převzetí úlohy podmíněným UPDATE - stejnou úlohu nezpracují dva workery
+    claimed = Job.query.filter_by(id=job_id, status='queued').update({
+        'status': 'running',
+        'started_at': datetime.utcnow(),
+        'attempts': Job.attempts + 1
+    })
+    db.session.commit()
+    if not claimed:
+        return False
+
+    job = db.session.get(Job, job_id)
+    payload = json.loads(job.payload)
+    _current.job_id = job_id
+    try:
+        _handlers[job.kind](payload)
+    except Exception:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = traceback.format_exc()[-2000:]
+        if job.attempts < _app.config['JOB_MAX_ATTEMPTS']:
+            job.status = 'queued'
+            db.session.commit()
+            _retry_later(job_id, job.attempts)
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            on_failure = _failure_handlers.get(job.kind)
+            if on_failure:
+                on_failure(payload)
+            db.session.commit()
+        return True
+    finally:
+        _current.job_id = None
+
+    job.status = 'done'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+def _retry_later(job_id, attempts):
+    """Znovu předá úlohu po exponenciálně rostoucím čekání. Čekání v paměti
+    restart nepřežije - úlohu ve stavu 'queued' pak zařadí recover_jobs."""
+    delay = _app.config['JOB_RETRY_DELAY'] * 2 ** (attempts - 1)
+    if _executor is None:
+        time.sleep(delay)  # JOBS_SYNC a příkazy flask ... - opakuje se v tomto vlákně
+        dispatch(job_id)
+    else:
+        timer = threading.Timer(delay, dispatch, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+
+def report_progress(progress):
+    """Uloží průběh právě zpracovávané úlohy (JSON, vrací ho GET /api/admin/jobs/<id>).
+    Mimo úlohu (např. z CLI) nedělá nic. Potvrzuje vlastní transakci."""
+    job_id = getattr(_current, 'job_id', None)
+    if job_id is None:
+        return
+    Job.query.filter_by(id=job_id).update({'progress': json.dumps(progress)}, synchronize_session=False)
+    db.session.commit()
+
+def recover_jobs():
+    """Znovu zařadí čekající úlohy a úlohy, které uvízly ve stavu 'running'."""
+    stale_before = datetime.utcnow() - timedelta(seconds=_app.config['JOB_STALE_SECONDS'])
+    Job.query.filter(Job.status == 'running', Job.started_at < stale_before).update(
+        {'status': 'queued'}, synchronize_session=False
+    )
+    db.session.commit()
+    for (job_id,) in db.session.query(Job.id).filter_by(status='queued').order_by(Job.id).all():
+        dispatch(job_id)
@@ -0,0 +1,235 @@
+import os
+import re
+import heapq
+import json
+import time
+import threading
+from datetime import date, datetime, timedelta
+from src.models.user import db, User, Order, WorkerRecommendation
+from src.utils.geo import haversine_km
+from src.utils.ratings import bayesian_score
+
+# Párování brigádníků a zakázek. Nářadí a volné dny z registrace (JSON
+# seznamy v User.naradi / User.volne_dny) se převádějí na bitové masky,
+# takže porovnání jednoho páru je pár bitových operací.
+# Dávkový režim (flask precompute-matches) uloží top-N zakázek každého
+# brigádníka do tabulky worker_recommendation; GET /api/matching/orders je
+# použije, dokud nejsou starší než RECOMMENDATION_TTL sekund.
+
+TOOLS = ['sekacka', 'strihac', 'pila', 'lopata', 'hrabe', 'kos', 'stetic', 'jine']
+DAYS = ['pondeli', 'utery', 'streda', 'ctvrtek', 'patek', 'sobota', 'nedele']  # date.weekday()
+
+TOOL_BITS = {tool: 1 << i for i, tool in enumerate(TOOLS)}
+DAY_BITS = {day: 1 << i for i, day in enumerate(DAYS)}
+
+# Potřebné nářadí odhadnuté z textu zakázky (popis + AI analýza)
+TOOL_KEYWORDS = {
+    'sekacka': r'sek[aá]|sečen|tr[aá]v|tr[aá]vn[ií]k',
+    'strihac': r'keř|ke[rř]e|živ[yý]\s*plot|st[rř][ií]h',
+    'pila': r'pil[aouy]|strom|v[eě]tv|pa[rř]ez|k[aá]cen',
+    'lopata': r'lopat|kop[aá]|r[yý][cč]|z[aá]hon|hl[ií]n|zemin',
+    'hrabe': r'hrab|list[ií]|mech',
+    'kos': r'kos[aiuy]|kos[ií]t|plevel|kop[rř]iv',
+    'stetic': r'n[aá]t[eě]r|nat[ií]r|barv|mal[oi]v|lak',
+}
+TOOL_PATTERNS = {tool: re.compile(pattern, re.IGNORECASE) for tool, pattern in TOOL_KEYWORDS.items()}
+
+# Váhy skóre (součet 1)
+WEIGHT_TOOLS = 0.4
+WEIGHT_DISTANCE = 0.25
+WEIGHT_AVAILABILITY = 0.15
+WEIGHT_RATING = 0.2
+
+MAX_DISTANCE_KM = 50.0
+UPCOMING_DAYS = 3  # Zakázka se typicky dělá v nejbližších dnech
+INDEX_TTL_SECONDS = 60
+RECOMMENDATION_TTL = int(os.getenv('RECOMMENDATION_TTL', 3600))
+
+def _parse_list(value):
+    try:
+        items = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    return items if isinstance(items, list) else []
+
+def tool_mask(naradi):
+    mask = 0
+    for tool in _parse_list(naradi):
+        mask |= TOOL_BITS.get(tool, 0)
+    return mask
+
+def day_mask(volne_dny):
+    mask = 0
+    for day in _parse_list(volne_dny):
+        mask |= DAY_BITS.get(day, 0)
+    return mask
+
+def required_tools(*texts):
+    """Maska nářadí, které zakázka pravděpodobně potřebuje"""
+    text = ' '.join(t for t in texts if t)
+    mask = 0
+    for tool, pattern in TOOL_PATTERNS.items():
+        if pattern.search(text):
+            mask |= TOOL_BITS[tool]
+    return mask
+
+def upcoming_mask(today=None, days=UPCOMING_DAYS):
+    today = today or date.today()
+    mask = 0
+    for offset in range(days):
+        mask |= 1 << (today + timedelta(days=offset)).weekday()
+    return mask
+
+def score_pair(worker, order, upcoming):
+    """Skóre 0..1 pro dvojici (brigádník, zakázka) z indexu"""
+    # Nářadí - když zákazník má vše potřebné, nářadí brigádníka nehraje roli
+    if order['ma_vse_potrebne'] or not order['tools']:
+        tools = 1.0
+    else:
+        tools = bin(worker['tools'] & order['tools']).count('1') / bin(order['tools']).count('1')
+
+    distance = None
+    if worker['lat'] is not None and order['lat'] is not None:
+        distance = haversine_km(worker['lat'], worker['lon'], order['lat'], order['lon'])
+        distance_score = max(0.0, 1.0 - distance / MAX_DISTANCE_KM)
+    else:
+        distance_score = 0.5  # Neznámá poloha - neutrální
+
+    availability = bin(worker['days'] & upcoming).count('1') / bin(upcoming).count('1')
+    rating = (worker['rating'] - 1) / 4
+
+    score = (WEIGHT_TOOLS * tools + WEIGHT_DISTANCE * distance_score +
+             WEIGHT_AVAILABILITY * availability + WEIGHT_RATING * rating)
+    return score, distance
+
+def _order_entry(order_id, title, description, ai_analysis, ma_vse_potrebne, lat, lon):
+    return {
+        'id': order_id,
+        'tools': required_tools(title, description, ai_analysis),
+        'ma_vse_potrebne': bool(ma_vse_potrebne),
+        'lat': lat if lon is not None else None,
+        'lon': lon if lat is not None else None,
+    }
+
+class MatchingIndex:
+    """Předpočítané masky schválených brigádníků a otevřených zakázek"""
+
+    def __init__(self):
+        self.workers = {}
+        self.orders = {}
+        self.built_at = 0.0
+
+    def build(self):
+        # Poloha brigádníka = těžiště jeho dosavadních zakázek
+        locations = dict(
+            (worker_id, (lat, lon)) for worker_id, lat, lon in db.session.query(
+                Order.worker_id, db.func.avg(Order.latitude), db.func.avg(Order.longitude)
+            ).filter(Order.worker_id.isnot(None), Order.latitude.isnot(None)).group_by(Order.worker_id)
+        )
+
+        workers = {}
+        # Hodnocení je agregované přímo v tabulce user (utils/ratings.py)
+        for worker_id, naradi, volne_dny, rating_sum, rating_count in db.session.query(
+            User.id, User.naradi, User.volne_dny, User.rating_sum, User.rating_count
+        ).filter(User.role == 'brigadnik', User.is_approved.is_(True)):
+            lat, lon = locations.get(worker_id, (None, None))
+            workers[worker_id] = {
+                'id': worker_id,
+                'tools': tool_mask(naradi),
+                'days': day_mask(volne_dny),
+                'rating': bayesian_score(rating_sum, rating_count),
+                'lat': lat,
+                'lon': lon,
+            }
+
+        orders = {}
+        for row in db.session.query(
+            Order.id, Order.title, Order.description, Order.ai_analysis,
+            Order.ma_vse_potrebne, Order.latitude, Order.longitude
+        ).filter(Order.status == 'open'):
+            orders[row[0]] = _order_entry(*row)
+
+        self.workers, self.orders = workers, orders
+        self.built_at = time.monotonic()
+        return self
+
+    def rank_orders(self, worker_id, limit=20, lat=None, lon=None):
+        """Otevřené zakázky seřazené pro brigádníka (lat/lon přepíše odhad polohy)"""
+        worker = self.workers.get(worker_id)
+        if worker is None:
+            return []
+        if lat is not None and lon is not None:
+            worker = dict(worker, lat=lat, lon=lon)
+        upcoming = upcoming_mask()
+        ranked = heapq.nlargest(limit, (
+            (score_pair(worker, order, upcoming), order['id']) for order in self.orders.values()
+        ), key=lambda item: item[0][0])
+        return [(order_id, score, distance) for (score, distance), order_id in ranked]
+
+    def rank_workers(self, order_id, limit=20):
+        """Schválení brigádníci seřazení pro zakázku"""
+        order = self.orders.get(order_id)
+        if order is None:
+            return []
+        upcoming = upcoming_mask()
+        ranked = heapq.nlargest(limit, (
+            (score_pair(worker, order, upcoming), worker['id']) for worker in self.workers.values()
+        ), key=lambda item: item[0][0])
+        return [(worker_id, score, distance) for (score, distance), worker_id in ranked]
+
+    def precompute_recommendations(self, top_n=10):
+        """Dávkově spočítá top-N zakázek pro každého brigádníka"""
+        return {worker_id: self.rank_orders(worker_id, limit=top_n) for worker_id in self.workers}
+
+def save_recommendations(recommendations):
+    """Uloží dávku doporučení {worker_id: [(order_id, skóre, vzdálenost)]}
+    místo předchozí (brigádník, který mezitím ztratil schválení, v ní chybí)"""
+    now = datetime.utcnow()
+    WorkerRecommendation.query.delete()
+    if recommendations:
+        db.session.execute(WorkerRecommendation.__table__.insert(), [{
+            'worker_id': worker_id,
+            'orders': json.dumps([[order_id, round(score, 4), round(distance, 3) if distance is not None else None]
+                                  for order_id, score, distance in ranked]),
+            'computed_at': now,
+        } for worker_id, ranked in recommendations.items()])
+    db.session.commit()
+
+def stored_recommendations(worker_id, max_age=RECOMMENDATION_TTL):
+    """Doporučení z poslední dávky [(order_id, skóre, vzdálenost)], None když
+    chybí nebo jsou starší než max_age sekund"""
+    entry = db.session.get(WorkerRecommendation, worker_id)
+    if entry is None or entry.computed_at < datetime.utcnow() - timedelta(seconds=max_age):
+        return None
+    return [tuple(item) for item in json.loads(entry.orders)]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_matching_index(max_age=INDEX_TTL_SECONDS):
+    """Vrátí index; přestaví ho, pokud je starší než max_age sekund nebo zneplatněný"""
+    global _index
+    with _index_lock:
+        if _index is None or time.monotonic() - _index.built_at > max_age:
+            _index = MatchingIndex().build()
+        return _index
+
+def order_opened(order):
+    """Přidá (znovu) otevřenou zakázku do existujícího indexu"""
+    with _index_lock:
+        if _index is not None:
+            _index.orders[order.id] = _order_entry(
+                order.id, order.title, order.description, order.ai_analysis,
+                order.ma_vse_potrebne, order.latitude, order.longitude
+            )
+
+def order_closed(order_id):
+    """Odebere přijatou nebo smazanou zakázku z existujícího indexu"""
+    with _index_lock:
+        if _index is not None:
+            _index.orders.pop(order_id, None)
+
+def invalidate_matching_index():
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,327 @@
+import os
+import sys
+import json
+import time
+import glob
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from flask import g, has_request_context, jsonify, request, Response
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Měření požadavků po fázích: SQL (události SQLAlchemy), OpenAI, odesílání
+# e-mailů, hashování hesel a serializace JSON. Zbytek doby požadavku je fáze
+# 'app' (logika rout, to_dict). Výsledky jsou:
+#   - v hlavičce Server-Timing každé odpovědi (SERVER_TIMING=false vypne),
+#   - jako Prometheus metriky na /metrics (METRICS_TOKEN = bearer token,
+#     bez něj jen pro přihlášeného admina).
+# Fáze mimo požadavek (úlohy na pozadí, dispečer e-mailů) se počítají jen do
+# souhrnných metrik s endpointem 'background'.
+#
+# Metriky jsou v paměti procesu. S více gunicorn workery nastavte METRICS_DIR
+# - každý proces tam průběžně ukládá svůj stav a /metrics je sečte.
+#
+# PROFILE_SLOW_MS zapne vzorkovací profiler: vlákno každých
+# PROFILE_INTERVAL_MS ms zaznamená zásobník běžících požadavků a požadavky
+# delší než limit uloží do PROFILE_DIR ve formátu "collapsed stacks"
+# (flamegraph.pl, speedscope).
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_FLUSH_SECONDS = 5
+
+METRIC_HELP = {
+    'http_requests_total': ('counter', 'Počet HTTP požadavků'),
+    'http_request_duration_seconds': ('histogram', 'Doba zpracování HTTP požadavku'),
+    'http_request_phase_seconds_total': ('counter', 'Čas strávený ve fázi zpracování'),
+    'db_queries_total': ('counter', 'Počet SQL dotazů'),
+    'phase_calls_total': ('counter', 'Počet volání ve fázi (OpenAI, e-mail, hashování, serializace)'),
+    'profiles_written_total': ('counter', 'Uložené profily pomalých požadavků'),
+    'price_estimates_total': ('counter', 'Odhady ceny zakázky podle zdroje (lokální model, OpenAI)'),
+}
+
+class Registry:
+    """Čítače a histogramy procesu, klíč = (název metriky, seřazené štítky)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(DURATION_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(h[0]), h[1], h[2]] for (name, labels), h in self.histograms.items()],
+            }
+
+registry = Registry()
+
+# ---------- Fáze ----------
+def _record_phase(phase, seconds, calls=1):
+    timings = g.get('phase_timings') if has_request_context() else None
+    if timings is not None:
+        timings[phase][0] += seconds
+        timings[phase][1] += calls
+        return
+    labels = {'endpoint': 'background', 'phase': phase}
+    registry.inc('http_request_phase_seconds_total', labels, seconds)
+    if phase == 'db':
+        registry.inc('db_queries_total', {'endpoint': 'background'}, calls)
+    else:
+        registry.inc('phase_calls_total', labels, calls)
+
+@contextmanager
+def timed(phase):
+    """Započítá dobu bloku do fáze aktuálního požadavku (nebo 'background')"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_phase(phase, time.perf_counter() - start)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if starts:
+        _record_phase('db', time.perf_counter() - starts.pop())
+
+@event.listens_for(Engine, 'handle_error')
+def _query_failed(exception_context):
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if starts:
+        _record_phase('db', time.perf_counter() - starts.pop())
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider Flasku, který měří serializaci odpovědí (jsonify)"""
+
+    def response(self, *args, **kwargs):
+        with timed('serialize'):
+            return super().response(*args, **kwargs)
+
+# ---------- Vzorkovací profiler ----------
+class SamplingProfiler:
+    def __init__(self, interval, slow_seconds, output_dir):
+        self.interval = interval
+        self.slow_seconds = slow_seconds
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._active = {}  # id vlákna -> Counter zásobníků
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def start(self):
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def stop(self, endpoint, duration):
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks or duration < self.slow_seconds:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{endpoint.strip('/').replace('/', '_') or 'root'}-{int(duration * 1000)}ms.folded"
+        path = os.path.join(self.output_dir, name.replace('<', '').replace('>', '').replace(':', '_'))
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        registry.inc('profiles_written_total', {'endpoint': endpoint})
+        return path
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, stacks in active.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f'{code.co_name} ({os.path.basename(code.co_filename)})')
+                    frame = frame.f_back
+                stacks[';'.join(reversed(names))] += 1  # Counter - sčítání pod GIL stačí
+
+# ---------- Middleware ----------
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def _before_request():
+    g.request_start = time.perf_counter()
+    g.phase_timings = defaultdict(lambda: [0.0, 0])
+    profiler = _state.get('profiler')
+    if profiler is not None:
+        profiler.start()
+
+def _after_request(response):
+    start = g.get('request_start')
+    timings = g.get('phase_timings')
+    if start is None or timings is None:
+        return response
+    duration = time.perf_counter() - start
+    endpoint = _endpoint_label()
+
+    registry.inc('http_requests_total', {'method': request.method, 'endpoint': endpoint,
+                                         'status': str(response.status_code)})
+    registry.observe('http_request_duration_seconds', {'method': request.method, 'endpoint': endpoint}, duration)
+    accounted = 0.0
+    for phase, (seconds, calls) in timings.items():
+        accounted += seconds
+        registry.inc('http_request_phase_seconds_total', {'endpoint': endpoint, 'phase': phase}, seconds)
+        if phase == 'db':
+            registry.inc('db_queries_total', {'endpoint': endpoint}, calls)
+        else:
+            registry.inc('phase_calls_total', {'endpoint': endpoint, 'phase': phase}, calls)
+    registry.inc('http_request_phase_seconds_total', {'endpoint': endpoint, 'phase': 'app'},
+                 max(duration - accounted, 0.0))
+
+    if _state['server_timing']:
+        parts = [f"{phase};dur={seconds * 1000:.1f}" + (f';desc="dotazy: {calls}"' if phase == 'db' else '')
+                 for phase, (seconds, calls) in timings.items()]
+        parts.append(f'total;dur={duration * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(parts)
+
+    profiler = _state.get('profiler')
+    if profiler is not None:
+        profiler.stop(endpoint, duration)
+    g.pop('phase_timings')
+    _flush_if_due()
+    return response
+
+def _teardown_request(exception):
+    # Požadavek skončil výjimkou bez odpovědi - zásobníky vlákna zahodit
+    profiler = _state.get('profiler')
+    if profiler is not None and g.get('phase_timings') is not None:
+        profiler.stop(_endpoint_label(), 0.0)
+
+# ---------- Export ----------
+def _flush_if_due(force=False):
+    """Uloží stav procesu do METRICS_DIR (nejvýše jednou za METRICS_FLUSH_SECONDS)"""
+    directory = _state.get('directory')
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _state['flushed_at'] < METRICS_FLUSH_SECONDS:
+        return
+    _state['flushed_at'] = now
+    path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(path + '.tmp', path)
+
+def _collect():
+    """Snapshoty všech procesů (nebo jen tohoto) sečtené dohromady"""
+    directory = _state.get('directory')
+    if directory:
+        _flush_if_due(force=True)
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # Soubor se právě přepisuje
+    else:
+        snapshots = [registry.snapshot()]
+
+    counters, histograms = defaultdict(float), {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(DURATION_BUCKETS), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}' if labels else ''
+
+def render_metrics():
+    """Metriky v textovém formátu Prometheus"""
+    counters, histograms = _collect()
+    lines = []
+    for metric, (kind, help_text) in METRIC_HELP.items():
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        if kind == 'counter':
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f'{metric}{_format_labels(labels)} {value:g}')
+        else:
+            for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                    lines.append(f'{metric}_bucket{_format_labels(labels + (("le", f"{bound:g}"),))} {bucket_count}')
+                lines.append(f'{metric}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{metric}_sum{_format_labels(labels)} {total:.6f}')
+                lines.append(f'{metric}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+def metrics_view():
+    token = os.getenv('METRICS_TOKEN')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'error': 'Neplatný token'}), 401
+    else:
+        from src.utils.auth import current_identity
+        identity = current_identity()
+        if identity is None or identity.role != 'admin':
+            return jsonify({'error': 'Pouze admin má přístup k metrikám'}), 403
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+_state = {'server_timing': True, 'directory': None, 'flushed_at': 0.0, 'profiler': None}
+
+def init_metrics(app):
+    """Zaregistruje měření požadavků, /metrics a volitelně profiler."""
+    app.config.setdefault('SERVER_TIMING', os.getenv('SERVER_TIMING', 'true').lower() == 'true')
+    app.config.setdefault('METRICS_DIR', os.getenv('METRICS_DIR'))
+    app.config.setdefault('PROFILE_SLOW_MS', int(os.getenv('PROFILE_SLOW_MS', 0)))
+    app.config.setdefault('PROFILE_INTERVAL_MS', int(os.getenv('PROFILE_INTERVAL_MS', 5)))
+    app.config.setdefault('PROFILE_DIR', os.getenv('PROFILE_DIR', os.path.join('src', 'database', 'profiles')))
+
+    _state['server_timing'] = app.config['SERVER_TIMING']
+    _state['directory'] = app.config['METRICS_DIR']
+    if _state['directory']:
+        os.makedirs(_state['directory'], exist_ok=True)
+    if app.config['PROFILE_SLOW_MS'] > 0 and _state['profiler'] is None:
+        _state['profiler'] = SamplingProfiler(app.config['PROFILE_INTERVAL_MS'] / 1000,
+                                              app.config['PROFILE_SLOW_MS'] / 1000, app.config['PROFILE_DIR'])
+
+    app.json = TimedJSONProvider(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
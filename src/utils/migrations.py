@@ -0,0 +1,180 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from src.models.user import db, PhotoBlob, EmailOutbox, ResourceVersion, WorkerRecommendation
+
+# Verzované migrace schématu. db.create_all() vytvoří jen chybějící tabulky,
+# změny existujících tabulek (nové sloupce, indexy) proto dělají migrace.
+# Každá migrace musí být idempotentní - čerstvá databáze už může mít
+# vše vytvořené z modelů.
+
+def _column_exists(table, column):
+    return column in [c['name'] for c in inspect(db.engine).get_columns(table)]
+
+def _add_column(table, column, ddl):
+    if not _column_exists(table, column):
+        db.session.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+
+def _create_index(name, table, columns):
+    db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({columns})'))
+
+def migration_0001_baseline():
+    """Výchozí schéma (vytvořené přes db.create_all)"""
+
+def migration_0002_order_analysis():
+    """Stav AI analýzy zakázky (úlohy na pozadí)"""
+    _add_column('order', 'analysis_status', "VARCHAR(20) DEFAULT 'done'")
+
+def migration_0003_hot_path_indexes():
+    """Indexy pro dotazy v routes/order.py a routes/user.py"""
+    # GET /orders - zákazník, brigádník (open | vlastní), admin; řazení podle created_at
+    _create_index('ix_order_customer_created', 'order', 'customer_id, created_at')
+    _create_index('ix_order_worker_created', 'order', 'worker_id, created_at')
+    _create_index('ix_order_status_created', 'order', 'status, created_at')
+    _create_index('ix_order_created', 'order', 'created_at, id')
+    # Statistiky (COUNT/SUM zaplacených) - krycí index bez čtení tabulky
+    _create_index('ix_order_status_price', 'order', 'status, final_price')
+    # Ověření emailu a statistiky uživatelů
+    _create_index('ix_user_verification_token', 'user', 'verification_token')
+    _create_index('ix_user_role_approved', 'user', 'role, is_approved')
+    # Hodnocení uživatele a hledání hodnocení zakázky
+    _create_index('ix_rating_worker', 'rating', 'worker_id, worker_rating')
+    _create_index('ix_rating_customer', 'rating', 'customer_id, customer_rating')
+    _create_index('ix_rating_order', 'rating', 'order_id')
+    # Obnova fronty úloh po restartu
+    _create_index('ix_job_status_started', 'job', 'status, started_at')
+
+def migration_0004_order_geo_cell():
+    """Buňka prostorové mřížky pro vyhledávání zakázek v okolí"""
+    from src.utils.geo import grid_cell
+    _add_column('order', 'geo_cell', 'INTEGER')
+    rows = db.session.execute(text(
+        'SELECT id, latitude, longitude FROM "order" '
+        'WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND geo_cell IS NULL'
+    )).all()
+    if rows:
+        db.session.execute(
+            text('UPDATE "order" SET geo_cell = :cell WHERE id = :id'),
+            [{'id': row[0], 'cell': grid_cell(row[1], row[2])} for row in rows]
+        )
+    _create_index('ix_order_status_geo_cell', 'order', 'status, geo_cell')
+
+def migration_0005_stats():
+    """Naplnění materializovaných statistik z existujících dat"""
+    from src.utils.stats import rebuild_stats
+    rebuild_stats()
+
+def migration_0006_photo_variants():
+    """Zmenšené varianty fotek zakázek"""
+    _add_column('order', 'photo_variants', 'TEXT')
+
+def migration_0007_photo_blobs():
+    """Fotky ukládané podle hashe obsahu s počítáním odkazů"""
+    PhotoBlob.__table__.create(db.engine, checkfirst=True)
+    _add_column('order', 'photo_sha256', 'VARCHAR(64)')
+
+def migration_0008_email_outbox():
+    """Fronta odchozích e-mailů"""
+    EmailOutbox.__table__.create(db.engine, checkfirst=True)
+
+def migration_0009_user_rating_aggregates():
+    """Počet a součet hodnocení uživatele (místo AVG přes tabulku rating)"""
+    from src.utils.ratings import rebuild_ratings
+    _add_column('user', 'rating_count', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column('user', 'rating_sum', 'INTEGER NOT NULL DEFAULT 0')
+    rebuild_ratings()
+
+def migration_0010_resource_version():
+    """Verze zdrojů pro ETagy a cache odpovědí"""
+    ResourceVersion.__table__.create(db.engine, checkfirst=True)
+
+def migration_0011_order_search():
+    """Fulltextový index zakázek (FTS5, jen SQLite)"""
+    from src.utils.search import create_search_index
+    create_search_index()
+
+def migration_0012_job_progress():
+    """Průběh dlouhých úloh (přecenění otevřených zakázek)"""
+    _add_column('job', 'progress', 'TEXT')
+
+def migration_0013_worker_recommendations():
+    """Uložená dávková doporučení zakázek pro brigádníky"""
+    WorkerRecommendation.__table__.create(db.engine, checkfirst=True)
+
+def migration_0014_final_price_confirmed():
+    """Finální cena zadaná brigádníkem (učení modelu ceny) - u starších zakázek
+    jen tam, kde se od odhadu liší, shodná mohla být převzatá z odhadu"""
+    if not _column_exists('order', 'final_price_confirmed'):
+        _add_column('order', 'final_price_confirmed', 'BOOLEAN DEFAULT FALSE')
+        db.session.execute(text(
+            'UPDATE "order" SET final_price_confirmed = TRUE WHERE final_price IS NOT NULL '
+            'AND (estimated_price IS NULL OR final_price <> estimated_price)'
+        ))
+
+MIGRATIONS = [
+    (1, 'baseline', migration_0001_baseline),
+    (2, 'order_analysis', migration_0002_order_analysis),
+    (3, 'hot_path_indexes', migration_0003_hot_path_indexes),
+    (4, 'order_geo_cell', migration_0004_order_geo_cell),
+    (5, 'stats', migration_0005_stats),
+    (6, 'photo_variants', migration_0006_photo_variants),
+    (7, 'photo_blobs', migration_0007_photo_blobs),
+    (8, 'email_outbox', migration_0008_email_outbox),
+    (9, 'user_rating_aggregates', migration_0009_user_rating_aggregates),
+    (10, 'resource_version', migration_0010_resource_version),
+    (11, 'order_search', migration_0011_order_search),
+    (12, 'job_progress', migration_0012_job_progress),
+    (13, 'worker_recommendations', migration_0013_worker_recommendations),
+    (14, 'final_price_confirmed', migration_0014_final_price_confirmed),
+]
+
+def applied_versions():
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP NOT NULL)'
+    ))
+    db.session.commit()
+    return {row[0] for row in db.session.execute(text('SELECT version FROM schema_version'))}
+
+# Klíč pg_advisory_xact_lock - na PostgreSQL migrace souběžně startujících
+# workerů běží po jedné (zámek drží transakce migrace)
+MIGRATION_LOCK_KEY = 720_230_001
+
+def _lock_migrations():
+    """Na PostgreSQL počká na zámek migrací. Vrací False, pokud zámek nejde vzít (SQLite)."""
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    db.session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+    return True
+
+def _is_applied(version):
+    return db.session.execute(
+        text('SELECT 1 FROM schema_version WHERE version = :v'), {'v': version}
+    ).first() is not None
+
+def run_migrations(target=None):
+    """Aplikuje chybějící migrace (až po verzi target). Vrací seznam aplikovaných verzí."""
+    done = applied_versions()
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done or (target is not None and version > target):
+            continue
+        try:
+            if _lock_migrations() and _is_applied(version):
+                # Jiný worker ji aplikoval, zatímco se čekalo na zámek
+                db.session.rollback()
+                continue
+            migrate()
+            db.session.execute(
+                text('INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)'),
+                {'v': version, 'n': name, 't': datetime.utcnow()}
+            )
+            db.session.commit()
+            applied.append(version)
+        except (IntegrityError, OperationalError, ProgrammingError):
+            # Jiný worker migraci právě aplikoval (PostgreSQL hlásí už
+            # existující sloupec jako ProgrammingError) - migrace jsou idempotentní
+            db.session.rollback()
+            if version not in applied_versions():
+                raise
+    return applied
@@ -0,0 +1,51 @@
+from src.models.user import db, Order
+from src.utils.http_cache import order_changed
+
+# Stavový automat zakázky. Každý přechod je jeden podmíněný UPDATE
+# (WHERE id = ? AND status = ?), takže ze dvou souběžných požadavků na
+# stejnou zakázku (i z různých gunicorn workerů) uspěje právě jeden.
+# Volající po úspěšném přechodu commituje (verze pro HTTP cache se zvyšuje
+# ve stejné transakci).
+
+# akce -> (výchozí stav, cílový stav)
+TRANSITIONS = {
+    'take': ('open', 'taken'),
+    'release': ('taken', 'open'),  # Brigádník zakázku vrací
+    'complete': ('taken', 'completed'),
+    'pay_partial': ('taken', 'taken'),  # Záloha 1/3, stav se nemění
+    'pay': ('completed', 'paid'),
+}
+
+def apply_transition(order_id, action, worker_id=None, customer_id=None, values=None):
+    """Provede přechod, pokud je zakázka ve výchozím stavu (a patří danému
+    brigádníkovi/zákazníkovi) a nastaví zároveň sloupce z values.
+    Vrací True, pokud byl řádek změněn."""
+    from_status, to_status = TRANSITIONS[action]
+    query = Order.query.filter(Order.id == order_id, Order.status == from_status)
+    if worker_id is not None:
+        query = query.filter(Order.worker_id == worker_id)
+    if customer_id is not None:
+        query = query.filter(Order.customer_id == customer_id)
+
+    values = dict(values or {}, status=to_status)
+    changed = query.update(values, synchronize_session=False)
+    if changed:
+        order_changed(order_id)
+        # Objekt zakázky v session musí po commitu načíst nové hodnoty
+        order = db.session.identity_map.get(db.session.identity_key(Order, order_id))
+        if order is not None:
+            db.session.expire(order)
+    return changed == 1
+
+def delete_open_order(order_id, customer_id=None):
+    """Smaže zakázku jen pokud je stále otevřená (nikdo si ji mezitím nevzal)"""
+    query = Order.query.filter(Order.id == order_id, Order.status == 'open')
+    if customer_id is not None:
+        query = query.filter(Order.customer_id == customer_id)
+    deleted = query.delete(synchronize_session=False)
+    if deleted:
+        order_changed(order_id)
+        order = db.session.identity_map.get(db.session.identity_key(Order, order_id))
+        if order is not None:
+            db.session.expunge(order)
+    return deleted == 1
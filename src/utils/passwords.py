@@ -0,0 +1,91 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# Hashování hesel mimo vlákna aplikace. scrypt/pbkdf2 je schválně pomalé
+# a při náporu přihlášení by zabíralo CPU gunicorn workerů, které mají
+# obsluhovat ostatní požadavky. Výpočet proto běží v poolu procesů
+# (PASSWORD_WORKERS, 0 = přímo ve vlákně požadavku) a současně čeká nejvýše
+# PASSWORD_MAX_PENDING hashů na proces - další požadavek po
+# PASSWORD_QUEUE_TIMEOUT sekundách dostane PasswordHashingBusy (503), stejně
+# jako požadavek, jehož hash pool nespočítá do PASSWORD_TIMEOUT_SECONDS.
+#
+# PASSWORD_HASH_METHOD je metoda ve formátu Werkzeugu (např.
+# 'scrypt:32768:8:1', 'pbkdf2:sha256:600000'). Hash s jinými parametry se
+# při úspěšném přihlášení přepočítá (needs_rehash).
+# Modul schválně neimportuje Flask ani modely - načítá se i v podprocesech.
+
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', 16))
+# Na jednom jádru pool nepomůže (jen přidá režii předávání mezi procesy)
+_CPUS = os.cpu_count() or 1
+PASSWORD_WORKERS = int(os.getenv('PASSWORD_WORKERS', min(_CPUS, 4) if _CPUS > 1 else 0))
+PASSWORD_MAX_PENDING = int(os.getenv('PASSWORD_MAX_PENDING', max(PASSWORD_WORKERS, 1) * 4))
+PASSWORD_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_QUEUE_TIMEOUT', 10))
+PASSWORD_TIMEOUT_SECONDS = 30
+
+class PasswordHashingBusy(Exception):
+    """Příliš mnoho současných hashování - klient má to zkusit znovu"""
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_MAX_PENDING)
+
+def normalize_method(method):
+    """Doplní výchozí parametry Werkzeugu ('scrypt' -> 'scrypt:32768:8:1')"""
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2':
+        if not args:
+            return f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+        if len(args) == 1:
+            return f'pbkdf2:{args[0]}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn - fork procesu s běžícími vlákny (fronta úloh) není bezpečný
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def _run(func, *args):
+    if not _slots.acquire(timeout=PASSWORD_QUEUE_TIMEOUT):
+        raise PasswordHashingBusy()
+    if PASSWORD_WORKERS <= 0:
+        try:
+            return func(*args)
+        finally:
+            _slots.release()
+    try:
+        future = _get_pool().submit(func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # Místo se uvolní až doběhnutím (nebo zrušením) výpočtu v poolu - ani po
+    # vypršení čekání níže se za ním nezařadí víc než PASSWORD_MAX_PENDING hashů
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        future.cancel()  # Ještě nezačatý výpočet se zruší
+        raise PasswordHashingBusy()
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+def hash_password(password):
+    return _run(_hash, password, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """Hash vznikl s jinou metodou, parametry nebo délkou soli, než jsou nastavené"""
+    method, _, rest = password_hash.partition('$')
+    salt = rest.partition('$')[0]
+    return normalize_method(method) != normalize_method(PASSWORD_HASH_METHOD) or len(salt) != PASSWORD_SALT_LENGTH
@@ -0,0 +1,266 @@
+import os
+import re
+import math
+import time
+import zlib
+import threading
+import traceback
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+from flask import current_app
+from src.models.user import db, Order
+from src.utils.ai_utils import estimate_price, DEFAULT_PRICE
+from src.utils.metrics import registry
+
+try:
+    import numpy as np
+except ImportError:  # Bez NumPy se lokální model nepoužije - ceny odhaduje jen OpenAI
+    np = None
+
+# Lokální odhad ceny naučený z historie: finální ceny zaplacených zakázek,
+# které brigádník sám zadal (bez ceny převzaté z odhadu). Ridge regrese nad log(ceny), příznaky:
+#   - slova popisu a AI analýzy bez diakritiky, zkrácená na kmen a
+#     hashovaná (crc32 - stabilní mezi procesy) do TEXT_FEATURES přihrádek,
+#   - plocha v m² a počet hodin z textu (log), ma_vse_potrebne,
+#   - poloha: čtverec 1° × 1° hashovaný do LOCATION_FEATURES přihrádek.
+# Vektor zakázky má jen pár desítek nenulových složek, odhad je skalární
+# součin přes ně - desítky µs. Meze jsou 90% predikční interval
+# regrese, reziduální rozptyl × (1 + xᵀA⁻¹x), takže jsou široké pro text,
+# jaký v historii není. OpenAI se volá, jen když je poměr horní a dolní meze
+# větší než PRICE_MODEL_MAX_SPREAD, zakázka je daleko od historie
+# (MAX_LEVERAGE) nebo má historie méně než
+# PRICE_MODEL_MIN_SAMPLES zakázek; při chybě OpenAI se místo pevné
+# DEFAULT_PRICE použije odhad modelu. Model se přeučí po PRICE_MODEL_TTL
+# sekundách ve vlastním vlákně na pozadí; odhady mezitím používají starý
+# model (a před prvním naučením OpenAI), na přeučení nikdy nečekají.
+
+TEXT_FEATURES = 256
+LOCATION_FEATURES = 32
+RIDGE_ALPHA = 0.1
+Z_90 = 1.645
+MIN_SIGMA = 0.05  # Rozptyl cen nikdy není nulový, ani když je historie jednotvárná
+# xᵀA⁻¹x pro zakázky z historie je v setinách, slovo nebo region, které
+# historie nezná, ho zvednou na jednotky - takový odhad není spolehlivý
+MAX_LEVERAGE = 1.0
+PRICE_MODEL_MIN_SAMPLES = int(os.getenv('PRICE_MODEL_MIN_SAMPLES', 200))
+PRICE_MODEL_MAX_SAMPLES = int(os.getenv('PRICE_MODEL_MAX_SAMPLES', 50000))
+PRICE_MODEL_MAX_SPREAD = float(os.getenv('PRICE_MODEL_MAX_SPREAD', 2.0))
+PRICE_MODEL_TTL = int(os.getenv('PRICE_MODEL_TTL', 3600))
+
+# Pevné příznaky na začátku vektoru, pak text a poloha
+BIAS, EQUIPPED, AREA, HAS_AREA, HOURS, HAS_HOURS, NO_LOCATION = range(7)
+TEXT_OFFSET = 7
+LOCATION_OFFSET = TEXT_OFFSET + TEXT_FEATURES
+DIMENSION = LOCATION_OFFSET + LOCATION_FEATURES
+
+AREA_PATTERN = re.compile(r'(\d+(?:[.,]\d+)?)\s*m2')
+HOURS_PATTERN = re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:hod|h\b)')
+WORD_PATTERN = re.compile(r'[a-z]{3,}')
+
+PriceEstimate = namedtuple('PriceEstimate', 'price low high confident')
+
+def _normalize(text):
+    # 'Tráva 200 m²' -> 'trava 200 m2' (NFKD rozloží diakritiku i horní index)
+    return unicodedata.normalize('NFKD', (text or '').lower()).encode('ascii', 'ignore').decode('ascii')
+
+def _bucket(value, size):
+    return zlib.crc32(value.encode('utf-8')) % size
+
+@lru_cache(maxsize=65536)
+def _word_index(word):
+    # Hrubé ošetření skloňování: trávA/trávU/trávník -> trav/trav/travn
+    stem = word.rstrip('aeiouy')[:6] or word
+    return TEXT_OFFSET + _bucket(stem, TEXT_FEATURES)
+
+def features(description, ai_analysis, ma_vse_potrebne, latitude, longitude):
+    """Řídký vektor příznaků zakázky: (indexy, hodnoty)"""
+    if ai_analysis and ai_analysis.startswith('Chyba při analýze'):
+        ai_analysis = None  # Starší zakázky mají místo analýzy uloženou chybu
+    text = _normalize(f'{description or ""} {ai_analysis or ""}')
+    values = {BIAS: 1.0, EQUIPPED: 1.0 if ma_vse_potrebne else 0.0}
+    for pattern, value_index, flag_index in ((AREA_PATTERN, AREA, HAS_AREA), (HOURS_PATTERN, HOURS, HAS_HOURS)):
+        match = pattern.search(text)
+        if match:
+            values[value_index] = math.log1p(float(match.group(1).replace(',', '.')))
+            values[flag_index] = 1.0
+    words = set(WORD_PATTERN.findall(text))
+    if words:
+        weight = 1.0 / len(words) ** 0.5
+        for word in words:
+            index = _word_index(word)
+            values[index] = values.get(index, 0.0) + weight
+    if latitude is None or longitude is None:
+        values[NO_LOCATION] = 1.0
+    else:
+        values[LOCATION_OFFSET + _bucket(f'{int(latitude // 1)}:{int(longitude // 1)}', LOCATION_FEATURES)] = 1.0
+    indices = sorted(values)
+    return np.array(indices, dtype=np.intp), np.array([values[i] for i in indices])
+
+def load_history(limit=None):
+    """Zaplacené zakázky s finální cenou potvrzenou brigádníkem, od nejstarší.
+    Dokončení bez ceny převezme odhad - učit se z něj by model jen kopíroval."""
+    rows = db.session.query(
+        Order.description, Order.ai_analysis, Order.ma_vse_potrebne, Order.latitude, Order.longitude,
+        Order.final_price, Order.estimated_price
+    ).filter(
+        Order.status == 'paid', Order.final_price_confirmed.is_(True), Order.final_price > 0
+    ).order_by(Order.id.desc()).limit(limit or PRICE_MODEL_MAX_SAMPLES).all()
+    return rows[::-1]
+
+class PriceModel:
+    """Ridge regrese log(finální ceny) nad příznaky zakázky"""
+
+    def __init__(self):
+        self.weights = None
+        self.covariance = None  # A⁻¹ = (XᵀX + αI)⁻¹
+        self.sigma = None
+        self.samples = 0
+        self.built_at = 0.0
+
+    def fit(self, rows):
+        """rows: (popis, analýza, ma_vse_potrebne, lat, lon, finální cena, ...)"""
+        self.samples = len(rows)
+        self.built_at = time.monotonic()
+        if not rows:
+            return self
+        X = np.zeros((len(rows), DIMENSION))
+        for i, row in enumerate(rows):
+            indices, values = features(*row[:5])
+            X[i, indices] = values
+        y = np.log(np.array([row[5] for row in rows], dtype=float))
+        gram = X.T @ X
+        A = gram + RIDGE_ALPHA * np.eye(DIMENSION)
+        A[BIAS, BIAS] -= RIDGE_ALPHA  # Průměrná cena se netrestá
+        self.covariance = np.linalg.inv(A)
+        self.weights = self.covariance @ (X.T @ y)
+        residuals = y - X @ self.weights
+        # Efektivní počet parametrů ridge regrese = stopa matice H
+        dof = max(len(rows) - float(np.trace(self.covariance @ gram)), 1.0)
+        self.sigma = float(np.sqrt(residuals @ residuals / dof))
+        return self
+
+    def build(self):
+        return self.fit(load_history())
+
+    @property
+    def ready(self):
+        return self.weights is not None and self.samples >= PRICE_MODEL_MIN_SAMPLES
+
+    def predict(self, description, ai_analysis, ma_vse_potrebne, latitude, longitude):
+        indices, values = features(description, ai_analysis, ma_vse_potrebne, latitude, longitude)
+        log_price = float(self.weights[indices] @ values)
+        leverage = float(values @ self.covariance[indices[:, None], indices] @ values)
+        margin = Z_90 * max(self.sigma, MIN_SIGMA) * math.sqrt(1.0 + leverage)
+        low, high = math.exp(log_price - margin), math.exp(log_price + margin)
+        return PriceEstimate(round(math.exp(log_price), -1), round(low, -1), round(high, -1),
+                             self.ready and leverage <= MAX_LEVERAGE and high / low <= PRICE_MODEL_MAX_SPREAD)
+
+_model = None
+_rebuild_lock = threading.Lock()  # Nejvýš jedno přeučení v procesu
+_retry_at = 0.0
+REBUILD_RETRY_SECONDS = 60
+
+def rebuild_price_model():
+    """Naučí nový model z historie a vymění ho za aktuální (jedno přiřazení -
+    souběžné odhady vidí buď starý, nebo celý nový model). Vrací nový model."""
+    global _model
+    model = PriceModel().build()
+    _model = model
+    return model
+
+def _rebuild_in_background(app):
+    global _retry_at
+    if time.monotonic() < _retry_at or not _rebuild_lock.acquire(blocking=False):
+        return  # Přeučení už běží nebo nedávno selhalo
+
+    def run():
+        global _retry_at
+        try:
+            with app.app_context():
+                try:
+                    rebuild_price_model()
+                finally:
+                    db.session.remove()
+        except Exception:
+            _retry_at = time.monotonic() + REBUILD_RETRY_SECONDS
+            traceback.print_exc()
+        finally:
+            _rebuild_lock.release()
+
+    threading.Thread(target=run, name='price-model', daemon=True).start()
+
+def get_price_model(max_age=PRICE_MODEL_TTL):
+    """Vrátí aktuální model (None bez NumPy, nebo dokud se poprvé nenaučí).
+    Model starší než max_age sekund se přeučí ve vlastním vlákně na pozadí -
+    odhad na přeučení nečeká a do výměny používá dosavadní model."""
+    if np is None:
+        return None
+    model = _model
+    if model is None or time.monotonic() - model.built_at > max_age:
+        _rebuild_in_background(current_app._get_current_object())
+    return model
+
+def estimate_order_price(description, ai_analysis, ma_vse_potrebne, latitude, longitude):
+    """Cena zakázky: lokální model, OpenAI jen při nízké spolehlivosti.
+    Vrací (cena, zdroj), zdroj je 'model' nebo 'openai'."""
+    model = get_price_model()
+    local = model.predict(description, ai_analysis, ma_vse_potrebne, latitude, longitude) \
+        if model is not None and model.ready else None
+    if local is not None and local.confident:
+        source, price = 'model', local.price
+    else:
+        source = 'openai'
+        # Když OpenAI selže, je i méně jistý odhad modelu lepší než pevná cena -
+        # ne však odhad pro úplně neznámou práci
+        usable = local is not None and local.high <= local.low * PRICE_MODEL_MAX_SPREAD ** 2
+        price = estimate_price(description, ai_analysis or "Bez obrázku",
+                               default=local.price if usable else DEFAULT_PRICE)
+    registry.inc('price_estimates_total', {'source': source})
+    return price, source
+
+def evaluate(test_fraction=0.2, limit=None):
+    """Offline vyhodnocení: model naučený na starších zakázkách, chyba na
+    nejnovějších proti finální ceně (a pro srovnání chyba uloženého odhadu)."""
+    if np is None:
+        raise RuntimeError('Lokální model ceny potřebuje NumPy (pip install numpy)')
+    rows = load_history(limit)
+    split = int(len(rows) * (1 - test_fraction))
+    train, test = rows[:split], rows[split:]
+    if not train or not test:
+        return {'train': len(train), 'test': len(test)}
+    start = time.perf_counter()
+    model = PriceModel().fit(train)
+    train_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    estimates = [model.predict(*row[:5]) for row in test]
+    predict_us = (time.perf_counter() - start) / len(test) * 1e6
+    final = np.array([row[5] for row in test], dtype=float)
+    predicted = np.array([estimate.price for estimate in estimates])
+    low = np.array([estimate.low for estimate in estimates])
+    high = np.array([estimate.high for estimate in estimates])
+    confident = np.array([estimate.confident for estimate in estimates])
+    stored = np.array([row[6] if row[6] else np.nan for row in test], dtype=float)
+
+    def errors(estimated, mask=None):
+        mask = ~np.isnan(estimated) if mask is None else mask & ~np.isnan(estimated)
+        if not mask.any():
+            return None
+        relative = np.abs(estimated[mask] - final[mask]) / final[mask]
+        return {'count': int(mask.sum()), 'mae': round(float(np.mean(np.abs(estimated[mask] - final[mask]))), 1),
+                'mape': round(float(np.mean(relative)), 4), 'median_ape': round(float(np.median(relative)), 4)}
+
+    return {
+        'train': len(train),
+        'test': len(test),
+        'train_seconds': round(train_seconds, 3),
+        'predict_us': round(predict_us, 1),
+        'sigma': round(model.sigma, 4),
+        'model': errors(predicted),
+        'model_confident': errors(predicted, confident),
+        'confident_share': round(float(confident.mean()), 4),
+        'interval_coverage': round(float(np.mean((final >= low) & (final <= high))), 4),
+        'stored_estimate': errors(stored),
+        'default_price': errors(np.full(len(test), DEFAULT_PRICE)),
+    }
@@ -0,0 +1,60 @@
+from sqlalchemy import text
+from src.models.user import db, User, Rating
+from src.utils.http_cache import bump_versions
+
+# Agregované hodnocení uživatelů. Součet a počet hodnocení se drží přímo
+# v tabulce user a mění se ve stejné transakci jako hodnocení (volající
+# commituje), takže průměr uživatele je čtení jednoho řádku místo AVG().
+
+RATING_PRIOR = 4.0  # Bayesovský odhad pro uživatele s málo hodnoceními
+RATING_PRIOR_WEIGHT = 3
+
+def bayesian_score(rating_sum, rating_count):
+    """Průměr vyhlazený k RATING_PRIOR - pro řazení, aby jedna pětka nepřebila sto čtyřek"""
+    return (RATING_PRIOR * RATING_PRIOR_WEIGHT + (rating_sum or 0)) / (RATING_PRIOR_WEIGHT + (rating_count or 0))
+
+def rating_summary(rating_sum, rating_count):
+    return {
+        'average_rating': round(rating_sum / rating_count, 2) if rating_count else None,
+        'total_ratings': rating_count,
+        'score': round(bayesian_score(rating_sum, rating_count), 3),
+    }
+
+def set_rating(rating, side, value, comment):
+    """Uloží hodnocení jedné strany ('worker' = zákazník hodnotí brigádníka,
+    'customer' = brigádník hodnotí zákazníka) a upraví agregát hodnoceného.
+    Změna je podmíněná původní hodnotou - při souběžné změně vrací False."""
+    column = getattr(Rating, f'{side}_rating')
+    old = getattr(rating, f'{side}_rating')
+    db.session.flush()  # Nové hodnocení potřebuje id
+
+    changed = Rating.query.filter(Rating.id == rating.id, column.is_(None) if old is None else column == old).update(
+        {column: value, getattr(Rating, f'{side}_comment'): comment}, synchronize_session=False
+    )
+    if not changed:
+        return False
+    db.session.expire(rating)
+
+    rated_id = rating.worker_id if side == 'worker' else rating.customer_id
+    bump_versions('ratings', f'ratings:{rated_id}')
+    count_delta = (value is not None) - (old is not None)
+    sum_delta = (value or 0) - (old or 0)
+    if count_delta or sum_delta:
+        User.query.filter(User.id == rated_id).update({
+            User.rating_count: User.rating_count + count_delta,
+            User.rating_sum: User.rating_sum + sum_delta,
+        }, synchronize_session=False)
+    return True
+
+def rebuild_ratings():
+    """Přepočítá agregáty všech uživatelů z tabulky rating"""
+    for role, side in (('brigadnik', 'worker'), ('zakaznik', 'customer')):
+        db.session.execute(text(
+            f'UPDATE "user" SET '
+            f'rating_count = (SELECT COUNT({side}_rating) FROM rating WHERE {side}_id = "user".id), '
+            f'rating_sum = (SELECT COALESCE(SUM({side}_rating), 0) FROM rating WHERE {side}_id = "user".id) '
+            f'WHERE role = :role'
+        ), {'role': role})
+    # Odpovědi s hodnocením uložené v HTTP cache neplatí
+    db.session.execute(text("UPDATE resource_version SET version = version + 1 WHERE name LIKE 'ratings%'"))
+    db.session.commit()
@@ -0,0 +1,87 @@
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from sqlalchemy import or_
+from src.models.user import db, Order
+from src.utils.ai_utils import estimate_prices_batch, PRICE_BATCH_SIZE
+from src.utils.events import publish_order_event
+from src.utils.http_cache import order_changed
+from src.utils.jobs import job_handler, report_progress
+
+# Přecenění otevřených zakázek po změně promptu nebo modelu pro odhad ceny.
+# Zakázky se berou po dávkách (jedno volání OpenAI na PRICE_BATCH_SIZE
+# zakázek) a současně běží nejvýše REPRICE_CONCURRENCY dávek. Nová cena se
+# zapíše podmíněným UPDATE jen zakázce, která je pořád otevřená a jejíž cena
+# se změnila - zakázku převzatou během přeceňování to nezmění. Zakázka,
+# jejíž odhad selhal, si nechá dosavadní cenu (souhrn ji počítá jako 'failed').
+# Cache odhadů se ve výchozím stavu nepoužije (je ze starého promptu),
+# nové odhady ji přepíšou.
+
+REPRICE_CONCURRENCY = int(os.getenv('REPRICE_CONCURRENCY', 4))
+
+def open_order_ids():
+    """Otevřené zakázky s dokončenou analýzou (čekající ocení jejich vlastní úloha)"""
+    return [order_id for order_id, in db.session.query(Order.id).filter(
+        Order.status == 'open', Order.analysis_status.in_(('done', 'failed'))
+    ).order_by(Order.id)]
+
+def _reprice_batch(app, order_ids, use_cache):
+    with app.app_context():
+        try:
+            rows = db.session.query(Order.id, Order.description, Order.ai_analysis) \
+                .filter(Order.id.in_(order_ids)).all()
+            db.session.commit()  # Na OpenAI se čeká bez spojení z poolu
+            estimates = estimate_prices_batch([(description, ai_analysis) for _, description, ai_analysis in rows],
+                                              use_cache=use_cache)
+            updated = []
+            for (order_id, _, _), (price, _) in zip(rows, estimates):
+                if price is None:
+                    continue  # Odhad selhal - zakázka si nechá dosavadní cenu
+                changed = Order.query.filter(
+                    Order.id == order_id, Order.status == 'open',
+                    or_(Order.estimated_price.is_(None), Order.estimated_price != price)
+                ).update({'estimated_price': price}, synchronize_session=False)
+                if changed:
+                    order_changed(order_id)
+                    updated.append(order_id)
+            db.session.commit()
+            if updated:
+                for order in Order.query.filter(Order.id.in_(updated)):
+                    publish_order_event('updated', order)
+            return len(updated), Counter(source for _, source in estimates)
+        finally:
+            db.session.remove()
+
+def reprice_open_orders(batch_size=None, concurrency=None, use_cache=False, progress=None):
+    """Přecení otevřené zakázky. progress(stav) se volá po každé dávce.
+    Vrací souhrn: počty zakázek, změněných cen a zdrojů odhadu."""
+    app = current_app._get_current_object()
+    batch_size = batch_size or PRICE_BATCH_SIZE
+    order_ids = open_order_ids()
+    db.session.commit()
+    batches = [order_ids[i:i + batch_size] for i in range(0, len(order_ids), batch_size)]
+    summary = {'total': len(order_ids), 'done': 0, 'updated': 0, 'batches': len(batches),
+               'sources': {'cache': 0, 'batch': 0, 'single': 0, 'failed': 0}}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency or REPRICE_CONCURRENCY, thread_name_prefix='reprice') as executor:
+        futures = {executor.submit(_reprice_batch, app, batch, use_cache): batch for batch in batches}
+        for future in as_completed(futures):
+            updated, sources = future.result()
+            summary['done'] += len(futures[future])
+            summary['updated'] += updated
+            for source, count in sources.items():
+                summary['sources'][source] += count
+            summary['seconds'] = round(time.perf_counter() - start, 2)
+            if progress:
+                progress(summary)
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    return summary
+
+@job_handler('reprice_open_orders')
+def run_repricing(payload):
+    """Úloha na pozadí spuštěná z POST /api/admin/orders/reprice"""
+    summary = reprice_open_orders(payload.get('batch_size'), payload.get('concurrency'),
+                                  payload.get('use_cache', False), progress=report_progress)
+    report_progress(summary)
@@ -0,0 +1,125 @@
+import re
+from sqlalchemy import or_, text
+from src.models.user import db, Order
+
+# Fulltextové hledání v zakázkách (název, popis, adresa, AI analýza).
+# Na SQLite je to FTS5 tabulka order_fts nad tabulkou order (external
+# content), kterou udržují triggery - index tak sleduje i podmíněné UPDATE
+# a hromadná mazání mimo ORM. Tokenizer unicode61 s remove_diacritics
+# hledá bez ohledu na diakritiku, každé slovo dotazu se hledá jako prefix
+# (delším slovům se odřízne koncová samohláska, takže "tráva" najde i "trávu"
+# a "chalupa" i "chalupě") a výsledky se řadí podle BM25.
+# BM25 pro desítky tisíc shod obecného dotazu trvá stovky ms - podle
+# relevance se proto řadí jen SEARCH_RANK_WINDOW nejnovějších shod, které
+# uživatel smí vidět (a mají požadovaný stav). Starší shody následují za
+# nimi od nejnovějších, takže se ke všem dá dostat stránkováním.
+# Jiné databáze (PostgreSQL) nemají FTS5 - tam hledání spadne na ILIKE
+# přes stejné sloupce, řazené od nejnovějších.
+
+SEARCH_COLUMNS = ('title', 'description', 'adresa', 'ai_analysis')
+SEARCH_WEIGHTS = (10.0, 4.0, 2.0, 1.0)  # Shoda v názvu váží nejvíc
+MAX_QUERY_TERMS = 8
+SEARCH_RANK_WINDOW = 2000
+VOWELS = set('aeiouyáéěíóúůý')
+
+FTS_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS order_fts USING fts5("
+    "title, description, adresa, ai_analysis, content='order', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS order_fts_insert AFTER INSERT ON "order" BEGIN '
+    'INSERT INTO order_fts (rowid, title, description, adresa, ai_analysis) '
+    'VALUES (new.id, new.title, new.description, new.adresa, new.ai_analysis); END',
+    'CREATE TRIGGER IF NOT EXISTS order_fts_delete AFTER DELETE ON "order" BEGIN '
+    "INSERT INTO order_fts (order_fts, rowid, title, description, adresa, ai_analysis) "
+    "VALUES ('delete', old.id, old.title, old.description, old.adresa, old.ai_analysis); END",
+    'CREATE TRIGGER IF NOT EXISTS order_fts_update AFTER UPDATE OF title, description, adresa, ai_analysis ON "order" BEGIN '
+    "INSERT INTO order_fts (order_fts, rowid, title, description, adresa, ai_analysis) "
+    "VALUES ('delete', old.id, old.title, old.description, old.adresa, old.ai_analysis); "
+    'INSERT INTO order_fts (rowid, title, description, adresa, ai_analysis) '
+    'VALUES (new.id, new.title, new.description, new.adresa, new.ai_analysis); END',
+]
+
+def fts_available():
+    return db.engine.dialect.name == 'sqlite'
+
+def create_search_index():
+    """Vytvoří FTS tabulku a triggery a naplní index z existujících zakázek"""
+    if not fts_available():
+        return
+    for statement in FTS_SETUP:
+        db.session.execute(text(statement))
+    rebuild_search_index()
+
+def rebuild_search_index():
+    if fts_available():
+        db.session.execute(text("INSERT INTO order_fts (order_fts) VALUES ('rebuild')"))
+        db.session.commit()
+
+def query_terms(q):
+    """Slova dotazu bez operátorů FTS syntaxe (uživatel nemůže dotaz rozbít)"""
+    return re.findall(r'\w+', q or '')[:MAX_QUERY_TERMS]
+
+def _prefix(term):
+    # Hrubé ošetření skloňování: trávA/trávU/trávOU -> tráv*
+    if len(term) >= 5 and term[-1].lower() in VOWELS:
+        term = term[:-1]
+    return f'"{term}"*'
+
+def search_order_ids(q, user_id, role, statuses=None, limit=20, offset=0):
+    """Id zakázek odpovídajících dotazu, viditelných pro daného uživatele,
+    seřazená podle relevance (za oknem SEARCH_RANK_WINDOW od nejnovějších).
+    Vrací seznam (id, skóre)."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+    if not fts_available():
+        return _search_like(terms, user_id, role, statuses, limit, offset)
+
+    conditions, params = [], {'match': ' '.join(_prefix(term) for term in terms),
+                              'limit': limit, 'offset': offset}
+    if role == 'zakaznik':
+        conditions.append('o.customer_id = :user_id')
+    elif role == 'brigadnik':
+        conditions.append("(o.status = 'open' OR o.worker_id = :user_id)")
+    params['user_id'] = user_id
+    if statuses:
+        placeholders = ', '.join(f':status{i}' for i in range(len(statuses)))
+        conditions.append(f'o.status IN ({placeholders})')
+        params.update({f'status{i}': status for i, status in enumerate(statuses)})
+    where = ''.join(' AND ' + c for c in conditions)
+    # Id nejstarší viditelné shody v okně (doclisty FTS jsou řazené podle
+    # rowid, shody se procházejí od nejnovější a končí se po zaplnění okna)
+    cutoff = db.session.execute(text(
+        f'SELECT order_fts.rowid FROM order_fts JOIN "order" o ON o.id = order_fts.rowid '
+        f'WHERE order_fts MATCH :match{where} ORDER BY order_fts.rowid DESC LIMIT 1 OFFSET :window'
+    ), dict(params, window=SEARCH_RANK_WINDOW - 1)).scalar()
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    select = (f'SELECT o.id, bm25(order_fts, {weights}) AS score FROM order_fts '
+              f'JOIN "order" o ON o.id = order_fts.rowid WHERE order_fts MATCH :match{where}')
+    rows = []
+    if cutoff is None or offset < SEARCH_RANK_WINDOW:
+        ranked_where = '' if cutoff is None else ' AND order_fts.rowid >= :cutoff'
+        rows = db.session.execute(text(
+            f'{select}{ranked_where} ORDER BY score, o.id DESC LIMIT :limit OFFSET :offset'
+        ), dict(params, cutoff=cutoff)).all()
+    if cutoff is not None and offset + limit > SEARCH_RANK_WINDOW:
+        # Stránky za oknem: starší shody od nejnovějších (BM25 jen pro vrácené řádky)
+        rows += db.session.execute(text(
+            f'{select} AND order_fts.rowid < :cutoff ORDER BY order_fts.rowid DESC LIMIT :limit OFFSET :offset'
+        ), dict(params, cutoff=cutoff, limit=limit - len(rows), offset=max(offset - SEARCH_RANK_WINDOW, 0))).all()
+    # BM25 v SQLite je záporné (menší = relevantnější) - navenek kladné skóre
+    return [(order_id, round(-score, 6)) for order_id, score in rows]
+
+def _search_like(terms, user_id, role, statuses, limit, offset):
+    query = db.session.query(Order.id)
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(or_(*(getattr(Order, column).ilike(pattern) for column in SEARCH_COLUMNS)))
+    if role == 'zakaznik':
+        query = query.filter(Order.customer_id == user_id)
+    elif role == 'brigadnik':
+        query = query.filter((Order.status == 'open') | (Order.worker_id == user_id))
+    if statuses:
+        query = query.filter(Order.status.in_(statuses))
+    rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit).offset(offset).all()
+    return [(order_id, None) for order_id, in rows]
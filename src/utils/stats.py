@@ -0,0 +1,121 @@
+from datetime import timedelta
+from sqlalchemy import text
+from src.models.user import db, User, Order, StatsCounter, StatsBucket
+
+# Materializované statistiky pro admin dashboard. Čítače se mění ve stejné
+# transakci jako zakázka nebo uživatel (volající commituje), takže čtení
+# statistik je jeden dotaz místo COUNT/SUM přes celé tabulky.
+# rebuild_stats() vše přepočítá z tabulek (příkaz `flask rebuild-stats`).
+# Účty se zatím mění jen registrací (record_user_created); ruční schválení
+# nebo smazání uživatele v databázi čítače srovná až rebuild-stats.
+
+COUNTERS = ['total_orders', 'completed_orders', 'total_revenue',
+            'total_customers', 'total_workers', 'approved_workers']
+PERIODS = ('day', 'week')
+
+def _bump(name, delta):
+    db.session.execute(text(
+        'INSERT INTO stats_counter (name, value) VALUES (:name, :delta) '
+        'ON CONFLICT (name) DO UPDATE SET value = stats_counter.value + excluded.value'
+    ), {'name': name, 'delta': delta})
+
+def _bucket_start(moment, period):
+    day = moment.date()
+    return day if period == 'day' else day - timedelta(days=day.weekday())
+
+def _bump_bucket(moment, created=0, paid=0, revenue=0.0):
+    if moment is None:
+        return
+    for period in PERIODS:
+        db.session.execute(text(
+            'INSERT INTO stats_bucket (period, bucket_start, orders_created, orders_paid, revenue) '
+            'VALUES (:period, :start, :created, :paid, :revenue) '
+            'ON CONFLICT (period, bucket_start) DO UPDATE SET '
+            'orders_created = stats_bucket.orders_created + excluded.orders_created, '
+            'orders_paid = stats_bucket.orders_paid + excluded.orders_paid, '
+            'revenue = stats_bucket.revenue + excluded.revenue'
+        ), {'period': period, 'start': _bucket_start(moment, period),
+            'created': created, 'paid': paid, 'revenue': revenue})
+
+def record_order_created(order):
+    _bump('total_orders', 1)
+    _bump_bucket(order.created_at, created=1)
+
+def record_order_paid(order):
+    revenue = order.final_price or 0
+    _bump('completed_orders', 1)
+    _bump('total_revenue', revenue)
+    # Čas platby se neukládá - tržba se počítá ke dni dokončení
+    _bump_bucket(order.completed_at, paid=1, revenue=revenue)
+
+def record_order_deleted(order):
+    """Volat před smazáním se stavem, ve kterém zakázka byla"""
+    _bump('total_orders', -1)
+    _bump_bucket(order.created_at, created=-1)
+    if order.status == 'paid':
+        revenue = order.final_price or 0
+        _bump('completed_orders', -1)
+        _bump('total_revenue', -revenue)
+        _bump_bucket(order.completed_at, paid=-1, revenue=-revenue)
+
+def record_user_created(user):
+    if user.role == 'zakaznik':
+        _bump('total_customers', 1)
+    elif user.role == 'brigadnik':
+        _bump('total_workers', 1)
+        if user.is_approved:
+            _bump('approved_workers', 1)
+
+def get_stats():
+    values = dict(db.session.query(StatsCounter.name, StatsCounter.value).all())
+    stats = {name: values.get(name, 0) for name in COUNTERS}
+    for name in COUNTERS:
+        if name != 'total_revenue':
+            stats[name] = int(stats[name])
+    stats['completion_rate'] = (
+        stats['completed_orders'] / stats['total_orders'] * 100 if stats['total_orders'] > 0 else 0
+    )
+    return stats
+
+def get_series(period='day', buckets=30):
+    """Posledních `buckets` období se záznamem, seřazeno od nejstaršího"""
+    rows = StatsBucket.query.filter_by(period=period) \
+        .order_by(StatsBucket.bucket_start.desc()).limit(buckets).all()
+    return [row.to_dict() for row in reversed(rows)]
+
+def rebuild_stats():
+    """Přepočítá čítače i časové řady z tabulek order a user"""
+    StatsCounter.query.delete()
+    StatsBucket.query.delete()
+
+    # Jen konkrétní sloupce - běží i z migrace, kdy model může být napřed před schématem
+    count_orders = db.session.query(db.func.count(Order.id))
+    count_users = db.session.query(db.func.count(User.id))
+    counters = {
+        'total_orders': count_orders.scalar(),
+        'completed_orders': count_orders.filter(Order.status == 'paid').scalar(),
+        'total_revenue': db.session.query(db.func.sum(Order.final_price)).filter(Order.status == 'paid').scalar() or 0,
+        'total_customers': count_users.filter(User.role == 'zakaznik').scalar(),
+        'total_workers': count_users.filter(User.role == 'brigadnik').scalar(),
+        'approved_workers': count_users.filter(User.role == 'brigadnik', User.is_approved.is_(True)).scalar(),
+    }
+    db.session.add_all([StatsCounter(name=name, value=value) for name, value in counters.items()])
+
+    buckets = {}
+    for created_at, status, final_price, completed_at in db.session.query(
+        Order.created_at, Order.status, Order.final_price, Order.completed_at
+    ).yield_per(5000):
+        for period in PERIODS:
+            if created_at is not None:
+                bucket = buckets.setdefault((period, _bucket_start(created_at, period)), [0, 0, 0.0])
+                bucket[0] += 1
+            if status == 'paid' and completed_at is not None:
+                bucket = buckets.setdefault((period, _bucket_start(completed_at, period)), [0, 0, 0.0])
+                bucket[1] += 1
+                bucket[2] += final_price or 0
+    db.session.add_all([
+        StatsBucket(period=period, bucket_start=start, orders_created=created, orders_paid=paid_count, revenue=revenue)
+        for (period, start), (created, paid_count, revenue) in buckets.items()
+    ])
+    db.session.commit()
+    return counters
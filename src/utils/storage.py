@@ -0,0 +1,239 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from flask import Request, current_app, has_app_context, redirect, send_from_directory
+from sqlalchemy import text
+from src.models.user import db, PhotoBlob
+from src.utils.images import process_image, variant_files
+
+# Úložiště fotek zakázek. Nahraný soubor se už při parsování požadavku
+# zapisuje po kusech do dočasného souboru a zároveň se počítá jeho SHA-256.
+# Fotky se ukládají pod hashem obsahu (stejná fotka jen jednou) a tabulka
+# photo_blob drží počet zakázek, které ji používají - soubor se smaže až
+# s poslední zakázkou. Backend je lokální složka nebo S3 kompatibilní služba.
+
+UPLOADS_MAX_AGE = 30 * 24 * 3600  # Soubory se pod stejným názvem nemění - cache 30 dní
+
+class HashingFile:
+    """Dočasný soubor pro nahrávaná data, který při zápisu počítá SHA-256.
+    Po uložení do úložiště (přesunu) nebo na konci požadavku se smaže."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def close(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read, seek, tell, flush... delegují na skutečný soubor
+        return getattr(self._file, name)
+
+class UploadRequest(Request):
+    """Request, který nahrávané soubory streamuje do HashingFile místo paměti"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingFile(get_storage().temp_dir)
+
+class LocalStorage:
+    """Soubory v lokální složce (výchozí src/static/uploads)"""
+
+    def __init__(self, root):
+        self.root = root
+        self.temp_dir = os.path.join(root, '.tmp')  # Stejný disk - uložení je jen přejmenování
+
+    def _path(self, key):
+        return os.path.join(self.root, os.path.basename(key))
+
+    def save(self, key, source_path):
+        """Přesune lokální soubor do úložiště pod klíčem key"""
+        os.makedirs(self.root, exist_ok=True)
+        os.replace(source_path, self._path(key))
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        if self.exists(key):
+            os.remove(self._path(key))
+
+    @contextmanager
+    def local_path(self, key):
+        """Cesta k souboru na lokálním disku (pro Pillow a AI analýzu)"""
+        yield self._path(key)
+
+    def send(self, key):
+        return send_from_directory(self.root, key, max_age=UPLOADS_MAX_AGE)
+
+class S3Storage:
+    """Soubory v S3 kompatibilním bucketu (AWS S3, MinIO...).
+    Klienta lze předat (např. lokální náhradu), jinak se vytvoří přes boto3."""
+
+    def __init__(self, bucket, client=None, endpoint_url=None, public_url=None):
+        if client is None:
+            import boto3  # Volitelná závislost - jen pro STORAGE_BACKEND=s3
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.client = client
+        self.public_url = public_url
+        self.temp_dir = tempfile.gettempdir()
+
+    def save(self, key, source_path):
+        with open(source_path, 'rb') as source:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=source,
+                                   CacheControl=f'public, max-age={UPLOADS_MAX_AGE}')
+        os.remove(source_path)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    @contextmanager
+    def local_path(self, key):
+        fd, path = tempfile.mkstemp(dir=self.temp_dir, suffix=os.path.splitext(key)[1])
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                shutil.copyfileobj(self.client.get_object(Bucket=self.bucket, Key=key)['Body'], target)
+            yield path
+        finally:
+            os.remove(path)
+
+    def send(self, key):
+        if self.public_url:
+            return redirect(f"{self.public_url.rstrip('/')}/{key}")
+        url = self.client.generate_presigned_url('get_object', Params={'Bucket': self.bucket, 'Key': key},
+                                                 ExpiresIn=3600)
+        return redirect(url)
+
+def create_storage(config):
+    backend = config.get('STORAGE_BACKEND', 'local')
+    if backend == 's3':
+        return S3Storage(config['S3_BUCKET'], endpoint_url=config.get('S3_ENDPOINT_URL'),
+                         public_url=config.get('S3_PUBLIC_URL'))
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    raise ValueError(f"Neznámý STORAGE_BACKEND: {backend}")
+
+def get_storage():
+    """Úložiště aplikace (v testech lze podstrčit přes app.config['STORAGE'])"""
+    app = current_app._get_current_object() if has_app_context() else None
+    if app is None:
+        raise RuntimeError("Úložiště je dostupné jen v kontextu aplikace")
+    if app.config.get('STORAGE') is None:
+        app.config['STORAGE'] = create_storage(app.config)
+    return app.config['STORAGE']
+
+def store_upload(upload, extension):
+    """Uloží nahraný soubor (stream HashingFile) pod hashem obsahu a zvýší
+    počet odkazů. Vrací (sha256, název souboru). Volající commituje."""
+    stream = upload.stream
+    if not isinstance(stream, HashingFile):
+        # Požadavek nešel přes UploadRequest - dopočítat hash z obsahu
+        stream = HashingFile(get_storage().temp_dir)
+        shutil.copyfileobj(upload.stream, stream, 64 * 1024)
+    stream.flush()
+
+    sha256 = stream.sha256
+    filename = f"{sha256}.{extension}"
+    # Odkaz se zapíše před uložením souboru: zápis počká na případné souběžné
+    # purge_blob stejné fotky, takže ten už soubor uložený níže nesmaže
+    db.session.execute(text(
+        'INSERT INTO photo_blob (sha256, filename, refs, created_at) VALUES (:sha256, :filename, 1, :now) '
+        'ON CONFLICT (sha256) DO UPDATE SET refs = photo_blob.refs + 1, filename = excluded.filename'
+    ), {'sha256': sha256, 'filename': filename, 'now': datetime.utcnow()})
+    # Ukládá se vždy, i když blob existuje - soubor mohl zmizet se smazáním
+    # posledního odkazu a přepsání stejným obsahem nic nerozbije
+    get_storage().save(filename, stream.path)
+    stream.close()
+    return sha256, filename
+
+def ensure_variants(sha256):
+    """Vytvoří zmenšené varianty fotky - jednou pro všechny zakázky se stejnou
+    fotkou - a smaže originál. Chyba zpracování se propaguje (úloha analýzy
+    se zopakuje, chyba se uloží do job.last_error), originál zůstává."""
+    blob = db.session.get(PhotoBlob, sha256)
+    if blob is None:
+        return None
+    storage = get_storage()
+    if not blob.variants:
+        workdir = tempfile.mkdtemp(dir=storage.temp_dir)
+        try:
+            with storage.local_path(blob.filename) as source:
+                variants = process_image(source, workdir, sha256)
+            for filename in variant_files(variants):
+                storage.save(filename, os.path.join(workdir, filename))
+        except Exception:
+            db.session.refresh(blob)  # Varianty mohla mezitím vytvořit jiná zakázka
+            if blob.variants:
+                return blob
+            raise
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        blob.variants = json.dumps(variants)
+        db.session.commit()
+
+    # Originál v plném rozlišení už není potřeba. Smaže se pod zámkem řádku,
+    # jen pokud ho mezitím znovu nenahrála jiná zakázka (ta název vrací zpět)
+    original = blob.filename
+    if original and _lock_blob(sha256, 'filename = :filename', filename=original):
+        blob.filename = None
+        db.session.flush()
+        storage.delete(original)
+    db.session.commit()
+    return blob
+
+def _lock_blob(sha256, condition, **params):
+    """Zamkne řádek fotky (na SQLite celý zápis), pokud platí condition.
+    Zámek drží transakce do commitu."""
+    return db.session.execute(
+        text(f'UPDATE photo_blob SET refs = refs WHERE sha256 = :sha256 AND {condition}'),
+        dict(params, sha256=sha256)
+    ).rowcount > 0
+
+def release_blob(sha256):
+    """Sníží počet odkazů na fotku. Volající commituje a pak zavolá purge_blob."""
+    db.session.execute(text('UPDATE photo_blob SET refs = refs - 1 WHERE sha256 = :sha256'), {'sha256': sha256})
+
+def purge_blob(sha256):
+    """Smaže fotku, kterou už žádná zakázka nepoužívá (po commitu release_blob).
+    Řádek i soubory se mažou v jedné transakci pod zámkem řádku - souběžně
+    nahraná stejná fotka buď počká a uloží soubor znovu, nebo už zvýšila
+    počet odkazů a fotka se nemaže."""
+    if not _lock_blob(sha256, 'refs <= 0'):
+        db.session.rollback()
+        return
+    blob = db.session.get(PhotoBlob, sha256, populate_existing=True)
+    files = blob.files()
+    db.session.delete(blob)
+    db.session.flush()
+    delete_files(files)
+    db.session.commit()
+
+def delete_files(filenames):
+    storage = get_storage()
+    for filename in filenames:
+        storage.delete(filename)
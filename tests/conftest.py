@@ -0,0 +1,45 @@
+import os
+import sys
+import pytest
+
+# Testy se spouštějí z kořene repozitáře: python -m pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db, User
+from src.utils import auth, images
+from src.utils.http_cache import clear_cache
+from src.utils.ai_utils import StubAIClient
+from benchmarks.common import make_app, login_client
+
+@pytest.fixture(params=[True, False], ids=['wal', 'rollback-journal'])
+def app(request, monkeypatch):
+    """Aplikace s API nad dočasnou SQLite databází (v režimu WAL i bez něj);
+    úlohy běží hned v požadavku, OpenAI nahrazuje StubAIClient a fotky se
+    zpracují bez poolu procesů"""
+    monkeypatch.setattr(images, 'IMAGE_WORKERS', 0)
+    # Každý test má novou databázi se stejnými id - cache procesu se nesdílí
+    monkeypatch.setattr(auth, '_cache', {})
+    clear_cache()
+    app = make_app(with_routes=True, wal=request.param)
+    app.config['TESTING'] = True
+    app.config['AI_CLIENT'] = StubAIClient()
+    app.config['JOB_RETRY_DELAY'] = 0
+    return app
+
+@pytest.fixture
+def make_user(app):
+    """make_user(role, name) -> id nového uživatele (ověřený a schválený)"""
+    def make(role, name=None, **fields):
+        with app.app_context():
+            name = name or f'{role}{User.query.count()}'
+            user = User(jmeno=name, prijmeni=name, telefon='1', email=f'{name}@example.cz', password_hash='x',
+                        role=role, email_verified=True, is_approved=True, **fields)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+@pytest.fixture
+def client_for(app):
+    """client_for(user_id, role) -> testovací klient s přihlášenou session"""
+    return lambda user_id, role: login_client(app, user_id, role)
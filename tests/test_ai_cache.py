@@ -0,0 +1,38 @@
+"""Perzistentní cache AI výsledků: platnost (AI_CACHE_TTL), přepsání a LRU."""
+from datetime import datetime, timedelta
+from src.models.user import db, AICacheEntry
+from src.utils.ai_cache import cache_get, cache_set, PRICE
+
+def age_entry(key, seconds):
+    entry = db.session.get(AICacheEntry, (key, PRICE))
+    entry.created_at = datetime.utcnow() - timedelta(seconds=seconds)
+    db.session.commit()
+
+def test_entry_expires_after_ttl(app):
+    app.config['AI_CACHE_TTL'] = 3600
+    with app.app_context():
+        cache_set(PRICE, 'stara', '800.0')
+        age_entry('stara', 3599)
+        assert cache_get(PRICE, 'stara') == '800.0'
+        age_entry('stara', 3601)
+        assert cache_get(PRICE, 'stara') is None
+        assert db.session.get(AICacheEntry, ('stara', PRICE), populate_existing=True) is None
+
+def test_overwritten_entry_gets_full_ttl(app):
+    app.config['AI_CACHE_TTL'] = 3600
+    with app.app_context():
+        cache_set(PRICE, 'odhad', '800.0')
+        age_entry('odhad', 3000)
+        cache_set(PRICE, 'odhad', '950.0')  # Např. přecenění s use_cache=False
+        entry = db.session.get(AICacheEntry, ('odhad', PRICE), populate_existing=True)
+        assert datetime.utcnow() - entry.created_at < timedelta(seconds=60)
+        assert cache_get(PRICE, 'odhad') == '950.0'
+
+def test_least_recently_used_entries_are_evicted(app):
+    app.config['AI_CACHE_MAX_ENTRIES'] = 2
+    with app.app_context():
+        cache_set(PRICE, 'a', '1')
+        cache_set(PRICE, 'b', '2')
+        cache_get(PRICE, 'a')  # 'b' je teď nejdéle nepoužitý
+        cache_set(PRICE, 'c', '3')
+        assert [cache_get(PRICE, key) for key in ('a', 'b', 'c')] == ['1', None, '3']
@@ -0,0 +1,88 @@
+"""Fronta odchozích e-mailů (email_outbox) bez sítě: převzetí dávky,
+opakování s odstupem, dead letter a znovuzařazení."""
+import os
+from datetime import datetime
+from src.models.user import db, EmailOutbox
+from src.utils.email_utils import (FileBackend, SendGridBackend, queue_email, _claim_batch,
+                                   process_outbox, retry_dead, outbox_stats)
+
+class FailingBackend:
+    def send_batch(self, messages):
+        return {message.id: 'SMTP 451 dočasná chyba' for message in messages}
+
+class FakeSendGridClient:
+    def __init__(self, fail_subject=None):
+        self.sent = []
+        self.fail_subject = fail_subject
+
+    def send(self, mail):
+        mail = mail.get()
+        if mail['subject'] == self.fail_subject:
+            raise ConnectionError('SendGrid nedostupný')
+        self.sent.append(mail)
+
+def queue(app, count, subject='Ověřte e-mail', html='<p>Odkaz</p>'):
+    with app.app_context():
+        ids = [queue_email(f'uzivatel{i}@example.cz', subject, html) for i in range(count)]
+        db.session.commit()
+        return [message.id for message in ids]
+
+def make_due(app):
+    """Přeskočí odstup před dalším pokusem"""
+    with app.app_context():
+        EmailOutbox.query.update({'next_attempt_at': datetime.utcnow()})
+        db.session.commit()
+
+def test_claimed_messages_are_not_claimed_again(app):
+    queue(app, 3)
+    with app.app_context():
+        first = _claim_batch(2)
+        assert [message.attempts for message in first] == [1, 1]
+        assert {message.status for message in first} == {'sending'}
+        second = _claim_batch(2)
+        assert len(second) == 1
+        assert not {message.id for message in first} & {message.id for message in second}
+        assert _claim_batch(2) == []
+
+def test_sent_messages_are_written_by_file_backend(app, tmp_path):
+    ids = queue(app, 2)
+    with app.app_context():
+        assert process_outbox(FileBackend(str(tmp_path))) == 2
+        assert outbox_stats() == {'sent': 2}
+    assert sorted(os.listdir(tmp_path)) == [f'{message_id:08d}.eml' for message_id in ids]
+
+def test_failed_message_waits_before_next_attempt(app):
+    queue(app, 1)
+    with app.app_context():
+        assert process_outbox(FailingBackend()) == 1
+        message = EmailOutbox.query.one()
+        assert message.status == 'queued'
+        assert message.last_error == 'SMTP 451 dočasná chyba'
+        assert message.next_attempt_at > datetime.utcnow()
+        assert process_outbox(FailingBackend()) == 0  # Ještě neuplynul odstup
+
+def test_message_goes_dead_after_max_attempts_and_retry_dead_requeues_it(app, tmp_path):
+    queue(app, 1)
+    for _ in range(2):
+        with app.app_context():
+            assert process_outbox(FailingBackend(), max_attempts=2) == 1
+        make_due(app)
+    with app.app_context():
+        message = EmailOutbox.query.one()
+        assert (message.status, message.attempts) == ('dead', 2)
+        assert process_outbox(FailingBackend(), max_attempts=2) == 0
+
+        assert retry_dead() == 1
+        assert process_outbox(FileBackend(str(tmp_path)), max_attempts=2) == 1
+        assert outbox_stats() == {'sent': 1}
+
+def test_sendgrid_sends_identical_messages_in_one_request(app):
+    queue(app, 3, subject='Nové zakázky', html='<p>Týdenní přehled</p>')
+    queue(app, 1, subject='Ověřte e-mail')
+    client = FakeSendGridClient(fail_subject='Ověřte e-mail')
+    with app.app_context():
+        assert process_outbox(SendGridBackend(None, client=client)) == 4
+        assert len(client.sent) == 1
+        assert len(client.sent[0]['personalizations']) == 3
+        statuses = dict(db.session.query(EmailOutbox.subject, EmailOutbox.status).all())
+        assert statuses == {'Nové zakázky': 'sent', 'Ověřte e-mail': 'queued'}
@@ -0,0 +1,44 @@
+"""Doporučení z indexu párování, který je až INDEX_TTL_SECONDS starý."""
+import json
+from src.models.user import db, User, Order
+from src.utils.matching import get_matching_index, save_recommendations, invalidate_matching_index
+
+def open_order(app, customer_id, title='Posekat trávník'):
+    with app.app_context():
+        order = Order(title=title, description='Tráva za domem', adresa='Praha', status='open',
+                      customer_id=customer_id)
+        db.session.add(order)
+        db.session.commit()
+        return order.id
+
+def test_recommended_workers_skip_workers_gone_since_index_build(app, make_user, client_for):
+    invalidate_matching_index()
+    customer = make_user('zakaznik')
+    tools = json.dumps(['sekacka'])
+    kept, unapproved, deleted = (make_user('brigadnik', naradi=tools) for _ in range(3))
+    order_id = open_order(app, customer)
+    client = client_for(customer, 'zakaznik')
+    assert len(client.get(f'/api/matching/orders/{order_id}/workers').json) == 3
+
+    with app.app_context():
+        db.session.get(User, unapproved).is_approved = False
+        db.session.delete(db.session.get(User, deleted))
+        db.session.commit()
+    response = client.get(f'/api/matching/orders/{order_id}/workers')
+    assert response.status_code == 200
+    assert [worker['id'] for worker in response.json] == [kept]
+
+def test_stored_recommendations_skip_orders_gone_since_batch(app, make_user, client_for):
+    invalidate_matching_index()
+    customer = make_user('zakaznik')
+    worker = make_user('brigadnik', naradi=json.dumps(['sekacka']))
+    order_ids = [open_order(app, customer, f'Posekat trávník {i}') for i in range(3)]
+    with app.app_context():
+        save_recommendations(get_matching_index(max_age=0).precompute_recommendations(top_n=20))
+        db.session.get(Order, order_ids[0]).status = 'taken'
+        db.session.delete(db.session.get(Order, order_ids[1]))
+        db.session.commit()
+
+    response = client_for(worker, 'brigadnik').get('/api/matching/orders?limit=3')
+    assert response.status_code == 200
+    assert [order['id'] for order in response.json] == [order_ids[2]]
@@ -0,0 +1,80 @@
+"""Zakázka -> úloha order_analysis -> AI analýza fotky a odhad ceny (StubAIClient)."""
+import io
+import pytest
+from PIL import Image
+from src.models.user import db, Order, Job
+from src.utils.ai_utils import StubAIClient, DEFAULT_PRICE
+
+def photo():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1600, 1200), 'green').save(buffer, 'JPEG')
+    buffer.seek(0)
+    return buffer, 'zahrada.jpg'
+
+def create_order(client):
+    response = client.post('/api/orders', data={
+        'title': 'Posekat trávu', 'description': 'Tráva za domem', 'adresa': 'Praha', 'photo': photo()
+    }, content_type='multipart/form-data')
+    assert response.status_code == 201, response.data
+    return response.json['order']['id']
+
+class FlakyAIClient(StubAIClient):
+    """Prvních `failures` volání selže jako nedostupné OpenAI"""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def create(self, model, messages, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('OpenAI nedostupné')
+        return super().create(model, messages, **kwargs)
+
+@pytest.fixture
+def customer(make_user, client_for):
+    return client_for(make_user('zakaznik'), 'zakaznik')
+
+def analysis_job(app, order_id):
+    with app.app_context():
+        return next(job for job in Job.query.filter_by(kind='order_analysis')
+                    if f'"order_id": {order_id}' in job.payload)
+
+def test_order_gets_analysis_and_price(app, customer):
+    app.config['AI_CLIENT'] = StubAIClient(analysis='Vysoká tráva, asi 2 hodiny.', price='1200')
+    order_id = create_order(customer)
+
+    analysis = customer.get(f'/api/orders/{order_id}/analysis').json
+    assert analysis['analysis_status'] == 'done'
+    with app.app_context():
+        order = db.session.get(Order, order_id)
+        assert order.ai_analysis == 'Vysoká tráva, asi 2 hodiny.'
+        assert order.estimated_price == 1200.0
+        assert order.photo_variants  # Analyzovala se zmenšená varianta
+    job = analysis_job(app, order_id)
+    assert (job.status, job.attempts) == ('done', 1)
+
+def test_failed_analysis_is_retried(app, customer):
+    app.config['AI_CLIENT'] = FlakyAIClient(failures=1, price='900')
+    order_id = create_order(customer)
+
+    job = analysis_job(app, order_id)
+    assert (job.status, job.attempts) == ('done', 2)
+    assert 'OpenAI nedostupné' in job.last_error
+    with app.app_context():
+        order = db.session.get(Order, order_id)
+        assert order.analysis_status == 'done'
+        assert order.ai_analysis == StubAIClient().analysis
+        assert order.estimated_price == 900.0
+
+def test_analysis_fails_after_last_attempt(app, customer):
+    app.config['AI_CLIENT'] = FlakyAIClient(failures=100)
+    order_id = create_order(customer)
+
+    job = analysis_job(app, order_id)
+    assert (job.status, job.attempts) == ('failed', app.config['JOB_MAX_ATTEMPTS'])
+    with app.app_context():
+        order = db.session.get(Order, order_id)
+        assert order.analysis_status == 'failed'
+        assert order.ai_analysis is None
+        assert order.estimated_price == DEFAULT_PRICE
@@ -0,0 +1,21 @@
+"""Omezení počtu souběžných SSE streamů na proces."""
+import threading
+from src.routes import order
+
+def test_streams_past_limit_get_503_until_a_slot_frees(app, make_user, client_for, monkeypatch):
+    monkeypatch.setattr(order, '_stream_slots', threading.BoundedSemaphore(1))
+    client = client_for(make_user('zakaznik'), 'zakaznik')
+
+    stream = client.get('/api/orders/stream', buffered=False)
+    assert stream.status_code == 200
+    assert stream.mimetype == 'text/event-stream'
+
+    rejected = client.get('/api/orders/stream')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == str(order.STREAM_RETRY_AFTER_SECONDS)
+    assert 'error' in rejected.json
+
+    stream.close()
+    again = client.get('/api/orders/stream', buffered=False)
+    assert again.status_code == 200
+    again.close()
@@ -0,0 +1,54 @@
+"""Hashování hesel v poolu: vypršení čekání je PasswordHashingBusy (503)
+a místo v poolu se uvolní, až výpočet doběhne nebo se zruší."""
+import threading
+from concurrent.futures import Future
+import pytest
+from src.utils import passwords
+
+class StalledPool:
+    """Pool, jehož výpočty nikdy samy nedoběhnou"""
+
+    def __init__(self, started=False):
+        self.started = started
+        self.futures = []
+
+    def submit(self, func, *args):
+        future = Future()
+        if self.started:
+            future.set_running_or_notify_cancel()
+        self.futures.append(future)
+        return future
+
+@pytest.fixture
+def stalled(monkeypatch):
+    def install(started):
+        pool = StalledPool(started)
+        monkeypatch.setattr(passwords, 'PASSWORD_WORKERS', 1)
+        monkeypatch.setattr(passwords, 'PASSWORD_TIMEOUT_SECONDS', 0.01)
+        monkeypatch.setattr(passwords, 'PASSWORD_QUEUE_TIMEOUT', 0.01)
+        monkeypatch.setattr(passwords, '_slots', threading.BoundedSemaphore(1))
+        monkeypatch.setattr(passwords, '_get_pool', lambda: pool)
+        return pool
+    return install
+
+def test_queued_hash_timing_out_is_busy_and_frees_its_slot(stalled):
+    pool = stalled(started=False)
+    with pytest.raises(passwords.PasswordHashingBusy):
+        passwords.hash_password('heslo123')
+    assert pool.futures[0].cancelled()
+    with pytest.raises(passwords.PasswordHashingBusy):  # Místo je volné, znovu vyprší čekání na výsledek
+        passwords.hash_password('heslo123')
+    assert len(pool.futures) == 2
+
+def test_running_hash_keeps_its_slot_until_it_finishes(stalled):
+    pool = stalled(started=True)
+    with pytest.raises(passwords.PasswordHashingBusy):
+        passwords.hash_password('heslo123')
+    with pytest.raises(passwords.PasswordHashingBusy):  # Pool je plný - nic dalšího se nezařadí
+        passwords.hash_password('heslo123')
+    assert len(pool.futures) == 1
+
+    pool.futures[0].set_result('hash')
+    with pytest.raises(passwords.PasswordHashingBusy):
+        passwords.hash_password('heslo123')
+    assert len(pool.futures) == 2
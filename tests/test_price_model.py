@@ -0,0 +1,45 @@
+"""Historie pro model ceny: jen zaplacené zakázky s cenou zadanou brigádníkem."""
+from sqlalchemy import text
+from src.models.user import db, Order
+from src.utils.price_model import load_history
+from src.utils.migrations import migration_0014_final_price_confirmed
+
+def taken_order(app, customer_id, worker_id, estimated_price=1000):
+    with app.app_context():
+        order = Order(title='Posekat trávu', description='Tráva za domem', adresa='Praha', status='taken',
+                      customer_id=customer_id, worker_id=worker_id, estimated_price=estimated_price,
+                      analysis_status='done')
+        db.session.add(order)
+        db.session.commit()
+        return order.id
+
+def test_history_has_only_paid_orders_with_price_from_worker(app, make_user, client_for):
+    customer_id, worker_id = make_user('zakaznik'), make_user('brigadnik')
+    customer, worker = client_for(customer_id, 'zakaznik'), client_for(worker_id, 'brigadnik')
+    confirmed, defaulted, unpaid = (taken_order(app, customer_id, worker_id) for _ in range(3))
+
+    worker.post(f'/api/orders/{confirmed}/complete', json={'final_price': 1500})
+    worker.post(f'/api/orders/{defaulted}/complete', json={})
+    worker.post(f'/api/orders/{unpaid}/complete', json={'final_price': 800})
+    for order_id in (confirmed, defaulted):
+        assert customer.post(f'/api/orders/{order_id}/pay', json={'payment_type': 'full'}).status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Order, defaulted).final_price == 1000  # Převzatý odhad
+        assert [row.final_price for row in load_history()] == [1500]
+
+def test_migration_confirms_only_prices_that_differ_from_estimate(app, make_user):
+    customer_id = make_user('zakaznik')
+    with app.app_context():
+        db.session.add_all([
+            Order(title='Jiná', description='d', adresa='a', status='paid', customer_id=customer_id,
+                  estimated_price=1000, final_price=1500),
+            Order(title='Převzatá', description='d', adresa='a', status='paid', customer_id=customer_id,
+                  estimated_price=1000, final_price=1000),
+        ])
+        db.session.commit()
+        db.session.execute(text('ALTER TABLE "order" DROP COLUMN final_price_confirmed'))
+        migration_0014_final_price_confirmed()
+        db.session.commit()
+        confirmed = dict(db.session.execute(text('SELECT title, final_price_confirmed FROM "order"')).all())
+        assert confirmed == {'Jiná': 1, 'Převzatá': 0}
@@ -0,0 +1,66 @@
+"""Seznam zakázek nesmí dotazovat jména zákazníků a brigádníků po jednom (N+1):
+počet SQL dotazů GET /api/orders je stejný pro 5 i 50 zakázek."""
+import pytest
+from sqlalchemy import event
+from src.models.user import db, User, Order
+from src.utils import auth
+from src.utils.http_cache import clear_cache
+from benchmarks.common import login_client
+
+@pytest.fixture
+def app(app, monkeypatch):
+    monkeypatch.setattr(auth, 'AUTH_CACHE_TTL', 0)  # Identita se načte v každém požadavku stejně
+    return app
+
+def add_user(role, name):
+    user = User(jmeno=name, prijmeni=name, telefon='1', email=f'{name}@example.cz', password_hash='x',
+                role=role, email_verified=True, is_approved=True)
+    db.session.add(user)
+    db.session.flush()
+    return user.id
+
+def add_orders(count, customer_id=None, worker_id=None):
+    """Převzaté zakázky, každá s jiným zákazníkem nebo brigádníkem než ostatní"""
+    start = Order.query.count()
+    for i in range(start, start + count):
+        db.session.add(Order(
+            title=f'Zakázka {i}', description='Posekat trávu', adresa='Praha', status='taken',
+            customer_id=customer_id or add_user('zakaznik', f'zakaznik{i}'),
+            worker_id=worker_id or add_user('brigadnik', f'brigadnik{i}'),
+        ))
+    db.session.commit()
+
+def count_queries(app, client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    clear_cache()  # Počítá se sestavení odpovědi, ne cache odpovědí
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200, response.data
+    return len(response.json), len(statements)
+
+@pytest.mark.parametrize('role', ['zakaznik', 'brigadnik', 'admin'])
+def test_orders_list_query_count_does_not_grow(app, role):
+    with app.app_context():
+        viewer_id = add_user(role, role)
+        owner = {'customer_id': viewer_id} if role == 'zakaznik' else {}
+        assigned = {'worker_id': viewer_id} if role == 'brigadnik' else {}
+        add_orders(5, **owner, **assigned)
+    client = login_client(app, viewer_id, role)
+
+    listed, queries_5 = count_queries(app, client, '/api/orders')
+    assert listed == 5
+
+    with app.app_context():
+        add_orders(45, **owner, **assigned)
+    listed, queries_50 = count_queries(app, client, '/api/orders')
+    assert listed == 50
+    assert queries_50 == queries_5
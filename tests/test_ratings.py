@@ -0,0 +1,39 @@
+"""Historie hodnocení uživatele: bez parametrů celá, s limit/cursor po stránkách."""
+from src.models.user import db, Order, Rating
+from src.utils.ratings import set_rating
+
+def rate_worker(app, customer_id, worker_id, count):
+    with app.app_context():
+        for i in range(count):
+            order = Order(title=f'Zakázka {i}', description='d', adresa='a', status='paid',
+                          customer_id=customer_id, worker_id=worker_id)
+            db.session.add(order)
+            db.session.flush()
+            rating = Rating(order_id=order.id, customer_id=customer_id, worker_id=worker_id)
+            db.session.add(rating)
+            set_rating(rating, 'worker', 5, 'Dobrá práce')
+        db.session.commit()
+
+def test_ratings_without_paging_are_complete(app, make_user, client_for):
+    customer, worker = make_user('zakaznik'), make_user('brigadnik')
+    rate_worker(app, customer, worker, 25)
+
+    response = client_for(customer, 'zakaznik').get(f'/api/ratings/{worker}')
+    assert response.status_code == 200
+    assert len(response.json['ratings']) == 25
+    assert response.json['total_ratings'] == 25
+    assert 'X-Next-Cursor' not in response.headers
+
+def test_ratings_pages_follow_cursor(app, make_user, client_for):
+    customer, worker = make_user('zakaznik'), make_user('brigadnik')
+    rate_worker(app, customer, worker, 25)
+    client = client_for(customer, 'zakaznik')
+
+    seen, url = [], f'/api/ratings/{worker}?limit=10'
+    while url:
+        response = client.get(url)
+        seen += [rating['id'] for rating in response.json['ratings']]
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/api/ratings/{worker}?limit=10&cursor={cursor}' if cursor else None
+    assert len(seen) == len(set(seen)) == 25
+    assert seen == sorted(seen, reverse=True)
@@ -0,0 +1,43 @@
+"""Fulltextové hledání: relevance v okně nejnovějších shod, starší shody
+dostupné stránkováním za oknem."""
+from src.models.user import db, Order
+from src.utils import search
+
+def add_orders(app, customer_id, titles):
+    with app.app_context():
+        orders = [Order(title=title, description='Na zahradě', adresa='Praha', customer_id=customer_id)
+                  for title in titles]
+        db.session.add_all(orders)
+        db.session.commit()
+        return [order.id for order in orders]
+
+def search_all(client, q, limit):
+    ids, url = [], f'/api/orders/search?q={q}&limit={limit}'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids += [order['id'] for order in response.json]
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/api/orders/search?q={q}&limit={limit}&cursor={cursor}' if cursor else None
+    return ids
+
+def test_search_ranks_by_relevance(app, make_user, client_for):
+    customer = make_user('zakaznik')
+    in_description, in_title = add_orders(app, customer, ['Úklid', 'Posekat trávník'])
+    with app.app_context():
+        db.session.get(Order, in_description).description = 'Posekat trávník a uklidit'
+        db.session.commit()
+    results = client_for(customer, 'zakaznik').get('/api/orders/search?q=trávník').json
+    assert [order['id'] for order in results] == [in_title, in_description]
+
+def test_matches_older_than_rank_window_are_reachable_by_paging(app, make_user, client_for, monkeypatch):
+    monkeypatch.setattr(search, 'SEARCH_RANK_WINDOW', 5)
+    customer = make_user('zakaznik')
+    order_ids = add_orders(app, customer, [f'Posekat trávník {i}' for i in range(12)])
+    add_orders(app, customer, ['Umýt okna'])
+
+    found = search_all(client_for(customer, 'zakaznik'), 'trávník', limit=4)
+    assert sorted(found) == order_ids
+    newest_first = order_ids[::-1]
+    assert set(found[:5]) == set(newest_first[:5])  # Okno řazené podle relevance
+    assert found[5:] == newest_first[5:]  # Za oknem od nejnovějších
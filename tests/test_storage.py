@@ -0,0 +1,84 @@
+"""Fotky zakázek v lokálním úložišti: uložení pod hashem obsahu, počet odkazů
+a zmenšené varianty sdílené zakázkami se stejnou fotkou."""
+import io
+import os
+import json
+import pytest
+from PIL import Image
+from src.models.user import db, Order, PhotoBlob
+from src.utils.storage import release_blob, purge_blob
+
+def photo(color='green'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (1600, 1200), color).save(buffer, 'JPEG')
+    buffer.seek(0)
+    return buffer, 'zahrada.jpg'
+
+@pytest.fixture
+def customer(make_user, client_for):
+    return client_for(make_user('zakaznik'), 'zakaznik')
+
+def create_order(client, color='green'):
+    response = client.post('/api/orders', data={
+        'title': 'Posekat trávu', 'description': 'Tráva za domem', 'adresa': 'Praha', 'photo': photo(color)
+    }, content_type='multipart/form-data')
+    assert response.status_code == 201, response.data
+    return response.json['order']['id']
+
+def blob_of(app, order_id):
+    with app.app_context():
+        sha256 = db.session.get(Order, order_id).photo_sha256
+        return sha256, db.session.get(PhotoBlob, sha256)
+
+def stored_files(app):
+    root = app.config['UPLOAD_FOLDER']
+    return {name for name in os.listdir(root) if not name.startswith('.')}
+
+def test_same_photo_is_stored_once_with_shared_variants(app, customer):
+    first, second = create_order(customer), create_order(customer)
+    sha256, blob = blob_of(app, first)
+    assert blob_of(app, second)[0] == sha256
+    assert blob.refs == 2
+    assert blob.filename is None  # Originál smazán po vytvoření variant
+    variants = json.loads(blob.variants)
+    assert stored_files(app) == set(blob.files())
+    with app.app_context():
+        for order_id in (first, second):
+            assert db.session.get(Order, order_id).photo_filename == variants['analysis']
+
+    other = create_order(customer, color='blue')
+    assert blob_of(app, other)[0] != sha256
+
+def test_files_are_deleted_with_the_last_order(app, customer):
+    first, second = create_order(customer), create_order(customer)
+    sha256, blob = blob_of(app, first)
+    files = set(blob.files())
+
+    assert customer.delete(f'/api/orders/{first}').status_code == 200
+    with app.app_context():
+        assert db.session.get(PhotoBlob, sha256).refs == 1
+    assert stored_files(app) == files
+
+    assert customer.delete(f'/api/orders/{second}').status_code == 200
+    with app.app_context():
+        assert db.session.get(PhotoBlob, sha256) is None
+    assert stored_files(app) == set()
+
+    # Znovu nahraná fotka se uloží a zmenší znovu
+    again = create_order(customer)
+    assert stored_files(app) == set(blob_of(app, again)[1].files())
+
+def test_purge_keeps_photo_uploaded_again_after_release(app, customer):
+    order_id = create_order(customer)
+    sha256, blob = blob_of(app, order_id)
+    with app.app_context():
+        db.session.delete(db.session.get(Order, order_id))
+        release_blob(sha256)
+        db.session.commit()
+
+    # Stejná fotka nahraná mezi commitem uvolnění a smazáním souborů
+    again = create_order(customer)
+    with app.app_context():
+        purge_blob(sha256)
+        assert db.session.get(PhotoBlob, sha256).refs == 1
+    assert stored_files(app) == set(blob_of(app, again)[1].files())
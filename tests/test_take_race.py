@@ -0,0 +1,70 @@
+"""Souběžné přijímání stejné zakázky (viz benchmarks/bench_take_race.py):
+vyhraje právě jeden brigádník a stav v databázi odpovídá vítězi."""
+import threading
+import pytest
+from src.models.user import db, Order
+
+WORKERS = 8
+
+def open_order(app, customer_id):
+    with app.app_context():
+        order = Order(title='Závod', description='d', adresa='a', customer_id=customer_id,
+                      estimated_price=600, analysis_status='done')
+        db.session.add(order)
+        db.session.commit()
+        return order.id
+
+def race(requests):
+    """Spustí požadavky (funkce bez argumentů) současně, vrací jejich status kódy v pořadí"""
+    barrier = threading.Barrier(len(requests))
+    results = [None] * len(requests)
+
+    def run(index, request):
+        barrier.wait()
+        results[index] = request().status_code
+
+    threads = [threading.Thread(target=run, args=item) for item in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+@pytest.fixture
+def workers(make_user, client_for):
+    ids = [make_user('brigadnik') for _ in range(WORKERS)]
+    return ids, [client_for(worker_id, 'brigadnik') for worker_id in ids]
+
+def test_exactly_one_worker_takes_the_order(app, make_user, workers):
+    order_id = open_order(app, make_user('zakaznik'))
+    worker_ids, clients = workers
+
+    statuses = race([lambda client=client: client.post(f'/api/orders/{order_id}/take') for client in clients])
+
+    assert sorted(statuses) == [200] + [409] * (WORKERS - 1)
+    with app.app_context():
+        order = db.session.get(Order, order_id)
+        assert order.status == 'taken'
+        assert order.worker_id == worker_ids[statuses.index(200)]
+        assert order.payment_status == 'partial'
+
+def test_customer_cancel_racing_takes_has_one_winner(app, make_user, client_for, workers):
+    customer_id = make_user('zakaznik')
+    order_id = open_order(app, customer_id)
+    customer = client_for(customer_id, 'zakaznik')
+    worker_ids, clients = workers
+
+    cancel, *takes = race([lambda: customer.post(f'/api/orders/{order_id}/cancel')] +
+                          [lambda client=client: client.post(f'/api/orders/{order_id}/take') for client in clients])
+
+    with app.app_context():
+        order = db.session.get(Order, order_id)
+        if cancel == 200:
+            assert order is None
+            assert 200 not in takes
+            assert set(takes) <= {404, 409}
+        else:
+            assert cancel in (400, 409)
+            assert sorted(takes) == [200] + [409] * (WORKERS - 1)
+            assert order.status == 'taken'
+            assert order.worker_id == worker_ids[takes.index(200)]